@@ -0,0 +1,292 @@
+import array
+import hashlib
+import struct
+import sys
+import time
+from pathlib import Path
+
+from panda3d.core import (
+    Geom, GeomNode, GeomTriangles, GeomVertexArrayFormat, GeomVertexData, GeomVertexFormat,
+    InternalName, NodePath,
+)
+
+
+ROOT = Path(__file__).parent
+CACHE_DIR = ROOT / '.cache' / 'meshes'
+
+# Bump when the file layout or the OBJ conversion changes; old cache files then stop matching
+CACHE_VERSION = 1
+MAGIC = b'OCCM'
+HEADER = struct.Struct('<4sIIII6f')  # magic, version, flags, vertex count, index count, bounds
+
+HAS_UVS = 1
+HAS_COLORS = 2
+
+loaded_meshes = {}  # (path, decimate) -> NodePath, shared by every entity using the model
+
+
+# -------------------------------
+# OBJ / MTL
+# -------------------------------
+def read_mtl(path):
+    colors = {}
+    if not path.exists():
+        return colors
+    name = None
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'newmtl':
+                name = line.strip()[7:]
+            elif parts[0] == 'Kd' and name is not None:
+                colors[name] = (float(parts[1]), float(parts[2]), float(parts[3]), 1.0)
+    return colors
+
+
+def parse_obj(path):
+    # Same conversion as ursina's own OBJ importer (x mirrored, ursina's triangle fan order),
+    # but indexed: corners sharing position, uv, normal and color become one vertex.
+    path = Path(path)
+    positions, uvs, normals = [], [], []
+    materials = {}
+    color = None
+
+    vertices = {}
+    vertex_rows = []
+    indices = array.array('I')
+
+    def corner(token):
+        parts = token.split('/')
+        v = int(parts[0])
+        t = int(parts[1]) if len(parts) > 1 and parts[1] else 0
+        n = int(parts[2]) if len(parts) > 2 and parts[2] else 0
+        key = (
+            v - 1 if v > 0 else len(positions) + v,
+            t - 1 if t > 0 else (len(uvs) + t if t else -1),
+            n - 1 if n > 0 else (len(normals) + n if n else -1),
+            color,
+        )
+        index = vertices.get(key)
+        if index is None:
+            index = vertices[key] = len(vertex_rows)
+            vertex_rows.append(key)
+        return index
+
+    with open(path) as f:
+        for line in f:
+            if line.startswith('v '):
+                x, y, z = line[2:].split()[:3]
+                positions.append((-float(x), float(y), float(z)))
+            elif line.startswith('vn '):
+                x, y, z = line[3:].split()[:3]
+                normals.append((-float(x), float(y), float(z)))
+            elif line.startswith('vt '):
+                parts = line[3:].split()
+                uvs.append((float(parts[0]), float(parts[1]) if len(parts) > 1 else 0.0))
+            elif line.startswith('f '):
+                face = [corner(token) for token in line[2:].split()]
+                if len(face) == 3:
+                    indices.extend(face)
+                elif len(face) == 4:
+                    indices.extend((face[0], face[1], face[2], face[2], face[3], face[0]))
+                else:
+                    for i in range(1, len(face) - 1):
+                        indices.extend((face[i], face[i + 1], face[0]))
+            elif line.startswith('mtllib '):
+                materials = read_mtl(path.with_suffix('.mtl'))
+            elif line.startswith('usemtl '):
+                color = materials.get(line[7:].strip(), color)
+
+    has_uvs = bool(uvs)
+    has_colors = any(key[3] is not None for key in vertex_rows)
+    rows = []
+    for v, t, n, c in vertex_rows:
+        row = list(positions[v])
+        row.extend(normals[n] if n >= 0 else (0.0, 0.0, 0.0))
+        if has_uvs:
+            row.extend(uvs[t] if t >= 0 else (0.0, 0.0))
+        if has_colors:
+            row.extend(c or (1.0, 1.0, 1.0, 1.0))
+        rows.append(row)
+
+    return rows, indices, has_uvs, has_colors
+
+
+# -------------------------------
+# DECIMATION
+# -------------------------------
+def decimate(rows, indices, ratio, has_colors=False):
+    # Vertex clustering: snap vertices to a grid sized so roughly `ratio` of them survive,
+    # merge everything in a cell and drop the triangles that collapse.
+    if not rows or ratio >= 1:
+        return rows, indices
+    lo = [min(row[i] for row in rows) for i in range(3)]
+    hi = [max(row[i] for row in rows) for i in range(3)]
+    extent = [max(hi[i] - lo[i], 1e-6) for i in range(3)]
+    # Vertices sit on a surface, so occupied cells grow with the square of cells per axis
+    cells_per_axis = max(2, round((len(rows) * ratio) ** 0.5))
+    size = [e / cells_per_axis for e in extent]
+
+    cell_of = {}
+    merged = []
+    counts = []
+    remap = []
+    for row in rows:
+        key = tuple(int((row[i] - lo[i]) / size[i]) for i in range(3))
+        if has_colors:
+            key += tuple(row[-4:])
+        index = cell_of.get(key)
+        if index is None:
+            index = cell_of[key] = len(merged)
+            merged.append(list(row))
+            counts.append(1)
+        else:
+            target = merged[index]
+            for i in range(6):
+                target[i] += row[i]
+            counts[index] += 1
+        remap.append(index)
+
+    for row, count in zip(merged, counts):
+        for i in range(3):
+            row[i] /= count
+        length = (row[3] ** 2 + row[4] ** 2 + row[5] ** 2) ** 0.5 or 1.0
+        row[3] /= length
+        row[4] /= length
+        row[5] /= length
+
+    kept = array.array('I')
+    seen = set()
+    for i in range(0, len(indices), 3):
+        a, b, c = remap[indices[i]], remap[indices[i + 1]], remap[indices[i + 2]]
+        if a == b or b == c or a == c:
+            continue
+        key = min((a, b, c), (b, c, a), (c, a, b))
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.extend((a, b, c))
+    return merged, kept
+
+
+# -------------------------------
+# CACHE FILES
+# -------------------------------
+def source_hash(path, decimate_ratio=None):
+    path = Path(path)
+    digest = hashlib.sha1(f'{CACHE_VERSION}:{decimate_ratio}'.encode())
+    digest.update(path.read_bytes())
+    mtl = path.with_suffix('.mtl')
+    if mtl.exists():
+        digest.update(mtl.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def cache_prefix(path, decimate_ratio=None):
+    path = Path(path)
+    return f'{path.stem}@{decimate_ratio}' if decimate_ratio else path.stem
+
+
+def cache_path(path, decimate_ratio=None, cache_dir=None):
+    return Path(cache_dir or CACHE_DIR) / f'{cache_prefix(path, decimate_ratio)}-{source_hash(path, decimate_ratio)}.mesh'
+
+
+def write_mesh(out, rows, indices, has_uvs, has_colors):
+    flags = (HAS_UVS if has_uvs else 0) | (HAS_COLORS if has_colors else 0)
+    bounds = [min((row[i] for row in rows), default=0) for i in range(3)] + [max((row[i] for row in rows), default=0) for i in range(3)]
+    data = array.array('f', (value for row in rows for value in row))
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, CACHE_VERSION, flags, len(rows), len(indices), *bounds))
+        data.tofile(f)
+        indices.tofile(f)
+    tmp.replace(out)
+
+
+def compile_mesh(path, decimate_ratio=None, cache_dir=None, force=False):
+    # Returns the cache file for an OBJ, converting it first if the source (or settings) changed
+    path = Path(path)
+    if not path.is_absolute():
+        path = ROOT / path
+    out = cache_path(path, decimate_ratio, cache_dir)
+    if out.exists() and not force:
+        return out
+
+    rows, indices, has_uvs, has_colors = parse_obj(path)
+    if decimate_ratio:
+        rows, indices = decimate(rows, indices, decimate_ratio, has_colors)
+    write_mesh(out, rows, indices, has_uvs, has_colors)
+
+    # Drop stale builds of the same source
+    for old in out.parent.glob(f'{cache_prefix(path, decimate_ratio)}-*.mesh'):
+        if old != out:
+            old.unlink()
+    return out
+
+
+def vertex_format(flags):
+    columns = GeomVertexArrayFormat()
+    columns.addColumn(InternalName.getVertex(), 3, Geom.NT_float32, Geom.C_point)
+    columns.addColumn(InternalName.getNormal(), 3, Geom.NT_float32, Geom.C_normal)
+    if flags & HAS_UVS:
+        columns.addColumn(InternalName.getTexcoord(), 2, Geom.NT_float32, Geom.C_texcoord)
+    if flags & HAS_COLORS:
+        columns.addColumn(InternalName.getColor(), 4, Geom.NT_float32, Geom.C_color)
+    return GeomVertexFormat.registerFormat(GeomVertexFormat(columns))
+
+
+def read_mesh(path, name='mesh'):
+    with open(path, 'rb') as f:
+        magic, version, flags, vertex_count, index_count, *bounds = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != CACHE_VERSION:
+            raise ValueError(f'{path} is not a version {CACHE_VERSION} mesh cache file')
+        fmt = vertex_format(flags)
+        vertex_bytes = f.read(vertex_count * fmt.getArray(0).getStride())
+        index_bytes = f.read(index_count * 4)
+
+    vertex_data = GeomVertexData(name, fmt, Geom.UH_static)
+    vertex_data.uncleanSetNumRows(vertex_count)
+    vertex_data.modifyArray(0).modifyHandle().copyDataFrom(vertex_bytes)
+
+    triangles = GeomTriangles(Geom.UH_static)
+    triangles.setIndexType(Geom.NT_uint32)
+    triangle_indices = triangles.modifyVertices()
+    triangle_indices.uncleanSetNumRows(index_count)
+    triangle_indices.modifyHandle().copyDataFrom(index_bytes)
+
+    geom = Geom(vertex_data)
+    geom.addPrimitive(triangles)
+    node = GeomNode(name)
+    node.addGeom(geom)
+    return NodePath(node)
+
+
+def load_mesh(path, decimate_ratio=None):
+    # NodePath for an OBJ asset, from the binary cache. Each call returns a new node
+    # sharing the same vertex buffers, ready to hand to Entity(model=...).
+    key = (str(path), decimate_ratio)
+    if key not in loaded_meshes:
+        loaded_meshes[key] = read_mesh(compile_mesh(path, decimate_ratio), Path(path).stem)
+    return loaded_meshes[key].copyTo(NodePath())
+
+
+if __name__ == '__main__':
+    # python asset_cache.py [--decimate RATIO] [--force] assets/3d/*.obj
+    args = sys.argv[1:]
+    ratio = None
+    force = '--force' in args
+    if '--decimate' in args:
+        ratio = float(args[args.index('--decimate') + 1])
+        del args[args.index('--decimate'):args.index('--decimate') + 2]
+    paths = [arg for arg in args if not arg.startswith('--')] or sorted(str(p.relative_to(ROOT)) for p in (ROOT / 'assets' / '3d').glob('*.obj'))
+    for path in paths:
+        start = time.perf_counter()
+        out = compile_mesh(path, ratio, force=force)
+        elapsed = (time.perf_counter() - start) * 1000
+        with open(out, 'rb') as f:
+            _, _, flags, vertex_count, index_count, *_ = HEADER.unpack(f.read(HEADER.size))
+        print(f'{path}: {vertex_count} vertices, {index_count // 3} triangles, '
+              f'{Path(ROOT / path).stat().st_size / 1024:.0f} KB -> {out.stat().st_size / 1024:.0f} KB in {elapsed:.0f} ms ({out.name})')
@@ -0,0 +1,169 @@
+import hashlib
+from pathlib import Path
+
+from panda3d.core import Filename, PNMImage, SamplerState, Texture, TextureStage, TransformState, Vec2
+
+from texture_cache import CACHE_DIR, CACHE_VERSION, SOURCE_SUFFIXES, read_texture, resolve
+
+
+class Region:
+    __slots__ = ('texture', 'page', 'offset', 'scale')
+
+    def __init__(self, texture, page, offset, scale):
+        self.texture = texture    # the page's Panda3D texture
+        self.page = page
+        self.offset = offset      # (u, v) of the image's lower left corner on the page
+        self.scale = scale        # the image's (width, height) in page uvs
+
+    def uv(self, u, v):
+        # A uv on the original image, on the page
+        return (self.offset[0] + u * self.scale[0], self.offset[1] + v * self.scale[1])
+
+    def apply(self, node_path):
+        # Texture the node with the page, its uvs mapped into this image's place. The mapping is
+        # a texture matrix, which flattenStrong bakes into the vertices, so copies can be merged.
+        node_path.setTexture(self.texture, 1)
+        node_path.setTexTransform(TextureStage.getDefault(),
+                                  TransformState.makePosRotateScale2d(Vec2(*self.offset), 0, Vec2(*self.scale)))
+
+
+class TextureAtlas:
+    # Small images (paintings, photos, the door wood) packed onto a few shared pages, so
+    # everything using them binds one texture and can be flattened into one batch. Images are
+    # added by path, packed on build() onto shelves, tallest first, each with `padding` pixels
+    # of its own edge around it so mipmaps and filtering don't bleed in from its neighbours.
+    # Images larger than max_size, or that can't be read, are left out, and region() returns
+    # None for them: they are used through cached_texture as before. Only images used with
+    # uvs within 0..1 belong here; a repeating texture can't wrap inside a page. With compress
+    # the pages are stored DXT-compressed, as texture_cache's medium and low tiers are; built
+    # pages are kept in cache_dir by their images' contents, so that is only done once.
+    def __init__(self, max_size=512, page_size=1024, padding=4, compress=False, cache_dir=CACHE_DIR):
+        self.max_size = max_size
+        self.page_size = page_size
+        self.padding = padding
+        self.compress = compress
+        self.cache_dir = cache_dir
+        self.images = {}      # path -> PNMImage, until build()
+        self.sources = {}     # path -> its file
+        self.regions = {}     # path -> Region
+        self.pages = []       # Panda3D textures
+        self.skipped = set()
+        self.used_pixels = 0
+
+    def add(self, path):
+        # True if the image will be on a page
+        if path in self.images or path in self.regions:
+            return True
+        if path in self.skipped or not isinstance(path, str):
+            return False
+        source = resolve(path)
+        image = PNMImage()
+        if (source.suffix.lower() not in SOURCE_SUFFIXES or not source.exists()
+                or not image.read(Filename.fromOsSpecific(str(source)))
+                or max(image.getXSize(), image.getYSize()) > self.max_size):
+            self.skipped.add(path)
+            return False
+        self.images[path] = image
+        self.sources[path] = source
+        return True
+
+    def padded(self, image, channels):
+        # The image with its edge pixels repeated `padding` times around it
+        pad, width, height = self.padding, image.getXSize(), image.getYSize()
+        out = PNMImage(width + 2 * pad, height + 2 * pad, channels, 255)
+        if out.hasAlpha():
+            out.alphaFill(1)
+        out.copySubImage(image, pad, pad)
+        for i in range(pad):
+            out.copySubImage(image, pad, i, 0, 0, width, 1)
+            out.copySubImage(image, pad, pad + height + i, 0, height - 1, width, 1)
+        edges = PNMImage(out)
+        for i in range(pad):
+            out.copySubImage(edges, i, 0, pad, 0, 1, height + 2 * pad)
+            out.copySubImage(edges, pad + width + i, 0, pad + width - 1, 0, 1, height + 2 * pad)
+        return out
+
+    def build(self):
+        # Packs everything added since the last build onto new pages
+        size = self.page_size
+        channels = 4 if any(image.hasAlpha() for image in self.images.values()) else 3
+        pages, places = [], []
+        for path, image in sorted(self.images.items(), key=lambda item: (-item[1].getYSize(), item[0])):
+            tile = self.padded(image, channels)
+            for index, (page, shelves) in enumerate(pages):
+                place = self.place(shelves, tile)
+                if place:
+                    break
+            else:
+                index, page, shelves = len(pages), PNMImage(size, size, channels, 255), []
+                pages.append((page, shelves))
+                place = self.place(shelves, tile)
+            page.copySubImage(tile, *place)
+            places.append((path, len(self.pages) + index, place, image))
+            self.used_pixels += tile.getXSize() * tile.getYSize()
+
+        for index, (page, _) in enumerate(pages):
+            digest = hashlib.sha1(f'{CACHE_VERSION}:{size}:{self.padding}:{self.compress}:{channels}'.encode())
+            for path, page_index, place, _ in places:
+                if page_index == len(self.pages):
+                    digest.update(f'{path}:{place}'.encode())
+                    digest.update(self.sources[path].read_bytes())
+            self.pages.append(self.page_texture(page, channels, digest.hexdigest()[:16]))
+
+        for path, index, (x, y), image in places:
+            width, height = image.getXSize(), image.getYSize()
+            # Image rows run top down, uvs bottom up
+            left, bottom = (x + self.padding) / size, 1 - (y + self.padding + height) / size
+            self.regions[path] = Region(self.pages[index], index, (left, bottom), (width / size, height / size))
+        self.images = {}
+        return self
+
+    def page_texture(self, page, channels, digest):
+        cached = Path(self.cache_dir) / f'atlas-{digest}.txo' if self.cache_dir else None
+        if cached and cached.exists():
+            try:
+                return read_texture(cached)
+            except ValueError:
+                pass  # rebuilt below
+        texture = Texture(f'atlas-{digest}')
+        texture.load(page)
+        # As texture_cache's: trilinear when minified, nearest up close
+        texture.setMinfilter(SamplerState.FT_linear_mipmap_linear)
+        texture.setMagfilter(SamplerState.FT_nearest)
+        texture.setWrapU(SamplerState.WM_clamp)
+        texture.setWrapV(SamplerState.WM_clamp)
+        texture.generateRamMipmapImages()
+        if self.compress:
+            texture.compressRamImage(Texture.CM_dxt5 if channels == 4 else Texture.CM_dxt1, Texture.QL_default, None)
+        if cached:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_suffix('.tmp.txo')
+            if texture.write(Filename.fromOsSpecific(str(tmp))):
+                tmp.replace(cached)
+        return texture
+
+    def place(self, shelves, tile):
+        # (x, y) for the tile on a page, opening a new shelf under the others if it fits nowhere
+        width, height = tile.getXSize(), tile.getYSize()
+        for shelf in shelves:
+            if height <= shelf[1] and shelf[2] + width <= self.page_size:
+                x = shelf[2]
+                shelf[2] += width
+                return x, shelf[0]
+        top = shelves[-1][0] + shelves[-1][1] if shelves else 0
+        if top + height > self.page_size or width > self.page_size:
+            return None
+        shelves.append([top, height, width])  # [y, height, x where the next tile goes]
+        return 0, top
+
+    def region(self, path):
+        return self.regions.get(path)
+
+    @property
+    def stats(self):
+        return {
+            'pages': len(self.pages),
+            'images': len(self.regions),
+            'skipped': len(self.skipped),
+            'fill': round(self.used_pixels / (len(self.pages) * self.page_size ** 2), 3) if self.pages else 0.0,
+        }
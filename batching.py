@@ -0,0 +1,292 @@
+import array
+
+from ursina import Entity, Mesh, scene
+from ursina.collider import Collider
+from panda3d.core import (CollisionBox, Geom, GeomVertexArrayFormat, GeomVertexFormat, InternalName, Point3,
+                          TextureStage)
+
+
+# In-plane (u, v) axes for faces whose normal lies on x, y or z.
+# Matches the UV layout of ursina's built-in cube and plane models.
+FACE_AXES = ((2, 1), (0, 2), (0, 1))
+# Faces and boxes this close share a plane or an edge
+EPSILON = 1e-3
+
+
+class Face:
+    __slots__ = ('axis', 'sign', 'plane', 'lo', 'hi', 'uv', 'material')
+
+    def __init__(self, axis, sign, plane, lo, hi, uv, material):
+        self.axis = axis          # 0, 1 or 2: the axis the face normal points along
+        self.sign = sign          # +1 or -1
+        self.plane = plane        # coordinate of the face along its normal axis
+        self.lo = lo              # (u_min, v_min) on the in-plane axes
+        self.hi = hi              # (u_max, v_max)
+        self.uv = uv              # texture coords at lo and hi: (u0, u1, v0, v1)
+        self.material = material
+
+    @property
+    def normal(self):
+        n = [0, 0, 0]
+        n[self.axis] = self.sign
+        return tuple(n)
+
+    def corners(self):
+        u_axis, v_axis = FACE_AXES[self.axis]
+        points = []
+        for u, v in ((self.lo[0], self.lo[1]), (self.hi[0], self.lo[1]), (self.hi[0], self.hi[1]), (self.lo[0], self.hi[1])):
+            p = [0.0, 0.0, 0.0]
+            p[self.axis] = self.plane
+            p[u_axis] = u
+            p[v_axis] = v
+            points.append(tuple(p))
+
+        # Keep ursina's winding: the triangle normal (by the usual cross product) points into the face.
+        a, b, c = points[0], points[1], points[2]
+        e1 = (b[0] - a[0], b[1] - a[1], b[2] - a[2])
+        e2 = (c[0] - a[0], c[1] - a[1], c[2] - a[2])
+        cross = (
+            e1[1] * e2[2] - e1[2] * e2[1],
+            e1[2] * e2[0] - e1[0] * e2[2],
+            e1[0] * e2[1] - e1[1] * e2[0]
+        )
+        u0, u1, v0, v1 = self.uv
+        uvs = [(u0, v0), (u1, v0), (u1, v1), (u0, v1)]
+        if cross[self.axis] * self.sign > 0:
+            points.reverse()
+            uvs.reverse()
+        return points, uvs
+
+    def area(self):
+        return (self.hi[0] - self.lo[0]) * (self.hi[1] - self.lo[1])
+
+
+def box_faces(position, scale, material, texture_scale=(1, 1)):
+    lo = [position[i] - scale[i] / 2 for i in range(3)]
+    hi = [position[i] + scale[i] / 2 for i in range(3)]
+    uv = (0, texture_scale[0], 0, texture_scale[1])
+    faces = []
+    for axis in range(3):
+        u_axis, v_axis = FACE_AXES[axis]
+        for sign, plane in ((1, hi[axis]), (-1, lo[axis])):
+            faces.append(Face(axis, sign, plane, (lo[u_axis], lo[v_axis]), (hi[u_axis], hi[v_axis]), uv, material))
+    return faces
+
+
+def plane_face(position, scale, material, texture_scale=(1, 1)):
+    return Face(
+        1, 1, position[1],
+        (position[0] - scale[0] / 2, position[2] - scale[2] / 2),
+        (position[0] + scale[0] / 2, position[2] + scale[2] / 2),
+        (0, texture_scale[0], 0, texture_scale[1]),
+        material
+    )
+
+
+def covered(lo, hi, rects):
+    # Whether the rects ((lo, hi) pairs) together cover the one from lo to hi
+    rects = [(max(lo[0], a[0]), max(lo[1], a[1]), min(hi[0], b[0]), min(hi[1], b[1])) for a, b in rects]
+    rects = [r for r in rects if r[2] - r[0] > EPSILON and r[3] - r[1] > EPSILON]
+    if not rects:
+        return False
+    us = sorted({lo[0], hi[0]} | {r[0] for r in rects} | {r[2] for r in rects})
+    vs = sorted({lo[1], hi[1]} | {r[1] for r in rects} | {r[3] for r in rects})
+    for u0, u1 in zip(us, us[1:]):
+        for v0, v1 in zip(vs, vs[1:]):
+            if u1 - u0 <= EPSILON or v1 - v0 <= EPSILON:
+                continue
+            u, v = (u0 + u1) / 2, (v0 + v1) / 2
+            if not any(r[0] <= u <= r[2] and r[1] <= v <= r[3] for r in rects):
+                return False
+    return True
+
+
+def face_hidden(face, solids):
+    # solids are (lo, hi) boxes. A face can't be seen where a box fills the space just in
+    # front of it (the end of a wall butting into another, the top of one inside the ceiling),
+    # or where it faces down onto a flat box (a floor) on its plane.
+    axis = face.axis
+    u_axis, v_axis = FACE_AXES[axis]
+    front = face.plane + face.sign * EPSILON
+    rects = []
+    for lo, hi in solids:
+        if hi[axis] - lo[axis] < EPSILON:
+            if face.sign > 0 or abs(lo[axis] - face.plane) > EPSILON:
+                continue
+        elif not lo[axis] < front < hi[axis]:
+            continue
+        if lo[u_axis] < face.hi[0] and hi[u_axis] > face.lo[0] and lo[v_axis] < face.hi[1] and hi[v_axis] > face.lo[1]:
+            rects.append(((lo[u_axis], lo[v_axis]), (hi[u_axis], hi[v_axis])))
+    return covered(face.lo, face.hi, rects)
+
+
+def texel_density(face, d):
+    # Texture repeats per unit along in-plane axis d
+    extent = face.hi[d] - face.lo[d]
+    return round((face.uv[2 * d + 1] - face.uv[2 * d]) / extent, 4) if extent > EPSILON else None
+
+
+def merge_faces(faces, can_merge=None):
+    # Faces on one plane, facing the same way, with the same material and sharing a whole
+    # edge become one, along u and then v until nothing changes. The texture runs on from
+    # the first face: the merged face has the texture spans of both, so a wall built in
+    # pieces keeps the repeats it had. Only faces with the same texel density along the
+    # merge are joined, or the texture would stretch evenly over both. can_merge(face) can
+    # turn a merge down.
+    changed = True
+    while changed:
+        changed = False
+        for d in (0, 1):
+            e = 1 - d
+            groups = {}
+            for face in faces:
+                key = (face.axis, face.sign, round(face.plane, 3), face.material, round(face.lo[e], 3), round(face.hi[e], 3),
+                       round(face.uv[2 * e], 4), round(face.uv[2 * e + 1], 4), texel_density(face, d))
+                groups.setdefault(key, []).append(face)
+            faces = []
+            for group in groups.values():
+                group.sort(key=lambda face: face.lo[d])
+                current = group[0]
+                for face in group[1:]:
+                    merged = None
+                    if abs(face.lo[d] - current.hi[d]) < EPSILON:
+                        hi = list(current.hi)
+                        hi[d] = face.hi[d]
+                        uv = list(current.uv)
+                        uv[2 * d + 1] += face.uv[2 * d + 1] - face.uv[2 * d]
+                        merged = Face(current.axis, current.sign, current.plane, current.lo, tuple(hi), tuple(uv), current.material)
+                        if can_merge and not can_merge(merged):
+                            merged = None
+                    if merged:
+                        current = merged
+                        changed = True
+                    else:
+                        faces.append(current)
+                        current = face
+                faces.append(current)
+    return faces
+
+
+def optimize_faces(faces, solids, can_merge=None):
+    return merge_faces([face for face in faces if not face_hidden(face, solids)], can_merge)
+
+
+# Baked light is added to the vertex lighting, and the surface texture (sort 0) multiplies the sum
+LIGHTMAP_STAGE = TextureStage('lightmap')
+LIGHTMAP_STAGE.setTexcoordName('lightmap')
+LIGHTMAP_STAGE.setSort(-1)
+LIGHTMAP_STAGE.setCombineRgb(TextureStage.CM_add, TextureStage.CS_primary_color, TextureStage.CO_src_color,
+                             TextureStage.CS_texture, TextureStage.CO_src_color)
+LIGHTMAP_STAGE.setCombineAlpha(TextureStage.CM_replace, TextureStage.CS_primary_color, TextureStage.CO_src_alpha)
+
+
+def add_lightmap_uvs(mesh, uvs):
+    # ursina meshes have one set of uvs; the lightmap's go in a column of their own
+    vertex_data = mesh.geomNode.modifyGeom(0).modifyVertexData()
+    fmt = GeomVertexFormat(vertex_data.getFormat())
+    fmt.addArray(GeomVertexArrayFormat(InternalName.getTexcoordName('lightmap'), 2, Geom.NT_float32, Geom.C_texcoord))
+    vertex_data.setFormat(GeomVertexFormat.registerFormat(fmt))
+    column = vertex_data.modifyArray(vertex_data.getNumArrays() - 1)
+    column.modifyHandle().copyDataFrom(array.array('f', (value for uv in uvs for value in uv)))
+
+
+def material_key(texture, color):
+    return (texture, tuple(round(c, 4) for c in color))
+
+
+class BoxSetCollider(Collider):
+    # One collision node holding many boxes, so a whole batch costs a single collidable entity.
+    def __init__(self, entity, boxes):
+        self.boxes = boxes
+        shapes = [CollisionBox(Point3(*center), *(max(0.001, e) for e in half)) for center, half in boxes]
+        super().__init__(entity, shapes)
+
+
+class StaticBatch:
+    def __init__(self):
+        self.faces = []
+        self.colliders = []
+        self.materials = {}
+        self.source_count = 0
+        self.solids = []            # what hides faces: opaque cubes, and planes as flat boxes
+        self.source_faces = None    # faces before optimize()
+        self.lightmap = None        # a lightbake.Lightmap for the segment, if it has been baked
+
+    def _material(self, texture, color):
+        key = material_key(texture, color)
+        self.materials.setdefault(key, (texture, color))
+        return key
+
+    def add_cube(self, position, scale, color, texture=None, texture_scale=(1, 1), collider=True):
+        self.source_count += 1
+        self.faces.extend(box_faces(position, scale, self._material(texture, color), texture_scale))
+        if len(color) < 4 or color[3] >= 1:
+            self.solids.append((tuple(position[i] - scale[i] / 2 for i in range(3)), tuple(position[i] + scale[i] / 2 for i in range(3))))
+        if collider:
+            self.colliders.append((tuple(position), tuple(s / 2 for s in scale)))
+
+    def add_plane(self, position, scale, color, texture=None, texture_scale=(1, 1), collider=True):
+        self.source_count += 1
+        face = plane_face(position, scale, self._material(texture, color), texture_scale)
+        self.faces.append(face)
+        self.solids.append(((face.lo[0], face.plane, face.lo[1]), (face.hi[0], face.plane, face.hi[1])))
+        if collider:
+            self.colliders.append((tuple(position), (scale[0] / 2, 0, scale[2] / 2)))
+
+    def optimize(self, occluders=()):
+        # Drops the faces nothing can see and merges the rest where they line up. occluders are
+        # boxes from outside the batch that can hide its faces too (the segments next to it).
+        # With a lightmap, faces only merge within one baked face.
+        self.source_faces = len(self.faces)
+        self.faces = optimize_faces(self.faces, self.solids + list(occluders), self.lightmap.holds if self.lightmap else None)
+        return self.source_faces, len(self.faces)
+
+    def meshes(self):
+        grouped = {}
+        for face in self.faces:
+            grouped.setdefault(face.material, []).append(face)
+
+        for key, faces in grouped.items():
+            vertices, triangles, uvs, normals, lightmap_uvs = [], [], [], [], []
+            for face in faces:
+                points, face_uvs = face.corners()
+                start = len(vertices)
+                vertices.extend(points)
+                uvs.extend(face_uvs)
+                normals.extend([face.normal] * 4)
+                triangles.extend((start, start + 1, start + 2, start, start + 2, start + 3))
+                if self.lightmap:
+                    lightmap_uvs.extend(self.lightmap.uv(face, point) for point in points)
+            yield key, vertices, triangles, uvs, normals, lightmap_uvs
+
+    def build(self, parent=None, collide=True, add_to_scene_entities=True):
+        parent = parent or scene
+        entities = []
+        for key, vertices, triangles, uvs, normals, lightmap_uvs in self.meshes():
+            texture, color = self.materials[key]
+            mesh = Mesh(vertices=vertices, triangles=triangles, uvs=uvs, normals=normals, static=True)
+            if lightmap_uvs:
+                add_lightmap_uvs(mesh, lightmap_uvs)
+            entity = Entity(parent=parent, model=mesh, texture=texture, color=color, add_to_scene_entities=add_to_scene_entities)
+            if lightmap_uvs and self.lightmap.texture is not None:
+                # Beside the surface texture ursina sets on the model (priority 1), or that one replaces it
+                entity.model.setTexture(LIGHTMAP_STAGE, self.lightmap.texture, 1)
+            entities.append(entity)
+
+        if collide and self.colliders:
+            holder = Entity(parent=parent, name='static_colliders')
+            holder.collider = BoxSetCollider(holder, self.colliders)
+            entities.append(holder)
+        return entities
+
+    @property
+    def stats(self):
+        return {
+            'sources': self.source_count,
+            'materials': len({face.material for face in self.faces}),
+            'faces': len(self.faces),
+            'triangles': len(self.faces) * 2,
+            'source_triangles': (self.source_faces if self.source_faces is not None else len(self.faces)) * 2,
+            'colliders': len(self.colliders),
+            'lightmapped': self.lightmap is not None,
+        }
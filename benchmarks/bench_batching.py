@@ -0,0 +1,93 @@
+# python -m benchmarks.bench_batching [--seed SEED] [--floors 1 5 20]
+#
+# Triangles in the static batches before and after StaticBatch.optimize drops the faces
+# nothing can see and merges the ones in line, for the default hotel and for generated
+# hotels: per segment kind, in total and per floor, with the time optimizing took. Each
+# segment is batched as main.py batches it (same materials and texture scales). It also
+# checks that every optimized face falls within a face the lightmap bake made. No window needed.
+import argparse
+import time
+
+from batching import StaticBatch
+from generator import generate_hotel
+from layout import THEME, load_layout, validate_layout
+from lightbake import Lightmap, neighbour_occluders, segment_parts
+from streaming import make_segments
+
+
+def material_color(value):
+    if value is None:
+        return (1, 1, 1)
+    return tuple(THEME[value] if isinstance(value, str) else value)
+
+
+def segment_batch(segment):
+    # What create_floor, create_wall and create_block put in the segment's batch
+    batch = StaticBatch()
+    for item in segment.items:
+        position, scale = item['position'], item.get('scale')
+        if item['type'] == 'floor':
+            batch.add_plane(position, scale, (1, 1, 1), 'assets/stonetiles_002_diff.png', (scale[0] * 0.25, scale[2] * 0.25))
+        elif item['type'] == 'wall':
+            batch.add_cube(position, scale, material_color(item.get('color')), item.get('texture', 'assets/wall.jpg'),
+                           item.get('texture_scale') or (scale[0] * 0.5, scale[1] * 0.5))
+        elif item['type'] == 'block':
+            batch.add_cube(position, scale, material_color(item.get('color')), item.get('texture'))
+    return batch
+
+
+def baked_faces(segment, segments):
+    # A lightmap with no texture, holding the faces the bake would lay out
+    return Lightmap(None, [(face.axis, face.sign, face.plane, face.lo, face.hi, (0, 0, 0, 0))
+                           for faces in segment_parts(segment, segments) for face in faces], {})
+
+
+def measure(segments, lightmapped):
+    kinds = {}
+    held = faces = 0
+    start = time.perf_counter()
+    for segment in segments:
+        batch = segment_batch(segment)
+        if lightmapped:
+            batch.lightmap = baked_faces(segment, segments)
+        before, after = batch.optimize(neighbour_occluders(segment, segments))
+        row = kinds.setdefault(segment.kind, [0, 0, 0])
+        row[0] += 1
+        row[1] += before * 2
+        row[2] += after * 2
+        if lightmapped:
+            held += sum(batch.lightmap.holds(face) for face in batch.faces)
+            faces += len(batch.faces)
+    elapsed = (time.perf_counter() - start) * 1000
+    return kinds, elapsed, (held / faces if faces else None)
+
+
+def report(name, segments, floors):
+    for lightmapped in (False, True):
+        kinds, elapsed, held = measure(segments, lightmapped)
+        before = sum(row[1] for row in kinds.values())
+        after = sum(row[2] for row in kinds.values())
+        label = f'{name}, lightmapped' if lightmapped else name
+        print(f'{label}: {len(segments)} segments, {floors} floors')
+        for kind, (count, kind_before, kind_after) in sorted(kinds.items()):
+            print(f'  {kind:<12} {count:>5} {kind_before:>8} -> {kind_after:>7} triangles ({1 - kind_after / kind_before:.0%} fewer)')
+        print(f'  {"total":<12} {len(segments):>5} {before:>8} -> {after:>7} triangles ({1 - after / before:.0%} fewer), '
+              f'{before // floors} -> {after // floors} per floor, optimized in {elapsed:.0f} ms')
+        if held is not None:
+            print(f'  faces within a baked face: {held:.1%}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--floors', type=int, nargs='+', default=[1, 5, 20])
+    args = parser.parse_args()
+
+    segments = make_segments(load_layout('layouts/hotel.json'))
+    report('layouts/hotel.json', segments, len({segment.floor for segment in segments}))
+    for floors in args.floors:
+        report(f'seed {args.seed}', make_segments(validate_layout(generate_hotel(args.seed, floors))), floors)
+
+
+if __name__ == '__main__':
+    main()
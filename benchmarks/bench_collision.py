@@ -0,0 +1,187 @@
+# python -m benchmarks.bench_collision [--seed SEED] [--floors 1 20] [--frames N]
+#
+# What the player's movement costs in collision queries with the whole hotel built, at 1
+# and at 20 floors: the seven rays FirstPersonController casts each frame (feet, head, four
+# sideways, gravity) through ursina's raycast, against
+#   before: a box collider per segment holding all of its boxes, plus a collider on every
+#           door, switch, photo table and toilet, all traversed;
+#   after:  the ColliderGrid, simplified per segment, traversing only the cells next to
+#           the player's.
+# The player walks a second at a time from random spots on random floors. No window needed.
+import argparse
+import json
+import math
+import time
+from random import Random
+
+from ursina import BoxCollider, Entity, Ursina, Vec3, raycast, scene
+
+from batching import BoxSetCollider
+from collision import ColliderGrid
+from generator import generate_hotel
+from layout import validate_layout
+from streaming import make_segments
+
+# The toilet model's box at the scale main.py spawns it
+TOILET_SIZE = (1.4, 1.6, 0.8)
+PLAYER_HEIGHT = 2
+
+
+def static_boxes(items):
+    # What StaticBatch collects for a segment: walls, floors and solid blocks
+    boxes = []
+    for item in items:
+        if item['type'] in ('wall', 'block') and (item['type'] == 'wall' or item.get('collider')):
+            boxes.append((tuple(item['position']), tuple(s / 2 for s in item['scale'])))
+        elif item['type'] == 'floor':
+            boxes.append((tuple(item['position']), (item['scale'][0] / 2, 0, item['scale'][2] / 2)))
+    return boxes
+
+
+def solid_entities(items, parent):
+    # Doors, photo tables, switches and toilets with the colliders main.py gives them
+    solids = []
+    for item in items:
+        kind = item['type']
+        if kind == 'door':
+            door = Entity(parent=parent, position=item['position'], rotation=item.get('rotation', (0, 0, 0)),
+                          scale=(item.get('width', 3.2), item.get('height', 3.5), 0.12), add_to_scene_entities=False)
+            door.collider = BoxCollider(door, center=(-0.5, 0, 0), size=(1, 1, 1))
+            solids.append(('dynamic', door))
+        elif kind == 'photo_table':
+            table = Entity(parent=parent, position=item['position'], rotation=item.get('rotation', (0, 0, 0)), add_to_scene_entities=False)
+            table.collider = BoxCollider(table, center=(0, 0.5, 0), size=(2.2, 1.0, 1.2))
+            solids.append(('dynamic', table))
+        elif kind == 'point_light' and item.get('switch'):
+            switch = Entity(parent=parent, position=item['switch']['position'], scale=(0.2, 0.3, 0.05), add_to_scene_entities=False)
+            switch.collider = BoxCollider(switch, center=(0, 0, 0), size=(1, 1, 1))
+            solids.append(('switch', switch))
+        elif kind == 'toilet':
+            x, y, z = item['position']
+            toilet = Entity(parent=parent, position=(x, y, z), add_to_scene_entities=False)
+            toilet.collider = BoxCollider(toilet, center=(0, TOILET_SIZE[1] / 2, 0), size=TOILET_SIZE)
+            solids.append(('toilet', toilet))
+    return solids
+
+
+def build_before(segments):
+    root = Entity(name='before')
+    count = 0
+    for segment in segments:
+        boxes = static_boxes(segment.items)
+        holder = Entity(parent=root, name=segment.name, add_to_scene_entities=False)
+        holder.collider = BoxSetCollider(holder, boxes)
+        count += len(boxes) + len(solid_entities(segment.items, root))
+    return root, count
+
+
+def build_after(segments, cell_size):
+    grid = ColliderGrid(cell_size=cell_size)
+    scratch = Entity(name='scratch')
+    for segment in segments:
+        boxes = static_boxes(segment.items)
+        for kind, entity in solid_entities(segment.items, scratch):
+            if kind == 'dynamic':
+                grid.add_dynamic(entity)
+            elif kind == 'toilet':
+                center = entity.getPos(scratch) + Vec3(0, TOILET_SIZE[1] / 2, 0)
+                boxes.append((tuple(center), tuple(s / 2 for s in TOILET_SIZE)))
+        grid.add_static(segment.name, boxes)
+    # The stand-ins copy their targets; the targets themselves are never traversed
+    scratch.detachNode()
+    return grid
+
+
+def walk(segments, count, rng, steps=60, speed=0.1):
+    # A second of walking (at 60 fps and the player's speed) from a random spot on a random
+    # floor, then the next; the rays don't stop the walk, so it goes through walls
+    floors = [item for segment in segments for item in segment.items if item['type'] == 'floor']
+    result = []
+    while len(result) < count:
+        floor = rng.choice(floors)
+        x, y, z = floor['position']
+        sx, _, sz = floor['scale']
+        angle = rng.uniform(0, math.tau)
+        direction = Vec3(math.sin(angle), 0, math.cos(angle))
+        position = Vec3(x + rng.uniform(-sx, sx) * 0.4, y, z + rng.uniform(-sz, sz) * 0.4)
+        for i in range(steps):
+            result.append((position + direction * speed * i, direction))
+    return result[:count]
+
+
+def movement_rays(position, direction, target):
+    # FirstPersonController.update's queries, in its order
+    raycast(position + Vec3(0, 0.5, 0), direction, traverse_target=target, distance=.5)
+    raycast(position + Vec3(0, PLAYER_HEIGHT - .1, 0), direction, traverse_target=target, distance=.5)
+    for side in (Vec3(1, 0, 0), Vec3(-1, 0, 0), Vec3(0, 0, 1), Vec3(0, 0, -1)):
+        raycast(position + Vec3(0, 1, 0), side, traverse_target=target, distance=.5)
+    return raycast(position + Vec3(0, PLAYER_HEIGHT, 0), Vec3(0, -1, 0), traverse_target=target)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def measure(floors, args):
+    layout = validate_layout(generate_hotel(args.seed, floors))
+    segments = make_segments(layout)
+    before, before_solids = build_before(segments)
+    grid = build_after(segments, args.cell_size)
+    before.detachNode()
+
+    path = walk(segments, args.frames, Random(args.seed))
+    timings = {'before': [], 'after': []}
+    ground = {'before': [], 'after': []}
+    for name in ('before', 'after'):
+        # Only the one being measured is in the scene
+        if name == 'before':
+            before.reparentTo(scene)
+            grid.root.detachNode()
+        else:
+            before.detachNode()
+            grid.root.reparentTo(scene)
+        for position, direction in path:
+            start = time.perf_counter()
+            if name == 'after':
+                grid.update(position)
+                hit = movement_rays(position, direction, grid.root)
+            else:
+                hit = movement_rays(position, direction, before)
+            timings[name].append((time.perf_counter() - start) * 1e6)
+            ground[name].append(hit.distance if hit.hit else None)
+
+    # The same floor under the player either way, give or take the stairs turned ramps
+    agree = sum(1 for a, b in zip(ground['before'], ground['after'])
+                if (a is None) == (b is None) and (a is None or abs(a - b) < 0.35))
+    stats = grid.stats
+    result = {
+        'segments': len(segments),
+        'before': {'solids': before_solids, 'colliders': before.getNumChildren(),
+                   'mean_us': round(sum(timings['before']) / len(path), 1),
+                   'p50_us': round(percentile(timings['before'], 0.5), 1),
+                   'p95_us': round(percentile(timings['before'], 0.95), 1)},
+        'after': {'solids': stats['solids'] + stats['dynamic'], 'source_boxes': stats['source_boxes'],
+                  'cell_entities': stats['entities'], 'dynamic': stats['dynamic'],
+                  'mean_us': round(sum(timings['after']) / len(path), 1),
+                  'p50_us': round(percentile(timings['after'], 0.5), 1),
+                  'p95_us': round(percentile(timings['after'], 0.95), 1)},
+        'ground_agrees': round(agree / len(path), 3),
+    }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--floors', type=int, nargs='+', default=[1, 20])
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--cell-size', type=float, default=8)
+    args = parser.parse_args()
+
+    Ursina(window_type='none')
+    print(json.dumps({f'{floors}_floors': measure(floors, args) for floors in args.floors}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# python -m benchmarks.bench_flicker [FRAMES]
+#
+# Per-frame cost of the old per-object FlickeringLight loop against the batched FlickerEngine,
+# driving real ursina PointLights (no window needed).
+import sys
+import time
+from random import uniform
+
+from panda3d.core import PointLight as PandaPointLight
+from ursina import Color, Entity, lerp
+
+from flicker import FlickerEngine
+
+
+class BenchLight(Entity):
+    # Stand-in for ursina's PointLight: same color property, without needing a running app
+    def __init__(self, light_color):
+        super().__init__(add_to_scene_entities=False)
+        self._light = PandaPointLight('point_light')
+        self.attachNewNode(self._light)
+        self.color = light_color
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, value):
+        self._color = value
+        self._light.setColor(value)
+
+
+class FlickeringLight:
+    # The per-object controller main.py used before FlickerEngine, kept as the baseline
+    def __init__(self, light, interval_range=(0.08, 0.25), intensity_range=(0.35, 1.0)):
+        self.light = light
+        self.interval_range = interval_range
+        self.intensity_range = intensity_range
+        self.base_color = (light.color.r, light.color.g, light.color.b, light.color.a)
+        self.current_intensity = intensity_range[1]
+        self.target_intensity = intensity_range[1]
+        self.timer = uniform(*self.interval_range)
+
+    def update(self, dt):
+        self.timer -= dt
+        if self.timer <= 0:
+            self.timer = uniform(*self.interval_range)
+            self.target_intensity = uniform(*self.intensity_range)
+        self.current_intensity = lerp(self.current_intensity, self.target_intensity, min(1, dt * 8))
+        clamped = max(0.0, min(1.0, self.current_intensity))
+        r, g, b, a = self.base_color
+        self.light.color = Color(
+            max(0.0, min(1.0, r * clamped)),
+            max(0.0, min(1.0, g * clamped)),
+            max(0.0, min(1.0, b * clamped)),
+            a
+        )
+
+
+def make_lights(count):
+    return [BenchLight(Color(uniform(0.3, 0.6), uniform(0, 0.15), uniform(0, 0.3), 1)) for _ in range(count)]
+
+
+def run(count, frames, dt=1 / 60):
+    controllers = [FlickeringLight(light, intensity_range=(0.1, 0.9)) for light in make_lights(count)]
+    start = time.perf_counter()
+    for _ in range(frames):
+        for controller in controllers:
+            controller.update(dt)
+    loop_ms = (time.perf_counter() - start) * 1000 / frames
+
+    engine = FlickerEngine(seed=1)
+    for light in make_lights(count):
+        engine.add(light, intensity_range=(0.1, 0.9))
+    pushed = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        pushed += engine.step(dt)
+    engine_ms = (time.perf_counter() - start) * 1000 / frames
+    return loop_ms, engine_ms, pushed / frames
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f'{frames} frames at 60 fps')
+    print(f'{"lights":>7} {"loop ms/frame":>14} {"engine ms/frame":>16} {"speedup":>8} {"pushes/frame":>13}')
+    for count in (10, 100, 1000):
+        loop_ms, engine_ms, pushes = run(count, frames)
+        print(f'{count:>7} {loop_ms:>14.3f} {engine_ms:>16.3f} {loop_ms / engine_ms:>7.1f}x {pushes:>13.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# python -m benchmarks.bench_generator [FLOORS] [SEED]
+#
+# Times layout generation (no rendering) and reports the entity count each floor would build.
+import json
+import sys
+import time
+
+from generator import generate_floor, generate_hotel
+from layout import count_entities, validate_layout
+
+
+def main():
+    floors = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    print(f'seed {seed}, {floors} floors')
+    print(f'{"floor":>5} {"segments":>9} {"rooms":>6} {"entities":>9} {"ms":>8}')
+    z = 0
+    for index in range(floors):
+        start = time.perf_counter()
+        segments, z = generate_floor(seed, index, z, top=index == floors - 1)
+        elapsed = (time.perf_counter() - start) * 1000
+        entities = sum(count_entities(segment['items']) for segment in segments)
+        rooms = sum(segment['kind'] == 'room' for segment in segments)
+        print(f'{index:>5} {len(segments):>9} {rooms:>6} {entities:>9} {elapsed:>8.3f}')
+
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        layout = generate_hotel(seed, floors)
+    generate_ms = (time.perf_counter() - start) * 1000 / runs
+
+    start = time.perf_counter()
+    validate_layout(layout)
+    validate_ms = (time.perf_counter() - start) * 1000
+
+    entities = sum(count_entities(segment['items']) for segment in layout['segments'])
+    deterministic = json.dumps(layout) == json.dumps(generate_hotel(seed, floors))
+    print(f'total: {len(layout["segments"])} segments, {entities} entities ({entities / floors:.0f} per floor)')
+    print(f'generate: {generate_ms:.2f} ms (mean of {runs}), validate: {validate_ms:.2f} ms')
+    print(f'deterministic: {deterministic}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# python -m benchmarks.bench_interactables [QUERIES]
+#
+# "Nearest interactable within 5 units" for thousands of switches, doors and tables:
+# a Panda3D collision ray against every collider (what ursina's raycast does) against the
+# InteractionGrid, which only visits the cells the ray passes through. No window needed.
+import math
+import sys
+import time
+from random import Random
+
+from panda3d.core import (BitMask32, CollisionBox, CollisionHandlerQueue, CollisionNode, CollisionRay,
+                          CollisionTraverser, NodePath, Point3)
+
+from interactables import InteractionGrid
+
+SPACING = 3
+
+
+def make_world(count, rng):
+    # Interactables scattered over a square floor, a wall every few rows to block rays
+    root = NodePath('world')
+    grid = InteractionGrid()
+    side = math.ceil(math.sqrt(count)) * SPACING
+    for i in range(count):
+        node = root.attachNewNode(f'interactable_{i}')
+        node.setPos(rng.uniform(0, side), rng.uniform(0.5, 2), rng.uniform(0, side))
+        node.setH(rng.choice((0, 90, 180, 270)))
+        node.setScale(rng.uniform(0.2, 2), rng.uniform(0.3, 3), rng.uniform(0.05, 1))
+        collider = node.attachNewNode(CollisionNode('collider'))
+        collider.node().addSolid(CollisionBox(Point3(0, 0, 0), 0.5, 0.5, 0.5))
+        grid.add(node, (0, 0, 0), (1, 1, 1))
+
+    walls = []
+    for z in range(0, int(side), SPACING * 4):
+        center, half = (side / 2, 3, z), (side / 2, 3, 0.1)
+        wall = root.attachNewNode(CollisionNode('wall'))
+        wall.node().addSolid(CollisionBox(Point3(*center), *half))
+        walls.append((center, half))
+    grid.add_occluders('walls', walls)
+    return root, grid, side
+
+
+def make_queries(count, side, rng):
+    queries = []
+    for _ in range(count):
+        origin = (rng.uniform(0, side), rng.uniform(1, 2.5), rng.uniform(0, side))
+        angle = rng.uniform(0, math.tau)
+        queries.append((origin, (math.cos(angle), rng.uniform(-0.3, 0.3), math.sin(angle))))
+    return queries
+
+
+def run(count, queries, rng):
+    root, grid, side = make_world(count, rng)
+    rays = make_queries(queries, side, rng)
+
+    traverser = CollisionTraverser()
+    queue = CollisionHandlerQueue()
+    ray = CollisionRay()
+    ray_node = CollisionNode('ray')
+    ray_node.addSolid(ray)
+    ray_node.setFromCollideMask(BitMask32.allOn())
+    ray_path = root.attachNewNode(ray_node)
+    traverser.addCollider(ray_path, queue)
+
+    start = time.perf_counter()
+    hits_full = 0
+    for origin, direction in rays:
+        ray.setOrigin(*origin)
+        ray.setDirection(*direction)
+        traverser.traverse(root)
+        if queue.getNumEntries():
+            queue.sortEntries()
+            entry = queue.getEntry(0)
+            if (entry.getSurfacePoint(root) - Point3(*origin)).length() <= 5 and entry.getIntoNode().getName() == 'collider':
+                hits_full += 1
+    full_ms = (time.perf_counter() - start) * 1000 / queries
+
+    start = time.perf_counter()
+    hits_grid = 0
+    tests = 0
+    for origin, direction in rays:
+        if grid.raycast(origin, direction, distance=5) is not None:
+            hits_grid += 1
+        tests += grid.last_query['tests']
+    grid_ms = (time.perf_counter() - start) * 1000 / queries
+    return full_ms, grid_ms, hits_full, hits_grid, tests / queries
+
+
+def main():
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = Random(1)
+    print(f'{queries} rays of 5 units')
+    print(f'{"interactables":>13} {"full ms/ray":>12} {"grid ms/ray":>12} {"speedup":>8} {"boxes tested":>13} {"hits":>11}')
+    for count in (100, 1000, 5000, 20000):
+        full_ms, grid_ms, hits_full, hits_grid, tests = run(count, queries, rng)
+        print(f'{count:>13} {full_ms:>12.4f} {grid_ms:>12.4f} {full_ms / grid_ms:>7.1f}x {tests:>13.1f} {hits_full:>5}/{hits_grid:<5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# python -m benchmarks.bench_mesh_cache [--decimate RATIO] [OBJ ...]
+#
+# Compares loading the OBJ assets the old way (ursina parsing the text file) with the binary
+# mesh cache, both cold (cache has to be built) and warm (cache file already there).
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ursina.mesh_importer import obj_to_ursinamesh
+
+from asset_cache import ROOT, compile_mesh, read_mesh
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    args = sys.argv[1:]
+    ratio = None
+    if '--decimate' in args:
+        ratio = float(args[args.index('--decimate') + 1])
+        del args[args.index('--decimate'):args.index('--decimate') + 2]
+    paths = [Path(arg) for arg in args] or sorted((ROOT / 'assets' / '3d').glob('*.obj'))
+
+    totals = [0.0, 0.0, 0.0]
+    print(f'{"asset":<22} {"text obj ms":>12} {"cold ms":>9} {"warm ms":>9} {"obj KB":>8} {"cache KB":>9} {"triangles":>10}')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for path in paths:
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, text_ms = timed(obj_to_ursinamesh, path=path.parent, name=path.stem, return_mesh=True)
+
+            start = time.perf_counter()
+            out = compile_mesh(path, ratio, cache_dir=cache_dir)
+            read_mesh(out)
+            cold_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            out = compile_mesh(path, ratio, cache_dir=cache_dir)
+            node = read_mesh(out)
+            warm_ms = (time.perf_counter() - start) * 1000
+
+            triangles = node.node().getGeom(0).getPrimitive(0).getNumFaces()
+            for i, value in enumerate((text_ms, cold_ms, warm_ms)):
+                totals[i] += value
+            print(f'{path.name:<22} {text_ms:>12.1f} {cold_ms:>9.1f} {warm_ms:>9.1f} '
+                  f'{path.stat().st_size / 1024:>8.0f} {out.stat().st_size / 1024:>9.0f} {triangles:>10}')
+
+    print(f'{"total":<22} {totals[0]:>12.1f} {totals[1]:>9.1f} {totals[2]:>9.1f}')
+    print(f'warm cache is {totals[0] / max(totals[2], 1e-6):.0f}x faster than parsing the text OBJ files')
+
+
+if __name__ == '__main__':
+    main()
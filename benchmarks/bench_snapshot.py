@@ -0,0 +1,130 @@
+# python -m benchmarks.bench_snapshot [--seed SEED --floors N] [--saves N]
+#
+# Cost of saving and resuming, without a window: capturing the world state on the main
+# thread, encoding it (all sections, then only what one door changed), the file size with
+# and without compression, and reading a save back into a freshly made world.
+import argparse
+import json
+import os
+import tempfile
+import time
+from random import Random
+
+from generator import generate_hotel
+from layout import load_layout, validate_layout
+from snapshot import SnapshotWriter, decode, encode, read_snapshot, restore_segment, segment_state
+from streaming import make_segments
+
+TEXTURES = ['assets/photo_placeholder1.png', 'assets/photo_placeholder2.png', 'assets/photo_placeholder3.png']
+
+
+def make_world(args):
+    layout = load_layout('layouts/hotel.json') if args.seed is None else validate_layout(generate_hotel(args.seed, args.floors))
+    segments = make_segments(layout)
+    rooms = {segment['name']: next((item for item in segment['items'] if item['type'] == 'room'), None)
+             for segment in layout['segments'] if segment['kind'] == 'room'}
+    for i, item in enumerate(item for segment in segments for item in segment.items if item['type'] in ('painting', 'photo_table')):
+        item['texture'] = TEXTURES[i % len(TEXTURES)]
+    return layout, segments, rooms
+
+
+def play(segments, rooms, rng):
+    # What an hour of play leaves behind: doors open and locked, switches off, retinted lights, tables moved
+    for segment in segments:
+        for item in segment.items:
+            if item['type'] == 'door':
+                item['open'] = rng.random() < 0.5
+                item['locked'] = rng.random() < 0.1
+            elif item['type'] == 'point_light':
+                if rng.random() < 0.3:
+                    item['color'] = (rng.randrange(256), rng.randrange(40), rng.randrange(70))
+                if item.get('switch') and rng.random() < 0.3:
+                    item['switch']['on'] = False
+            elif item['type'] == 'photo_table':
+                x, y, z = item['position']
+                item['position'] = (x + rng.uniform(-1, 1), y, z + rng.uniform(-1, 1))
+                item['crept'] = rng.uniform(0, 2.5)
+    for room in rooms.values():
+        if room and rng.random() < 0.3:
+            room['locked'] = True
+
+
+def capture(segments, rooms):
+    snapshot = {'meta': {'layout': 'layouts/hotel.json', 'seed': None, 'floors': 0, 'saved': time.time()},
+                'player': (1.0, 0.0, 2.0, 90.0, -10.0)}
+    for segment in segments:
+        snapshot[f'segment/{segment.name}'] = segment_state(segment, rooms.get(segment.name))
+    return snapshot
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', type=int, default=None, help='a generated hotel instead of the default layout')
+    parser.add_argument('--floors', type=int, default=3)
+    parser.add_argument('--saves', type=int, default=50, help='incremental saves to time')
+    args = parser.parse_args()
+
+    _, segments, rooms = make_world(args)
+    play(segments, rooms, Random(1))
+    snapshot, capture_ms = timed(lambda: capture(segments, rooms), 20)
+    data, encode_ms = timed(lambda: encode(snapshot), 20)
+    raw = encode(snapshot, compress=False)
+    decoded, decode_ms = timed(lambda: decode(data), 20)
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'autosave.occ')
+        writer = SnapshotWriter(path)
+        writer.save(snapshot)
+        writer.flush()
+        first_write_ms = writer.last_write_ms
+        door = next(item for segment in segments for item in segment.items if item['type'] == 'door')
+        save_ms, write_ms = [], []
+        for _ in range(args.saves):
+            door['open'] = not door.get('open')
+            start = time.perf_counter()
+            writer.save(capture(segments, rooms))
+            save_ms.append((time.perf_counter() - start) * 1000)
+            writer.flush()
+            write_ms.append(writer.last_write_ms)
+        read_ms = timed(lambda: read_snapshot(path), 20)[1]
+        stats = writer.stats
+
+    _, fresh, fresh_rooms = make_world(args)
+
+    def restore():
+        for segment in fresh:
+            restore_segment(segment, decoded[f'segment/{segment.name}'], fresh_rooms.get(segment.name))
+
+    restore_ms = timed(restore, 1)[1]
+    # Floats go through float32, so compare the two worlds as a save sees them
+    expected, actual = decode(encode(capture(segments, rooms))), decode(encode(capture(fresh, fresh_rooms)))
+    matches = all(expected[name] == actual[name] for name in expected if name.startswith('segment/'))
+
+    print(json.dumps({
+        'layout': 'layouts/hotel.json' if args.seed is None else {'seed': args.seed, 'floors': args.floors},
+        'segments': len(segments),
+        'items': sum(len(segment.items) for segment in segments),
+        'bytes': len(data),
+        'bytes_uncompressed': len(raw),
+        'capture_ms': round(capture_ms, 3),
+        'encode_ms': round(encode_ms, 3),
+        'decode_ms': round(decode_ms, 3),
+        'read_ms': round(read_ms, 3),
+        'restore_ms': round(restore_ms, 3),
+        'first_write_ms': round(first_write_ms, 3),
+        'save_call_ms': round(sum(save_ms) / len(save_ms), 3),
+        'incremental_write_ms': round(sum(write_ms) / len(write_ms), 3),
+        'writer': stats,
+        'round_trip': matches,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
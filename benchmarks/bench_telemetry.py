@@ -0,0 +1,89 @@
+# python -m benchmarks.bench_telemetry [HOURS]
+#
+# Per-frame cost of Telemetry.update over a long session: a player wandering between rooms
+# at 60 fps, stopping now and then and pressing E. The cost per frame, and the memory
+# used, should be the same in the last minute as in the first. No window needed.
+import math
+import sys
+import time
+import tracemalloc
+from random import Random
+
+from telemetry import Telemetry
+
+FPS = 60
+ROOM_SIZE = 10
+
+
+def make_rooms(side):
+    return [(f'room_{x}_{z}', (x * ROOM_SIZE, 0, z * ROOM_SIZE), ((x + 1) * ROOM_SIZE, 4, (z + 1) * ROOM_SIZE))
+            for x in range(side) for z in range(side)]
+
+
+class Walker:
+    # Walks towards random points, stands still for a while on arrival
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.position = [size / 2, 0.0, size / 2]
+        self.target = self.position[:]
+        self.wait = 0.0
+        self.yaw = 0.0
+
+    def step(self, dt):
+        if self.wait > 0:
+            self.wait -= dt
+            self.yaw += self.rng.uniform(-90, 90) * dt
+            return
+        dx, dz = self.target[0] - self.position[0], self.target[2] - self.position[2]
+        distance = math.hypot(dx, dz)
+        if distance < 0.5:
+            self.target = [self.rng.uniform(0, self.size), 0.0, self.rng.uniform(0, self.size)]
+            self.wait = self.rng.choice((0, 0, 0.5, 3))
+            return
+        self.yaw = math.degrees(math.atan2(dx, dz))
+        self.position[0] += dx / distance * 6 * dt
+        self.position[2] += dz / distance * 6 * dt
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    rng = Random(1)
+    side = 8
+    telemetry = Telemetry(make_rooms(side))
+    walker = Walker(side * ROOM_SIZE, rng)
+    frames = int(hours * 3600 * FPS)
+    minute = 60 * FPS
+    dt = 1 / FPS
+
+    tracemalloc.start()
+    windows = []
+    total = window = 0.0
+    for frame in range(frames):
+        walker.step(dt)
+        start = time.perf_counter()
+        telemetry.update(dt, walker.position, walker.yaw, 0)
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        window += elapsed
+        if frame % 600 == 0:
+            telemetry.record(rng.choice(('switch', 'door', 'photo', 'miss')), walker.position)
+        if frame % 1800 == 0:
+            telemetry.light_switched((rng.uniform(0, side * ROOM_SIZE), 1.5, rng.uniform(0, side * ROOM_SIZE)), rng.random() < 0.5)
+        if frame % minute == minute - 1:
+            windows.append(window * 1e6 / minute)
+            window = 0.0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{hours:g} h at {FPS} fps: {frames} frames, {telemetry.count} samples, {telemetry.event_count} events')
+    print(f'telemetry per frame: mean {total * 1e6 / frames:.2f} us, '
+          f'first minute {windows[0]:.2f} us, last minute {windows[-1]:.2f} us, worst minute {max(windows):.2f} us')
+    print(f'python memory: {current / 1024:.0f} KB now, {peak / 1024:.0f} KB peak; ring buffers {telemetry.stats["buffer_kb"]} KB')
+    stats = telemetry.stats
+    print(f'rooms visited {stats["rooms_visited"]}, revisits {stats["revisits"]}, stops {stats["stops"]}, '
+          f'hesitations {stats["hesitations"]}, lit {stats["lit"]:.0f} s, dark {stats["dark"]:.0f} s')
+
+
+if __name__ == '__main__':
+    main()
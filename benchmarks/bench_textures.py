@@ -0,0 +1,68 @@
+# python -m benchmarks.bench_textures [ROUNDS]
+#
+# Load time and GPU memory of every image under assets/: decoding the source PNG/JPG the
+# way ursina does (full size, no mipmaps) against reading each texture_cache tier.
+import sys
+import time
+
+from panda3d.core import Filename, Texture
+
+from texture_cache import QUALITY_TIERS, ROOT, SOURCE_SUFFIXES, compile_texture, read_texture, texture_memory
+
+KB = 1024
+
+
+def read_source(path):
+    texture = Texture()
+    if not texture.read(Filename.fromOsSpecific(str(path))):
+        return None
+    return texture
+
+
+def timed(load, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        texture = load()
+    return texture, (time.perf_counter() - start) * 1000 / rounds
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    sources = sorted(p for p in (ROOT / 'assets').iterdir() if p.suffix.lower() in SOURCE_SUFFIXES)
+    tiers = list(QUALITY_TIERS)
+
+    header = f'{"texture":<26} {"source ms":>9} {"source KB":>9}'
+    for tier in tiers:
+        header += f' {tier + " ms":>10} {tier + " KB":>10}'
+    print(header)
+
+    totals = {'source': [0.0, 0]}
+    totals.update({tier: [0.0, 0] for tier in tiers})
+    compile_ms = 0.0
+    for path in sources:
+        texture, load_ms = timed(lambda: read_source(path), rounds)
+        if texture is None:
+            print(f'{path.name:<26} unreadable, skipped')
+            continue
+        row = f'{path.name:<26} {load_ms:>9.1f} {texture_memory(texture) / KB:>9.0f}'
+        totals['source'][0] += load_ms
+        totals['source'][1] += texture_memory(texture)
+        for tier in tiers:
+            start = time.perf_counter()
+            out = compile_texture(path, tier)
+            compile_ms += (time.perf_counter() - start) * 1000
+            texture, load_ms = timed(lambda: read_texture(out), rounds)
+            row += f' {load_ms:>10.1f} {texture_memory(texture) / KB:>10.0f}'
+            totals[tier][0] += load_ms
+            totals[tier][1] += texture_memory(texture)
+        print(row)
+
+    row = f'{"total":<26} {totals["source"][0]:>9.1f} {totals["source"][1] / KB:>9.0f}'
+    for tier in tiers:
+        row += f' {totals[tier][0]:>10.1f} {totals[tier][1] / KB:>10.0f}'
+    print(row)
+    print(f'cache check and build: {compile_ms:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
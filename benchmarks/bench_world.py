@@ -0,0 +1,233 @@
+# python -m benchmarks.bench_world [--frames N] [--seed SEED --floors N] [--window-type offscreen|none] [--texture-quality source|high|medium|low] [--blocking] [--mutations N] [--no-portals] [--no-lod] [--no-lightmaps] [--no-prefabs] [--no-atlas] [--no-shadow-cache] [--profile [--trace FILE]] [--out FILE]
+#
+# Builds the game world and runs the frame loop without a desktop session. It reports
+# entity and node counts, time to first frame and to interactive, the loading frames,
+# per-frame update time percentiles, interaction cost and peak memory as JSON, so runs can
+# be compared against each other. --blocking builds the world in one call as before.
+# The default 'offscreen' window renders into a buffer with whatever GL is available
+# (Mesa's llvmpipe works on a CPU-only box). 'none' skips rendering altogether.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# ursina takes its asset folder from the script being run, as soon as it is imported
+sys.argv[0] = os.path.join(ROOT, 'main.py')
+
+from lod import count_triangles
+from texture_cache import texture_memory
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        'mean': round(sum(ordered) / len(ordered), 4),
+        'p50': pick(0.5),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': round(ordered[-1], 4),
+    }
+
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def walk_path(game, frames):
+    # Visit every segment in layout order, spread over the run, so streaming and culling are exercised
+    stops = [((s.lo[0] + s.hi[0]) / 2, s.lo[1] + 1, (s.lo[2] + s.hi[2]) / 2) for s in game.level_segments]
+    return [stops[min(len(stops) - 1, i * len(stops) // frames)] for i in range(frames)]
+
+
+def scene_counts(game):
+    textures = game.app.render.findAllTextures()
+    gsg = game.app.win.getGsg() if game.app.win else None
+    return {
+        'entities': len(game.scene.entities),
+        'nodes': game.app.render.countNumDescendants(),
+        'geom_nodes': game.app.render.findAllMatches('**/+GeomNode').getNumPaths(),
+        'textures': textures.getNumTextures(),
+        'texture_mb': round(sum(texture_memory(t, gsg) for t in textures.getTextures()) / (1024 * 1024), 2),
+    }
+
+
+def bench_interactions(game, limit):
+    # Look at each loaded interactable from two units away, from whichever side can see it, and press E
+    samples, hits = [], 0
+    entries = [entry for entry in game.interactables.entries.values() if entry.interactive]
+    for entry in entries[:limit]:
+        center = game.Vec3(*[(lo + hi) / 2 for lo, hi in zip(entry.lo, entry.hi)])
+        for side in (-2, 2):
+            eye = center + entry.target.forward * side
+            if game.interactables.raycast(eye, center - eye, game.INTERACT_DISTANCE) is entry.target:
+                hits += 1
+                break
+        game.camera.world_position = eye
+        game.camera.look_at(center)
+        start = time.perf_counter()
+        game.attempt_interaction()
+        samples.append((time.perf_counter() - start) * 1000)
+        game.hide_photo()
+    return samples, hits
+
+
+def run(args):
+    os.environ['OCCUPIED_WINDOW_TYPE'] = args.window_type
+    start = time.perf_counter()
+    import main as game
+    import_ms = (time.perf_counter() - start) * 1000
+
+    game.LAYOUT_SEED = args.seed
+    game.LAYOUT_FLOORS = args.floors
+    game.PORTAL_CULLING = not args.no_portals
+    # Leave the player's save alone
+    game.AUTOSAVE_INTERVAL = float('inf')
+    if args.no_lod:
+        game.lod.distances = ()
+    game.LIGHTMAPS = not args.no_lightmaps
+    game.ROOM_PREFABS = not args.no_prefabs
+    game.TEXTURE_ATLAS = not args.no_atlas
+    game.SHADOW_CACHE = not args.no_shadow_cache
+    if args.profile or args.trace:
+        game.profiler.enable()
+    if args.texture_quality:
+        game.TEXTURE_QUALITY = None if args.texture_quality == 'source' else args.texture_quality
+    start = time.perf_counter()
+    game.start_game(block=args.blocking)
+    # The world is built a slice per frame behind the loading screen
+    loading_ms = []
+    while game.game_state == 'loading':
+        frame_start = time.perf_counter()
+        game.update()
+        game.app.step()
+        loading_ms.append((time.perf_counter() - frame_start) * 1000)
+    build_ms = (time.perf_counter() - start) * 1000
+    after_build = scene_counts(game)
+
+    # The camera is moved for interactions; the player walks with gravity off so it stays on the path
+    game.player.gravity = 0
+    # Queued up front; each is applied once its room is out of view
+    kinds = list(game.MUTATIONS)
+    rooms = list(game.room_segments)
+    for i in range(args.mutations if rooms else 0):
+        game.queue_mutation(rooms[i % len(rooms)], kinds[i % len(kinds)])
+    update_ms, step_ms, frame_ms, mutation_ms, visible_cells = [], [], [], [], []
+    lod_triangles, scene_triangles = [], []
+    for frame, position in enumerate(walk_path(game, args.frames)):
+        game.player.position = position
+        start = time.perf_counter()
+        game.update()
+        middle = time.perf_counter()
+        game.app.step()
+        end = time.perf_counter()
+        update_ms.append((middle - start) * 1000)
+        step_ms.append((end - middle) * 1000)
+        frame_ms.append((end - start) * 1000)
+        mutation_ms.append(game.mutations.last_frame_ms)
+        if game.portals:
+            visible_cells.append(game.portals.frame_stats['visible'])
+        lod_triangles.append(game.lod.frame_stats['triangles'])
+        if frame % 30 == 0:
+            # Walking the whole scene graph is too slow to do every frame
+            scene_triangles.append(count_triangles(game.app.render, visible_only=True))
+    after_walk = scene_counts(game)
+
+    interaction_ms, interaction_hits = bench_interactions(game, args.interactions)
+    if args.trace:
+        game.profiler.export_trace(args.trace)
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'window_type': args.window_type,
+        'renderer': game.app.win.getGsg().getDriverRenderer() if game.app.win else None,
+        'layout': game.LAYOUT_PATH if args.seed is None else {'seed': args.seed, 'floors': args.floors},
+        'texture_quality': game.TEXTURE_QUALITY,
+        'frames': args.frames,
+        'import_ms': round(import_ms, 2),
+        'build_ms': round(build_ms, 2),
+        'first_frame_ms': round(game.startup_times.get('first_frame', 0), 2),
+        'interactive_ms': round(game.startup_times['interactive'], 2),
+        'loading_frames': len(loading_ms),
+        'loading_frame_ms': percentiles(loading_ms),
+        'startup_stages': game.loader.stats,
+        'after_build': after_build,
+        'after_walk': after_walk,
+        'update_ms': percentiles(update_ms),
+        'engine_step_ms': percentiles(step_ms),
+        'frame_ms': percentiles(frame_ms),
+        'interaction_ms': percentiles(interaction_ms),
+        'interactions': len(interaction_ms),
+        'interaction_hits': interaction_hits,
+        'streaming': game.world.stats if game.world else None,
+        'lights': game.light_budget.stats,
+        'shadow_cache': game.shadow_cache.stats,
+        'telemetry': game.telemetry.stats,
+        'mutation_ms': percentiles(mutation_ms),
+        'mutations': game.mutations.stats,
+        'portals': dict(game.portals.stats, mean_visible=round(sum(visible_cells) / len(visible_cells), 2)) if visible_cells else None,
+        'lod': game.lod.stats,
+        'collision': game.colliders.stats,
+        'prefabs': game.prefabs.stats,
+        'atlas': game.atlas.stats,
+        'photos': game.photo_cache.stats,
+        'profile': game.profiler.stats if game.profiler.enabled else None,
+        'lod_triangles': percentiles(lod_triangles),
+        'scene_triangles': percentiles(scene_triangles),
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=None, help='play a generated hotel instead of the default layout')
+    parser.add_argument('--floors', type=int, default=3)
+    parser.add_argument('--window-type', default=os.environ.get('OCCUPIED_WINDOW_TYPE', 'offscreen'))
+    parser.add_argument('--interactions', type=int, default=200)
+    parser.add_argument('--texture-quality', default=None, help="texture cache tier, or 'source' to load the original images")
+    parser.add_argument('--mutations', type=int, default=0, help='room mutations to queue before the walk')
+    parser.add_argument('--no-portals', action='store_true', help='draw every built segment, as before portal culling')
+    parser.add_argument('--no-lod', action='store_true', help='keep every prop at full detail')
+    parser.add_argument('--no-lightmaps', action='store_true', help='give every light its own PointLight, as before baking')
+    parser.add_argument('--no-prefabs', action='store_true', help='build every room on its own, as before room prefabs')
+    parser.add_argument('--no-atlas', action='store_true', help='give paintings, photos and doors their own textures, as before the atlas')
+    parser.add_argument('--no-shadow-cache', action='store_true', help="let Panda3D redraw every shadow map each frame")
+    parser.add_argument('--profile', action='store_true', help="time the game's own scopes and report them")
+    parser.add_argument('--trace', default=None, help='with --profile, write a Chrome trace of the run here')
+    parser.add_argument('--blocking', action='store_true', help='build the whole world before the first frame')
+    parser.add_argument('--out', default=None, help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    # ursina prints its banner and warnings to stdout; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+from panda3d.core import CollisionBox, CollisionPolygon, NodePath, Point3
+from ursina import BoxCollider, Entity, destroy
+from ursina.collider import Collider
+
+
+# Boxes this close count as touching
+EPSILON = 1e-3
+# Fewer equal boxes than this climbing one after another are left as boxes, not a ramp
+MIN_STEPS = 3
+
+
+def box_bounds(center, half):
+    return tuple(center[i] - half[i] for i in range(3)), tuple(center[i] + half[i] for i in range(3))
+
+
+def bounds_box(lo, hi):
+    return tuple((lo[i] + hi[i]) / 2 for i in range(3)), tuple((hi[i] - lo[i]) / 2 for i in range(3))
+
+
+def merge_boxes(boxes):
+    # Boxes with the same extent on two axes that touch or overlap on the third become one,
+    # axis after axis until nothing changes: a wall built in pieces, a row of floor tiles.
+    # Boxes inside another one go.
+    bounds = [box_bounds(center, half) for center, half in boxes]
+    changed = True
+    while changed:
+        changed = False
+        for axis in range(3):
+            others = [i for i in range(3) if i != axis]
+            groups = {}
+            for lo, hi in bounds:
+                key = tuple(round(v, 3) for i in others for v in (lo[i], hi[i]))
+                groups.setdefault(key, []).append((lo, hi))
+            bounds = []
+            for group in groups.values():
+                group.sort(key=lambda box: box[0][axis])
+                lo, hi = group[0]
+                for next_lo, next_hi in group[1:]:
+                    if next_lo[axis] <= hi[axis] + EPSILON:
+                        hi = tuple(max(hi[i], next_hi[i]) for i in range(3))
+                        changed = True
+                    else:
+                        bounds.append((lo, hi))
+                        lo, hi = next_lo, next_hi
+                bounds.append((lo, hi))
+
+    bounds.sort(key=lambda box: -volume(*box))
+    kept = []
+    for lo, hi in bounds:
+        if not any(contains(outer, (lo, hi)) for outer in kept):
+            kept.append((lo, hi))
+    return [bounds_box(lo, hi) for lo, hi in kept]
+
+
+def volume(lo, hi):
+    return (hi[0] - lo[0]) * (hi[1] - lo[1]) * (hi[2] - lo[2])
+
+
+def contains(outer, inner):
+    return all(outer[0][i] - EPSILON <= inner[0][i] and inner[1][i] <= outer[1][i] + EPSILON for i in range(3))
+
+
+def find_stairs(boxes, min_steps=MIN_STEPS):
+    # Runs of equal boxes each standing one box higher and one box further along x or z
+    # than the one before: (indices, axis, direction), lowest step first
+    index = {tuple(round(v, 3) for v in center): i for i, (center, half) in enumerate(boxes)}
+    following = {}
+    for i, (center, half) in enumerate(boxes):
+        if half[1] <= 0:
+            continue
+        for axis in (0, 2):
+            for sign in (1, -1):
+                step = list(center)
+                step[axis] += sign * half[axis] * 2
+                step[1] += half[1] * 2
+                j = index.get(tuple(round(v, 3) for v in step))
+                if j is not None and all(abs(boxes[j][1][k] - half[k]) < EPSILON for k in range(3)):
+                    following[i] = (j, axis, sign)
+
+    followed = {j for j, _, _ in following.values()}
+    stairs = []
+    for i in following:
+        if i in followed:
+            continue
+        _, axis, sign = following[i]
+        chain = [i]
+        while chain[-1] in following and following[chain[-1]][1:] == (axis, sign):
+            chain.append(following[chain[-1]][0])
+        if len(chain) >= min_steps:
+            stairs.append((chain, axis, sign))
+    return stairs
+
+
+def ramp_polygons(first, last, axis, sign):
+    # A wedge over the steps from `first` to `last` (center, half): its slope runs through the
+    # middle of each step's riser, so it is no higher or lower than any step by more than half a riser
+    (center, half), (last_center, _) = first, last
+    across = 2 - axis
+    bottom = center[1] - half[1]
+    low, high = center[1], last_center[1] + half[1] * 2
+    start, end = center[axis] - sign * half[axis], last_center[axis] + sign * half[axis]
+    left, right = center[across] - half[across], center[across] + half[across]
+
+    def point(along, y, side):
+        p = [0.0, y, 0.0]
+        p[axis] = along
+        p[across] = side
+        return p
+
+    faces = [
+        [point(start, low, left), point(start, low, right), point(end, high, right), point(end, high, left)],
+        [point(start, bottom, left), point(start, bottom, right), point(end, bottom, right), point(end, bottom, left)],
+        [point(start, bottom, left), point(start, bottom, right), point(start, low, right), point(start, low, left)],
+        [point(end, bottom, left), point(end, bottom, right), point(end, high, right), point(end, high, left)],
+        [point(start, bottom, left), point(end, bottom, left), point(end, high, left), point(start, low, left)],
+        [point(start, bottom, right), point(end, bottom, right), point(end, high, right), point(start, low, right)],
+    ]
+    middle = point((start + end) / 2, (bottom + (low + high) / 2) / 2, (left + right) / 2)
+    polygons = []
+    for face in faces:
+        # Collision polygons only stop what comes from their front
+        a, b, c = face[0], face[1], face[2]
+        e1 = [b[i] - a[i] for i in range(3)]
+        e2 = [c[i] - a[i] for i in range(3)]
+        normal = (e1[1] * e2[2] - e1[2] * e2[1], e1[2] * e2[0] - e1[0] * e2[2], e1[0] * e2[1] - e1[1] * e2[0])
+        outward = [sum(p[i] for p in face) / 4 - middle[i] for i in range(3)]
+        if sum(normal[i] * outward[i] for i in range(3)) < 0:
+            face.reverse()
+        polygons.append([tuple(p) for p in face])
+    return polygons
+
+
+def simplify(boxes):
+    # A segment's static boxes as fewer solids: stairs as ramps, the rest merged. Returns (boxes, polygons).
+    boxes = [(tuple(center), tuple(half)) for center, half in boxes]
+    polygons = []
+    on_stairs = set()
+    for chain, axis, sign in find_stairs(boxes):
+        polygons.extend(ramp_polygons(boxes[chain[0]], boxes[chain[-1]], axis, sign))
+        on_stairs.update(chain)
+    return merge_boxes([box for i, box in enumerate(boxes) if i not in on_stairs]), polygons
+
+
+class SolidSetCollider(Collider):
+    # Boxes and polygons in one collision node
+    def __init__(self, entity, boxes=(), polygons=()):
+        self.boxes = boxes
+        self.polygons = polygons
+        shapes = [CollisionBox(Point3(*center), *(max(0.001, e) for e in half)) for center, half in boxes]
+        shapes += [CollisionPolygon(*(Point3(*p) for p in points)) for points in polygons]
+        super().__init__(entity, shapes)
+
+
+class ColliderGrid:
+    # What the player walks on and bumps into, kept out of the render scene. Static solids
+    # are added per segment (simplified), split over a uniform grid of cells: one collidable
+    # entity per segment and cell. Moving entities (doors, photo tables) get a stand-in box
+    # that follows them when updated. Only the cells around the player hang under `root`,
+    # so a controller traversing root tests nearby geometry and nothing else; the rest wait
+    # detached.
+    def __init__(self, cell_size=8, reach=1):
+        self.cell_size = cell_size
+        self.reach = reach            # cells either side of the player's that stay active
+        self.root = Entity(name='collision')
+        self.idle = NodePath('idle_collision')
+        self.cells = {}               # cell -> entities in it
+        self.owners = {}              # key -> [(cell, entity)]
+        self.proxies = {}             # target entity -> (cell, proxy entity)
+        self.center = None
+        self.active = set()
+        self.source_boxes = {}        # key -> boxes given before simplifying
+        self.solids = {}              # key -> solids left after
+        self.frame_stats = {}
+
+    def cell(self, point):
+        return tuple(int(point[i] // self.cell_size) for i in range(3))
+
+    def cells_between(self, lo, hi):
+        a, b = self.cell(lo), self.cell(hi)
+        return [(x, y, z) for x in range(a[0], b[0] + 1) for y in range(a[1], b[1] + 1) for z in range(a[2], b[2] + 1)]
+
+    def place(self, cell, entity):
+        self.cells.setdefault(cell, []).append(entity)
+        entity.reparentTo(self.root if cell in self.active else self.idle)
+
+    def unplace(self, cell, entity):
+        entities = self.cells.get(cell, [])
+        if entity in entities:
+            entities.remove(entity)
+        if not entities:
+            self.cells.pop(cell, None)
+
+    def add_static(self, key, boxes):
+        self.remove(key)
+        self.source_boxes[key] = len(boxes)
+        boxes, polygons = simplify(boxes)
+        shares = {}
+        for center, half in boxes:
+            for cell in self.cells_between(*box_bounds(center, half)):
+                shares.setdefault(cell, ([], []))[0].append((center, half))
+        for points in polygons:
+            lo = tuple(min(p[i] for p in points) for i in range(3))
+            hi = tuple(max(p[i] for p in points) for i in range(3))
+            for cell in self.cells_between(lo, hi):
+                shares.setdefault(cell, ([], []))[1].append(points)
+
+        owned = []
+        for cell, (cell_boxes, cell_polygons) in shares.items():
+            holder = Entity(name=f'{key}_collision', add_to_scene_entities=False)
+            holder.collider = SolidSetCollider(holder, cell_boxes, cell_polygons)
+            self.place(cell, holder)
+            owned.append((cell, holder))
+        self.owners[key] = owned
+        self.solids[key] = len(boxes) + len(polygons)
+        return self.solids[key]
+
+    def remove(self, key):
+        self.source_boxes.pop(key, None)
+        self.solids.pop(key, None)
+        for cell, holder in self.owners.pop(key, ()):
+            self.unplace(cell, holder)
+            destroy(holder)
+
+    def add_dynamic(self, target):
+        # A box following target's own BoxCollider
+        proxy = Entity(name=f'{target.name}_collision', add_to_scene_entities=False)
+        proxy.collider = BoxCollider(proxy, center=target.collider.center, size=target.collider.size)
+        self.proxies[target] = (None, proxy)
+        self.update_dynamic(target)
+
+    def update_dynamic(self, target):
+        if target not in self.proxies:
+            return
+        cell, proxy = self.proxies[target]
+        # root and idle both sit at the origin, so this holds wherever the proxy hangs
+        proxy.setMat(target.getMat(self.root))
+        new_cell = self.cell(target.getPos(self.root))
+        if new_cell != cell:
+            if cell is not None:
+                self.unplace(cell, proxy)
+            self.place(new_cell, proxy)
+            self.proxies[target] = (new_cell, proxy)
+
+    def prune(self):
+        # Dynamic entities destroyed with their segment take their stand-ins along
+        for target in [target for target in self.proxies if target.isEmpty()]:
+            cell, proxy = self.proxies.pop(target)
+            self.unplace(cell, proxy)
+            destroy(proxy)
+
+    def update(self, position):
+        center = self.cell(position)
+        moved = center != self.center
+        if moved:
+            r = self.reach
+            active = {(center[0] + x, center[1] + y, center[2] + z)
+                      for x in range(-r, r + 1) for y in range(-r, r + 1) for z in range(-r, r + 1)}
+            for cell in self.active - active:
+                for entity in self.cells.get(cell, ()):
+                    entity.reparentTo(self.idle)
+            for cell in active - self.active:
+                for entity in self.cells.get(cell, ()):
+                    entity.reparentTo(self.root)
+            self.center, self.active = center, active
+
+        self.frame_stats = {
+            'cell': center,
+            'moved': moved,
+            'active_entities': self.root.getNumChildren(),
+        }
+        return moved
+
+    @property
+    def stats(self):
+        return dict(self.frame_stats, cell_size=self.cell_size, reach=self.reach, segments=len(self.owners),
+                    entities=sum(len(entities) for entities in self.cells.values()),
+                    source_boxes=sum(self.source_boxes.values()), solids=sum(self.solids.values()), dynamic=len(self.proxies))
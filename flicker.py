@@ -0,0 +1,124 @@
+import numpy as np
+
+
+# Smallest per-channel change worth sending to a light (one step of an 8-bit channel)
+COLOR_EPSILON = 1 / 256
+
+
+class FlickerEngine:
+    # All flickering lights in a few flat arrays, advanced together once per frame.
+    # Same behaviour as the old per-light FlickeringLight: every light picks a new target
+    # intensity at random intervals and eases towards it, scaling its base color.
+    # Flickered colors go straight to the Panda3D light; the ursina light's .color stays the base color.
+    def __init__(self, capacity=32, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.lights = []
+        self.nodes = []
+        self.free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'timer', None)
+        size = 0 if old is None else len(old)
+
+        def grow(array, *shape):
+            new = np.zeros((capacity,) + shape, dtype=np.float32)
+            if array is not None:
+                new[:size] = array
+            return new
+
+        self.timer = grow(old)
+        self.target = grow(getattr(self, 'target', None))
+        self.current = grow(getattr(self, 'current', None))
+        self.interval = grow(getattr(self, 'interval', None), 2)
+        self.intensity = grow(getattr(self, 'intensity', None), 2)
+        self.base = grow(getattr(self, 'base', None), 4)
+        self.pushed = grow(getattr(self, 'pushed', None), 4)
+        alive = np.zeros(capacity, dtype=bool)
+        if old is not None:
+            alive[:size] = self.alive
+        self.alive = alive
+
+    def __len__(self):
+        return len(self.lights) - len(self.free)
+
+    def add(self, light, interval_range=(0.08, 0.25), intensity_range=(0.35, 1.0)):
+        if self.free:
+            index = self.free.pop()
+            self.lights[index] = light
+            self.nodes[index] = light._light
+        else:
+            index = len(self.lights)
+            if index == len(self.timer):
+                self._allocate(len(self.timer) * 2)
+            self.lights.append(light)
+            self.nodes.append(light._light)
+
+        base = light.color
+        self.base[index] = (base.r, base.g, base.b, base.a)
+        self.pushed[index] = self.base[index]
+        self.interval[index] = interval_range
+        self.intensity[index] = intensity_range
+        self.current[index] = intensity_range[1]
+        self.target[index] = intensity_range[1]
+        self.timer[index] = self.rng.uniform(*interval_range)
+        self.alive[index] = True
+        return index
+
+    def recolor(self, light):
+        # After light.color changes: flicker around the new color
+        for index, known in enumerate(self.lights):
+            if known is light:
+                base = light.color
+                self.base[index] = (base.r, base.g, base.b, base.a)
+                return True
+        return False
+
+    def remove(self, index):
+        if self.alive[index]:
+            self.alive[index] = False
+            self.lights[index] = None
+            self.nodes[index] = None
+            self.free.append(index)
+
+    def prune(self):
+        # Drop lights whose entity has been destroyed
+        for index, light in enumerate(self.lights):
+            if light is not None and light.isEmpty():
+                self.remove(index)
+
+    def clear(self):
+        self.lights.clear()
+        self.nodes.clear()
+        self.free.clear()
+        self.alive[:] = False
+
+    def step(self, dt):
+        count = len(self.lights)
+        if not count:
+            return 0
+        alive = self.alive[:count]
+        timer = self.timer[:count]
+        timer -= dt
+
+        expired = np.flatnonzero((timer <= 0) & alive)
+        if expired.size:
+            interval = self.interval[expired]
+            intensity = self.intensity[expired]
+            timer[expired] = self.rng.uniform(interval[:, 0], interval[:, 1])
+            self.target[expired] = self.rng.uniform(intensity[:, 0], intensity[:, 1])
+
+        current = self.current[:count]
+        current += (self.target[:count] - current) * min(1.0, dt * 8)
+
+        colors = self.base[:count] * np.clip(current, 0.0, 1.0)[:, None]
+        colors[:, 3] = self.base[:count, 3]
+        np.clip(colors, 0.0, 1.0, out=colors)
+
+        changed = np.flatnonzero(alive & (np.abs(colors - self.pushed[:count]).max(axis=1) > COLOR_EPSILON))
+        if changed.size:
+            self.pushed[changed] = colors[changed]
+            nodes = self.nodes
+            for index, rgba in zip(changed.tolist(), colors[changed].tolist()):
+                nodes[index].setColor(tuple(rgba))
+        return changed.size
@@ -0,0 +1,192 @@
+import random
+import sys
+
+from layout import (
+    CORRIDOR_HEIGHT, CORRIDOR_WIDTH, DOOR_HEIGHT, DOOR_WIDTH, LAYOUT_VERSION,
+    dumps_layout, floor, point_light, validate_layout, wall,
+)
+
+
+# Each floor is one corridor running north with rooms off both sides, followed
+# by a stairwell up to the next floor. Floors are offset north as they climb
+# (like the original upper corridor), so no two floors overlap.
+FLOOR_HEIGHT = 6
+SLOT_LENGTH = 12                # corridor length per pair of room slots
+SLOTS_PER_FLOOR = (3, 6)
+ROOM_CHANCE = 0.7
+ROOM_WIDTHS = (8, 10, 12, 14)
+ROOM_DEPTHS = (8, 9, 10, 11)
+STAIRWELL_LENGTH = 20
+STAIR_STEPS = 20
+STAIR_RUN = 0.5
+
+LIGHT_PALETTE = (None, None, None, (140, 50, 20), (90, 20, 20), (190, 170, 120))
+DECORATOR_CHOICES = (
+    (),
+    ('photo_table',),
+    ('photo_table',),
+    ('occult_circle',),
+    ('storage_abattoir',),
+    ('occult_circle', 'photo_table'),
+)
+WALL_LIGHT_RANGES = ((0.35, 1.0), (0.1, 0.85), (0.1, 0.9), (0.05, 0.8), (1.8, 5))
+
+
+def floor_rng(seed, index):
+    # Every floor gets its own stream, so floor N looks the same however many floors are generated
+    return random.Random(f'{seed}:{index}')
+
+
+def side_wall(x, y, z_start, z_end, door_zs):
+    # Wall along a corridor side with a doorway (and lintel) at each door z
+    items = []
+    z = z_start
+    for door_z in sorted(door_zs):
+        if door_z - DOOR_WIDTH / 2 > z:
+            length = door_z - DOOR_WIDTH / 2 - z
+            items.append(wall((x, y + CORRIDOR_HEIGHT / 2, z + length / 2), (0.2, CORRIDOR_HEIGHT, length)))
+        lintel = CORRIDOR_HEIGHT - DOOR_HEIGHT - 0.1
+        items.append(wall((x, y + CORRIDOR_HEIGHT - lintel / 2, door_z), (0.2, lintel, DOOR_WIDTH)))
+        z = door_z + DOOR_WIDTH / 2
+    if z_end > z:
+        items.append(wall((x, y + CORRIDOR_HEIGHT / 2, (z + z_end) / 2), (0.2, CORRIDOR_HEIGHT, z_end - z)))
+    return items
+
+
+def generate_floor(seed, index, z_start, top=False):
+    rng = floor_rng(seed, index)
+    y = index * FLOOR_HEIGHT
+    half = CORRIDOR_WIDTH / 2
+    slots = rng.randint(*SLOTS_PER_FLOOR)
+    length = slots * SLOT_LENGTH
+    z_end = z_start + length
+    prefix = f'floor_{index}'
+
+    corridor = [
+        floor((0, y, z_start + length / 2), (CORRIDOR_WIDTH, 1, length)),
+        wall((0, y + CORRIDOR_HEIGHT, z_start + length / 2), (CORRIDOR_WIDTH, 0.2, length), color='ceiling', texture='assets/wood.jpg', texture_scale=(3, length / 6)),
+    ]
+    if index == 0:
+        corridor.append(wall((0, y + CORRIDOR_HEIGHT / 2, z_start), (CORRIDOR_WIDTH, CORRIDOR_HEIGHT, 0.2)))
+    if top:
+        corridor.append(wall((0, y + CORRIDOR_HEIGHT / 2, z_end), (CORRIDOR_WIDTH, CORRIDOR_HEIGHT, 0.2)))
+
+    rooms = []
+    doors = {'west': [], 'east': []}
+    for slot in range(slots):
+        slot_z = z_start + slot * SLOT_LENGTH + SLOT_LENGTH / 2
+        for side, sign in (('west', -1), ('east', 1)):
+            if rng.random() > ROOM_CHANCE:
+                continue
+            w = rng.choice(ROOM_WIDTHS)
+            d = rng.choice(ROOM_DEPTHS)
+            room = {
+                'type': 'room',
+                'center': (sign * (half + w / 2), slot_z),
+                'size': (w, d),
+                'door_dir': side,
+                'elevation': y,
+            }
+            light_color = rng.choice(LIGHT_PALETTE)
+            if light_color:
+                room['light_color'] = light_color
+            if rng.random() < 0.3:
+                room['flicker'] = True
+            decorators = rng.choice(DECORATOR_CHOICES)
+            if decorators:
+                room['decorators'] = list(decorators)
+
+            name = f'{prefix}_room_{len(rooms) + 1}'
+            rooms.append({'name': name, 'kind': 'room', 'floor': index, 'items': [room]})
+            door_z = slot_z + 1
+            doors[side].append(door_z)
+            corridor.append({
+                'type': 'door',
+                'position': (sign * half, y + DOOR_HEIGHT / 2, door_z),
+                'rotation': (0, sign * 90, 0),
+                'width': DOOR_WIDTH,
+                'height': DOOR_HEIGHT,
+                'room': name,
+            })
+
+    for side, sign in (('west', -1), ('east', 1)):
+        corridor.extend(side_wall(sign * half, y, z_start, z_end, doors[side]))
+
+    # Lights between slots, paintings on stretches of wall without a door
+    intensity_range = rng.choice(WALL_LIGHT_RANGES)
+    for slot in range(slots):
+        light_z = z_start + slot * SLOT_LENGTH + 1
+        for side, sign in (('west', -1), ('east', 1)):
+            item = {'type': 'wall_light', 'position': (sign * (half - 0.2), y + 4, light_z), 'rotation': (0, -sign * 90, 0)}
+            if rng.random() < 0.35:
+                item['flicker'] = True
+            if side == 'east':
+                item['intensity_range'] = intensity_range
+            corridor.append(item)
+
+        slot_z = z_start + slot * SLOT_LENGTH + SLOT_LENGTH / 2
+        for side, sign in (('west', -1), ('east', 1)):
+            if slot_z + 1 not in doors[side] and rng.random() < 0.5:
+                corridor.append({'type': 'painting', 'position': (sign * (half - 0.4), y + 3.2, slot_z), 'rotation': (0, -sign * 90, 0)})
+
+    segments = [{'name': f'{prefix}_corridor', 'kind': 'corridor', 'floor': index, 'items': corridor}]
+    segments.extend(rooms)
+    if top:
+        return segments, z_end
+
+    # Stairwell: stairs over the first half, a landing at the next floor over the second
+    rise = FLOOR_HEIGHT / STAIR_STEPS
+    stairs_length = STAIR_STEPS * STAIR_RUN
+    center_z = z_end + STAIRWELL_LENGTH / 2
+    top_y = y + FLOOR_HEIGHT + CORRIDOR_HEIGHT
+    stairwell = [
+        floor((0, y, center_z), (CORRIDOR_WIDTH, 1, STAIRWELL_LENGTH)),
+        wall((0, top_y, center_z), (CORRIDOR_WIDTH, 0.2, STAIRWELL_LENGTH), color='ceiling', texture='assets/wood.jpg', texture_scale=(3, 6)),
+        wall((-half, (y + top_y) / 2, center_z), (0.2, top_y - y, STAIRWELL_LENGTH)),
+        wall((half, (y + top_y) / 2, center_z), (0.2, top_y - y, STAIRWELL_LENGTH)),
+        wall((0, y + CORRIDOR_HEIGHT + FLOOR_HEIGHT / 2, z_end), (CORRIDOR_WIDTH, FLOOR_HEIGHT, 0.2)),
+        wall((0, y + FLOOR_HEIGHT / 2, z_end + stairs_length + 0.1), (CORRIDOR_WIDTH, FLOOR_HEIGHT, 0.2)),
+        {
+            'type': 'stairs',
+            'position': (0, y + rise / 2, z_end + STAIR_RUN / 2),
+            'steps': STAIR_STEPS,
+            'rise': rise,
+            'run': STAIR_RUN,
+            'width': 6,
+            'color': (100, 100, 100),
+            'texture': 'assets/wood1.jpg',
+        },
+        floor((0, y + FLOOR_HEIGHT, z_end + stairs_length + (STAIRWELL_LENGTH - stairs_length) / 2), (CORRIDOR_WIDTH, 1, STAIRWELL_LENGTH - stairs_length)),
+        point_light((0, top_y - 1.5, center_z), color=(120, 110, 90)),
+    ]
+    segments.append({'name': f'{prefix}_stairwell', 'kind': 'stairwell', 'floor': index, 'items': stairwell})
+    return segments, z_end + STAIRWELL_LENGTH
+
+
+def generate_hotel(seed, floors=3):
+    segments = []
+    z = 0
+    for index in range(floors):
+        floor_segments, z = generate_floor(seed, index, z, top=index == floors - 1)
+        segments.extend(floor_segments)
+
+    return {
+        'version': LAYOUT_VERSION,
+        'name': f'generated_{seed}',
+        'seed': seed,
+        'floors': floors,
+        'spawn': (0, 1, 3),
+        'ambient': (6, 6, 6, 255),
+        'segments': segments,
+    }
+
+
+if __name__ == '__main__':
+    # python generator.py SEED [FLOORS] [OUT]  -> write a generated layout file
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    floors = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    path = sys.argv[3] if len(sys.argv) > 3 else f'layouts/generated_{seed}.json'
+    layout = validate_layout(generate_hotel(seed, floors))
+    with open(path, 'w') as f:
+        f.write(dumps_layout(layout))
+    print(f'{path}: {floors} floors, {len(layout["segments"])} segments')
@@ -0,0 +1,47 @@
+from ursina import Entity
+from panda3d.core import NodePath
+
+
+class PropLibrary:
+    # Repeated props are built once as a flattened prototype and shared between copies with
+    # Panda3D instancing (instanceTo): each copy is just its owner's node, which keeps its own
+    # transform and state, while the geometry nodes underneath exist only once.
+    def __init__(self):
+        self.builders = {}
+        self.prototypes = {}
+        self.instances = {}
+
+    def register(self, name, builder):
+        # builder(parent, *args) creates the prop's parts as Entities under parent
+        self.builders[name] = builder
+
+    def prototype(self, name, *args):
+        key = (name,) + args
+        prototype = self.prototypes.get(key)
+        if prototype is None:
+            holder = Entity(add_to_scene_entities=False)
+            self.builders[name](holder, *args)
+            for node_path in holder.findAllMatches('**'):
+                node_path.clearPythonTag('Entity')
+            holder.flattenStrong()
+
+            prototype = NodePath('_'.join(str(part) for part in key))
+            holder.getChildren().reparentTo(prototype)
+            holder.removeNode()
+            self.prototypes[key] = prototype
+        return prototype
+
+    def instance(self, parent, name, *args):
+        self.instances[name] = self.instances.get(name, 0) + 1
+        return self.prototype(name, *args).instanceTo(parent)
+
+    def bounds(self, name, *args):
+        return self.prototype(name, *args).getTightBounds()
+
+    @property
+    def stats(self):
+        return {
+            'prototypes': len(self.prototypes),
+            'prototype_nodes': sum(p.countNumDescendants() + 1 for p in self.prototypes.values()),
+            'instances': dict(self.instances),
+        }
@@ -0,0 +1,199 @@
+import math
+
+from panda3d.core import Point3, Vec3
+
+
+# An interactable this close behind a wall face still wins (doors sit flush in their walls)
+TIE_DISTANCE = 1e-3
+
+
+class Entry:
+    __slots__ = ('target', 'interactive', 'lo', 'hi', 'inverse', 'box_lo', 'box_hi', 'cells')
+
+    def __init__(self, target, interactive, lo, hi, inverse=None, box_lo=None, box_hi=None):
+        self.target = target      # the entity, or None for a static occluder box
+        self.interactive = interactive
+        self.lo = lo              # world-space AABB used for the grid
+        self.hi = hi
+        self.inverse = inverse    # world -> local matrix for rotated boxes
+        self.box_lo = box_lo      # local box the ray is tested against
+        self.box_hi = box_hi
+        self.cells = ()
+
+
+def ray_box(origin, direction, lo, hi, max_t):
+    # Slab test; returns the distance at which the ray enters the box (0 if it starts inside), or None
+    t_near, t_far = 0.0, max_t
+    for i in range(3):
+        o, d = origin[i], direction[i]
+        if abs(d) < 1e-9:
+            if o < lo[i] or o > hi[i]:
+                return None
+            continue
+        t1 = (lo[i] - o) / d
+        t2 = (hi[i] - o) / d
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_near:
+            t_near = t1
+        if t2 < t_far:
+            t_far = t2
+        if t_near > t_far:
+            return None
+    return t_near
+
+
+class InteractionGrid:
+    # Uniform grid over interactables (switches, doors, photo tables) and the static boxes
+    # that should block them (walls, floors). A ray walks only the cells it passes through
+    # and returns the nearest interactable, unless something solid is in front of it.
+    def __init__(self, cell_size=4):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}         # interactable -> Entry
+        self.occluders = {}       # key -> [Entry]
+        self.last_query = {'cells': 0, 'tests': 0}
+
+    def _cell(self, p):
+        s = self.cell_size
+        return (math.floor(p[0] / s), math.floor(p[1] / s), math.floor(p[2] / s))
+
+    def _insert(self, entry):
+        lo, hi = self._cell(entry.lo), self._cell(entry.hi)
+        cells = []
+        for x in range(lo[0], hi[0] + 1):
+            for y in range(lo[1], hi[1] + 1):
+                for z in range(lo[2], hi[2] + 1):
+                    self.cells.setdefault((x, y, z), []).append(entry)
+                    cells.append((x, y, z))
+        entry.cells = cells
+
+    def _unlink(self, entry):
+        for cell in entry.cells:
+            bucket = self.cells.get(cell)
+            if bucket:
+                bucket.remove(entry)
+                if not bucket:
+                    del self.cells[cell]
+        entry.cells = ()
+
+    def add(self, target, center=None, size=None, interactive=True):
+        # The box defaults to the target's BoxCollider, in the target's local space.
+        # Non-interactive targets (toilets and other solid props) only block rays.
+        if center is None:
+            center, size = target.collider.center, target.collider.size
+        half = [abs(s) / 2 for s in size]
+        box_lo = tuple(center[i] - half[i] for i in range(3))
+        box_hi = tuple(center[i] + half[i] for i in range(3))
+
+        matrix = target.getNetTransform().getMat()
+        inverse = matrix.__class__(matrix)
+        inverse.invertInPlace()
+        corners = [matrix.xformPoint(Point3(x, y, z)) for x in (box_lo[0], box_hi[0]) for y in (box_lo[1], box_hi[1]) for z in (box_lo[2], box_hi[2])]
+        lo = tuple(min(c[i] for c in corners) for i in range(3))
+        hi = tuple(max(c[i] for c in corners) for i in range(3))
+
+        self.remove(target)
+        entry = Entry(target, interactive, lo, hi, inverse, box_lo, box_hi)
+        self.entries[target] = entry
+        self._insert(entry)
+        return entry
+
+    def update(self, target):
+        entry = self.entries.get(target)
+        if entry is not None and not target.isEmpty():
+            center = [(entry.box_lo[i] + entry.box_hi[i]) / 2 for i in range(3)]
+            size = [entry.box_hi[i] - entry.box_lo[i] for i in range(3)]
+            self.add(target, center, size, entry.interactive)
+
+    def remove(self, target):
+        entry = self.entries.pop(target, None)
+        if entry is not None:
+            self._unlink(entry)
+
+    def prune(self):
+        for target in [t for t in self.entries if t.isEmpty()]:
+            self.remove(target)
+
+    def add_occluders(self, key, boxes):
+        # boxes: (center, half extents) pairs in world space, as StaticBatch collects them
+        self.remove_occluders(key)
+        entries = []
+        for center, half in boxes:
+            lo = tuple(center[i] - half[i] for i in range(3))
+            hi = tuple(center[i] + half[i] for i in range(3))
+            entry = Entry(None, False, lo, hi)
+            self._insert(entry)
+            entries.append(entry)
+        self.occluders[key] = entries
+
+    def remove_occluders(self, key):
+        for entry in self.occluders.pop(key, ()):
+            self._unlink(entry)
+
+    def raycast(self, origin, direction, distance=5):
+        length = math.sqrt(direction[0] ** 2 + direction[1] ** 2 + direction[2] ** 2)
+        if length == 0:
+            return None
+        direction = (direction[0] / length, direction[1] / length, direction[2] / length)
+        origin = tuple(origin)
+        s = self.cell_size
+
+        # Amanatides & Woo grid walk
+        cell = list(self._cell(origin))
+        step, t_max, t_delta = [], [], []
+        for i in range(3):
+            d = direction[i]
+            if d > 0:
+                step.append(1)
+                t_max.append(((cell[i] + 1) * s - origin[i]) / d)
+                t_delta.append(s / d)
+            elif d < 0:
+                step.append(-1)
+                t_max.append((cell[i] * s - origin[i]) / d)
+                t_delta.append(-s / d)
+            else:
+                step.append(0)
+                t_max.append(math.inf)
+                t_delta.append(math.inf)
+
+        best_t, best = distance, None
+        tested = set()
+        cells = 0
+        t_cell = 0.0
+        while t_cell <= best_t:
+            cells += 1
+            for entry in self.cells.get(tuple(cell), ()):
+                if id(entry) in tested:
+                    continue
+                tested.add(id(entry))
+                if entry.target is None:
+                    t = ray_box(origin, direction, entry.lo, entry.hi, best_t)
+                else:
+                    if entry.target.isEmpty():
+                        continue
+                    local_origin = entry.inverse.xformPoint(Point3(*origin))
+                    local_direction = entry.inverse.xformVec(Vec3(*direction))
+                    t = ray_box(local_origin, local_direction, entry.box_lo, entry.box_hi, best_t)
+                if t is not None and entry.interactive:
+                    t -= TIE_DISTANCE
+                if t is not None and t <= best_t:
+                    best_t, best = t, entry
+
+            axis = min(range(3), key=t_max.__getitem__)
+            t_cell = t_max[axis]
+            cell[axis] += step[axis]
+            t_max[axis] += t_delta[axis]
+
+        self.last_query = {'cells': cells, 'tests': len(tested)}
+        return best.target if best is not None and best.interactive else None
+
+    @property
+    def stats(self):
+        return {
+            'interactables': sum(entry.interactive for entry in self.entries.values()),
+            'blockers': sum(not entry.interactive for entry in self.entries.values()),
+            'occluders': sum(len(entries) for entries in self.occluders.values()),
+            'cells': len(self.cells),
+            **{f'last_{key}': value for key, value in self.last_query.items()},
+        }
@@ -0,0 +1,627 @@
+import json
+import math
+import sys
+import time
+
+
+LAYOUT_VERSION = 1
+
+CORRIDOR_WIDTH = 10
+CORRIDOR_HEIGHT = 6
+ROOM_HEIGHT = 6
+DOOR_WIDTH = 2.0
+DOOR_HEIGHT = 3.5
+
+# Named colors a layout can use instead of rgb values
+THEME = {
+    'wall': (212, 195, 178),
+    'ceiling': (245, 237, 224),
+}
+
+DOOR_DIRECTIONS = ('north', 'south', 'east', 'west')
+SEGMENT_KINDS = ('corridor', 'room', 'stairwell')
+DECAL_MODELS = ('quad', 'plane', 'cube', 'sphere')
+
+# How many entities each primitive item turns into when built
+ENTITY_COST = {
+    'floor': 1,
+    'wall': 1,
+    'block': 1,
+    'door': 1,
+    'wall_light': 3,
+    'point_light': 1,
+    'toilet': 1,
+    'photo_table': 10,
+    'painting': 1,
+    'decal': 1,
+}
+SWITCH_ENTITY_COST = 2
+
+
+class LayoutError(ValueError):
+    def __init__(self, problems):
+        super().__init__('invalid layout:\n  ' + '\n  '.join(problems))
+        self.problems = problems
+
+
+# -------------------------------
+# PRIMITIVE ITEMS
+# -------------------------------
+def floor(position, scale):
+    return {'type': 'floor', 'position': position, 'scale': scale}
+
+def wall(position, scale, color='wall', texture=None, texture_scale=None):
+    item = {'type': 'wall', 'position': position, 'scale': scale, 'color': color}
+    if texture:
+        item['texture'] = texture
+    if texture_scale:
+        item['texture_scale'] = texture_scale
+    return item
+
+def block(position, scale, color=None, texture=None, collider=False):
+    item = {'type': 'block', 'position': position, 'scale': scale}
+    if color:
+        item['color'] = color
+    if texture:
+        item['texture'] = texture
+    if collider:
+        item['collider'] = True
+    return item
+
+def point_light(position, color=None, flicker=None, switch=None, shadows=False):
+    item = {'type': 'point_light', 'position': position}
+    if color:
+        item['color'] = color
+    if flicker:
+        item['flicker'] = flicker
+    if switch:
+        item['switch'] = switch
+    if shadows:
+        item['shadows'] = True
+    return item
+
+def decal(model, position, scale, color, rotation=None, unlit=False):
+    item = {'type': 'decal', 'model': model, 'position': position, 'scale': scale, 'color': color}
+    if rotation:
+        item['rotation'] = rotation
+    if unlit:
+        item['unlit'] = True
+    return item
+
+
+# -------------------------------
+# ROOMS
+# -------------------------------
+def make_room(room):
+    # center: (x, z) center of room
+    # size: (width, depth)
+    # door_dir: 'north', 'south', 'east', 'west' (direction pointing INTO the room from corridor)
+    # elevation: y of the room's floor, for rooms on upper floors
+    w, d = room['size']
+    x, z = room['center']
+    door_dir = room['door_dir']
+
+    # Floor and ceiling
+    items = [
+        floor((x, 0, z), (w, 1, d)),
+        wall((x, ROOM_HEIGHT, z), (w, 0.2, d), color='ceiling', texture='assets/rustytiles01_spec.png', texture_scale=(max(1, w/3), max(1, d/3))),
+    ]
+
+    t = 0.2
+    half_w = w / 2
+    half_d = d / 2
+
+    if door_dir == 'west':
+        items.append(wall((x - half_w, ROOM_HEIGHT/2, z), (t, ROOM_HEIGHT, d)))  # Back
+        items.append(wall((x, ROOM_HEIGHT/2, z + half_d), (w, ROOM_HEIGHT, t)))  # Top
+        items.append(wall((x, ROOM_HEIGHT/2, z - half_d), (w, ROOM_HEIGHT, t)))  # Bottom
+        light_switch_position = (x + half_w + 0.2, 1.5, z + 2)
+        light_switch_rotation = (0, -90, 0)
+
+    elif door_dir == 'east':
+        items.append(wall((x + half_w, ROOM_HEIGHT/2, z), (t, ROOM_HEIGHT, d)))  # Front
+        items.append(wall((x, ROOM_HEIGHT/2, z + half_d), (w, ROOM_HEIGHT, t)))  # Top
+        items.append(wall((x, ROOM_HEIGHT/2, z - half_d), (w, ROOM_HEIGHT, t)))  # Bottom
+        light_switch_position = (x - half_w - 0.2, 1.5, z + 2)
+        light_switch_rotation = (0, 90, 0)
+
+    elif door_dir == 'north':
+        items.append(wall((x, ROOM_HEIGHT/2, z + half_d), (w, ROOM_HEIGHT, t)))  # Top
+        items.append(wall((x - half_w, ROOM_HEIGHT/2, z), (t, ROOM_HEIGHT, d)))  # Left
+        items.append(wall((x + half_w, ROOM_HEIGHT/2, z), (t, ROOM_HEIGHT, d)))  # Right
+        light_switch_position = (x + 2, 1.5, z - half_d - 0.2)
+        light_switch_rotation = (0, 0, 0)
+
+    elif door_dir == 'south':
+        items.append(wall((x, ROOM_HEIGHT/2, z - half_d), (w, ROOM_HEIGHT, t)))  # Bottom
+        items.append(wall((x - half_w, ROOM_HEIGHT/2, z), (t, ROOM_HEIGHT, d)))  # Left
+        items.append(wall((x + half_w, ROOM_HEIGHT/2, z), (t, ROOM_HEIGHT, d)))  # Right
+        light_switch_position = (x - 2, 1.5, z + half_d + 0.2)
+        light_switch_rotation = (0, 180, 0)
+
+    else:
+        raise ValueError(f'Unsupported door_dir {door_dir}')
+
+    items.extend(add_bathroom((x, z), (w, d), door_dir))
+
+    flicker = None
+    if room.get('flicker'):
+        flicker = {'interval_range': (0.05, 0.3), 'intensity_range': (0.15, 1.0)}
+    items.append(point_light(
+        (x, ROOM_HEIGHT - 1, z),
+        color=room.get('light_color'),
+        flicker=flicker,
+        switch={'position': light_switch_position, 'rotation': light_switch_rotation}
+    ))
+
+    for name in room.get('decorators', ()):
+        decorator = DECORATORS[name](door_dir)
+        # Tagged so a room's decorations can be found again and swapped
+        items.extend(dict(item, decorator=name) for item in decorator(center=(x, z), size=(w, d)))
+    return raise_items(items, room.get('elevation', 0))
+
+
+def add_bathroom(center, size, door_dir):
+    x, z = center
+    w, d = size
+    half_w = w / 2
+    half_d = d / 2
+
+    bath_w = min(max(2.4, w * 0.45), max(2.4, w - 1.2))
+    bath_d = min(max(2.4, d * 0.45), max(2.4, d - 1.2))
+    if bath_w <= 1.5 or bath_d <= 1.5:
+        return []
+
+    wall_thickness = 0.18
+    inset = 0.4
+    bath_height = ROOM_HEIGHT - 0.4
+    wall_center_y = bath_height / 2
+    bath_wall_color = (228, 230, 236)
+
+    if door_dir == 'west':
+        bath_cx = x - half_w + bath_w / 2 + inset
+        bath_cz = z + half_d - bath_d / 2 - inset
+        door_axis = 'south'
+    elif door_dir == 'east':
+        bath_cx = x + half_w - bath_w / 2 - inset
+        bath_cz = z + half_d - bath_d / 2 - inset
+        door_axis = 'south'
+    elif door_dir == 'north':
+        bath_cx = x + half_w - bath_w / 2 - inset
+        bath_cz = z + half_d - bath_d / 2 - inset
+        door_axis = 'west'
+    elif door_dir == 'south':
+        bath_cx = x + half_w - bath_w / 2 - inset
+        bath_cz = z - half_d + bath_d / 2 + inset
+        door_axis = 'north'
+    else:
+        return []
+
+    door_span = bath_w if door_axis in ('north', 'south') else bath_d
+    door_width = max(0.8, min(1.2, door_span - 0.6))
+    if door_width >= door_span:
+        door_width = max(0.6, door_span - 0.4)
+
+    items = [
+        floor((bath_cx, 0.02, bath_cz), (bath_w, 1, bath_d)),
+        wall((bath_cx, ROOM_HEIGHT - 0.1, bath_cz), (bath_w, 0.12, bath_d), color='ceiling', texture='assets/wood.jpg', texture_scale=(max(1, bath_w / 2), max(1, bath_d / 2))),
+    ]
+
+    def bath_wall(position, scale):
+        items.append(wall(position, scale, color=bath_wall_color, texture='assets/wall.png'))
+
+    def full_wall(axis):
+        if axis == 'north':
+            bath_wall((bath_cx, wall_center_y, bath_cz + bath_d / 2), (bath_w, bath_height, wall_thickness))
+        elif axis == 'south':
+            bath_wall((bath_cx, wall_center_y, bath_cz - bath_d / 2), (bath_w, bath_height, wall_thickness))
+        elif axis == 'east':
+            bath_wall((bath_cx + bath_w / 2, wall_center_y, bath_cz), (wall_thickness, bath_height, bath_d))
+        else:
+            bath_wall((bath_cx - bath_w / 2, wall_center_y, bath_cz), (wall_thickness, bath_height, bath_d))
+
+    for axis in ('north', 'south', 'east', 'west'):
+        if axis != door_axis:
+            full_wall(axis)
+
+    side_total = bath_w - door_width if door_axis in ('north', 'south') else bath_d - door_width
+    if door_axis in ('south', 'north') and side_total > 0.2:
+        left = max(0.2, side_total / 2)
+        right = max(0.2, side_total - left)
+        if door_axis == 'south':
+            bath_wall((bath_cx - (door_width / 2 + left / 2), wall_center_y, bath_cz - bath_d / 2), (left, bath_height, wall_thickness))
+            bath_wall((bath_cx + (door_width / 2 + right / 2), wall_center_y, bath_cz - bath_d / 2), (right, bath_height, wall_thickness))
+        else:
+            bath_wall((bath_cx - (door_width / 2 + left / 2), wall_center_y, bath_cz + bath_d / 2), (left, bath_height, wall_thickness))
+            bath_wall((bath_cx + (door_width / 2 + right / 2), wall_center_y, bath_cz + bath_d / 2), (right, bath_height, wall_thickness))
+    elif door_axis in ('east', 'west') and side_total > 0.2:
+        near = max(0.2, side_total / 2)
+        far_segment = max(0.2, side_total - near)
+        if door_axis == 'east':
+            bath_wall((bath_cx + bath_w / 2, wall_center_y, bath_cz - (door_width / 2 + near / 2)), (wall_thickness, bath_height, near))
+            bath_wall((bath_cx + bath_w / 2, wall_center_y, bath_cz + (door_width / 2 + far_segment / 2)), (wall_thickness, bath_height, far_segment))
+        else:
+            bath_wall((bath_cx - bath_w / 2, wall_center_y, bath_cz - (door_width / 2 + near / 2)), (wall_thickness, bath_height, near))
+            bath_wall((bath_cx - bath_w / 2, wall_center_y, bath_cz + (door_width / 2 + far_segment / 2)), (wall_thickness, bath_height, far_segment))
+
+    # Door frame visuals
+    frame_color = (120, 100, 80)
+    frame_height = 3.0
+    frame_thickness = 0.12
+    frame_depth = 0.18
+    if door_axis == 'south':
+        door_z = bath_cz - bath_d / 2
+        items.append(block((bath_cx - door_width / 2 + frame_thickness / 2, frame_height / 2, door_z - frame_depth / 2), (frame_thickness, frame_height, frame_depth), color=frame_color))
+        items.append(block((bath_cx + door_width / 2 - frame_thickness / 2, frame_height / 2, door_z - frame_depth / 2), (frame_thickness, frame_height, frame_depth), color=frame_color))
+        items.append(block((bath_cx, frame_height - 1.2, door_z - frame_depth / 2), (door_width, frame_thickness, frame_depth), color=frame_color))
+        switch_pos = (bath_cx + door_width / 2 + 0.25, 1.3, door_z + 0.3)
+        switch_rot = (0, -90, 0)
+    elif door_axis == 'north':
+        door_z = bath_cz + bath_d / 2
+        items.append(block((bath_cx - door_width / 2 + frame_thickness / 2, frame_height / 2, door_z + frame_depth / 2), (frame_thickness, frame_height, frame_depth), color=frame_color))
+        items.append(block((bath_cx + door_width / 2 - frame_thickness / 2, frame_height / 2, door_z + frame_depth / 2), (frame_thickness, frame_height, frame_depth), color=frame_color))
+        items.append(block((bath_cx, frame_height - 1.2, door_z + frame_depth / 2), (door_width, frame_thickness, frame_depth), color=frame_color))
+        switch_pos = (bath_cx + door_width / 2 + 0.25, 1.3, door_z - 0.3)
+        switch_rot = (0, -90, 0)
+    elif door_axis == 'east':
+        door_x = bath_cx + bath_w / 2
+        items.append(block((door_x + frame_depth / 2, frame_height / 2, bath_cz - door_width / 2 + frame_thickness / 2), (frame_depth, frame_height, frame_thickness), color=frame_color))
+        items.append(block((door_x + frame_depth / 2, frame_height / 2, bath_cz + door_width / 2 - frame_thickness / 2), (frame_depth, frame_height, frame_thickness), color=frame_color))
+        items.append(block((door_x + frame_depth / 2, frame_height - 1.2, bath_cz), (frame_depth, frame_thickness, door_width), color=frame_color))
+        switch_pos = (door_x - 0.3, 1.3, bath_cz + door_width / 2 + 0.25)
+        switch_rot = (0, 0, 0)
+    else:
+        door_x = bath_cx - bath_w / 2
+        items.append(block((door_x - frame_depth / 2, frame_height / 2, bath_cz - door_width / 2 + frame_thickness / 2), (frame_depth, frame_height, frame_thickness), color=frame_color))
+        items.append(block((door_x - frame_depth / 2, frame_height / 2, bath_cz + door_width / 2 - frame_thickness / 2), (frame_depth, frame_height, frame_thickness), color=frame_color))
+        items.append(block((door_x - frame_depth / 2, frame_height - 1.2, bath_cz), (frame_depth, frame_thickness, door_width), color=frame_color))
+        switch_pos = (door_x + 0.3, 1.3, bath_cz + door_width / 2 + 0.25)
+        switch_rot = (0, 180, 0)
+
+    items.append(point_light(
+        (bath_cx, ROOM_HEIGHT - 1.2, bath_cz),
+        color=(190, 205, 220),
+        switch={'position': switch_pos, 'rotation': switch_rot}
+    ))
+
+    # Add real toilet asset along the side wall relative to entrance
+    if door_axis == 'south':
+        toilet_pos = (bath_cx - bath_w / 2 + 0.9, 0, bath_cz + 0.3)
+        toilet_rot = (0, 90, 0)
+    elif door_axis == 'north':
+        toilet_pos = (bath_cx - bath_w / 2 + 0.9, 0, bath_cz - 0.3)
+        toilet_rot = (0, 90, 0)
+    elif door_axis == 'east':
+        toilet_pos = (bath_cx - 0.3, 0, bath_cz + bath_d / 2 - 1.0)
+        toilet_rot = (0, 0, 0)
+    else:  # west
+        toilet_pos = (bath_cx + 0.3, 0, bath_cz + bath_d / 2 - 1.0)
+        toilet_rot = (0, 180, 0)
+    items.append({'type': 'toilet', 'position': toilet_pos, 'rotation': toilet_rot, 'scale': 0.5})
+
+    # Small counter and cabinet to keep scene populated
+    items.append(block((bath_cx + bath_w / 2 - 0.7, 0.45, bath_cz + bath_d / 2 - 0.6), (0.9, 0.9, 0.5), color=(235, 235, 240)))
+    items.append(block((bath_cx + bath_w / 2 - 0.6, 0.35, bath_cz + bath_d / 2 - 0.6), (0.7, 0.6, 0.7), color=(200, 200, 205)))
+    return items
+
+
+# -------------------------------
+# DECORATORS
+# -------------------------------
+def add_photo_table_factory(door_direction):
+    def decorator(center, size):
+        cx, cz = center
+        w, d = size
+        wall_offset = 1.4
+        y = 0
+
+        if door_direction == 'west':
+            position = (cx - w / 2 + wall_offset, y, cz)
+            rotation = (0, 90, 0)
+        elif door_direction == 'east':
+            position = (cx + w / 2 - wall_offset, y, cz)
+            rotation = (0, -90, 0)
+        elif door_direction == 'north':
+            position = (cx, y, cz + d / 2 - wall_offset)
+            rotation = (0, 180, 0)
+        else:  # 'south'
+            position = (cx, y, cz - d / 2 + wall_offset)
+            rotation = (0, 0, 0)
+
+        # The photo itself is assigned when the table is built
+        return [{'type': 'photo_table', 'position': position, 'rotation': rotation}]
+
+    return decorator
+
+
+def add_occult_circle(center, size):
+    cx, cz = center
+    items = [
+        decal('quad', (cx, 0.04, cz), (size[0] * 0.7, size[1] * 0.7), (120, 0, 0), rotation=(90, 0, 0), unlit=True),
+        decal('quad', (cx, 2.4, cz + size[1] * 0.18), (2.4, 1.2), (200, 40, 40), unlit=True),
+        decal('cube', (cx, 0.6, cz - size[1] * 0.25), (size[0] * 0.5, 1.1, 0.6), (30, 30, 30)),
+    ]
+    for offset in (-1.2, 0, 1.2):
+        items.append(decal('cube', (cx + offset, 0.6, cz + size[1] * 0.18), (0.14, 0.6, 0.14), (200, 160, 90)))
+        items.append(decal('sphere', (cx + offset, 1.0, cz + size[1] * 0.18), 0.2, (255, 210, 120), unlit=True))
+    return items
+
+
+def add_storage_abattoir(center, size):
+    cx, cz = center
+    items = [
+        decal('quad', (cx - size[0] * 0.2, 0.04, cz + size[1] * 0.15), (size[0] * 0.5, size[1] * 0.4), (140, 0, 0), rotation=(90, 0, 0), unlit=True),
+        decal('cube', (cx + size[0] * 0.25, 1.2, cz - size[1] * 0.1), (size[0] * 0.4, 2.5, size[1] * 0.2), (45, 45, 45)),
+    ]
+    for n in range(3):
+        items.append(decal('cube', (cx - size[0] * 0.25 + n * 1.2, 2.0, cz - size[1] * 0.2), (0.4, 1.6, 0.4), (25, 20, 20)))
+    items.append(decal('quad', (cx, 3.5, cz + size[1] * 0.4), (size[0] * 0.6, size[1] * 0.2), (255, 120, 120), rotation=(90, 0, 0), unlit=True))
+    return items
+
+
+# Decorator factories by name; each takes the room's door_dir and returns decorator(center, size)
+DECORATORS = {
+    'photo_table': add_photo_table_factory,
+    'occult_circle': lambda door_dir: add_occult_circle,
+    'storage_abattoir': lambda door_dir: add_storage_abattoir,
+}
+
+
+def decorator_items(room, name):
+    # One decorator's items for a room, tagged and on the room's floor, as make_room adds them
+    x, z = room['center']
+    items = DECORATORS[name](room['door_dir'])(center=(x, z), size=tuple(room['size']))
+    return raise_items([dict(item, decorator=name) for item in items], room.get('elevation', 0))
+
+
+def make_stairs(stairs):
+    x, y, z = stairs['position']
+    rise = stairs['rise']
+    run = stairs['run']
+    return [
+        block(
+            (x, y + i * rise, z + i * run),
+            (stairs['width'], rise, run),
+            color=stairs.get('color'),
+            texture=stairs.get('texture'),
+            collider=True
+        )
+        for i in range(stairs['steps'])
+    ]
+
+
+def raise_items(items, dy):
+    # Rooms and decorators are authored at ground level; lift them onto their floor
+    if not dy:
+        return items
+    raised = []
+    for item in items:
+        item = dict(item)
+        x, y, z = item['position']
+        item['position'] = (x, y + dy, z)
+        if 'switch' in item:
+            x, y, z = item['switch']['position']
+            item['switch'] = dict(item['switch'], position=(x, y + dy, z))
+        raised.append(item)
+    return raised
+
+
+def expand_items(items):
+    # Rooms and stairs are shorthand; everything else is already a primitive
+    for item in items:
+        kind = item['type']
+        if kind == 'room':
+            yield from make_room(item)
+        elif kind == 'stairs':
+            yield from make_stairs(item)
+        else:
+            yield item
+
+
+def count_entities(items):
+    total = 0
+    for item in expand_items(items):
+        total += ENTITY_COST[item['type']]
+        if item['type'] == 'point_light' and item.get('switch'):
+            total += SWITCH_ENTITY_COST
+    return total
+
+
+# -------------------------------
+# VALIDATION
+# -------------------------------
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def _vec(n, positive=False):
+    def check(value):
+        return (
+            isinstance(value, (list, tuple)) and len(value) == n
+            and all(_number(v) and (v > 0 or not positive) for v in value)
+        )
+    return check
+
+def _color(value):
+    if isinstance(value, str):
+        return value in THEME
+    return (_vec(3)(value) or _vec(4)(value)) and all(0 <= v <= 255 for v in value)
+
+def _bool(value):
+    return isinstance(value, bool)
+
+def _string(value):
+    return isinstance(value, str) and bool(value)
+
+def _positive(value):
+    return _number(value) and value > 0
+
+def _count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def _scale(value):
+    return _positive(value) or _vec(2, positive=True)(value) or _vec(3, positive=True)(value)
+
+def _flicker(value):
+    return (
+        isinstance(value, dict) and set(value) == {'interval_range', 'intensity_range'}
+        and _vec(2)(value['interval_range']) and _vec(2)(value['intensity_range'])
+    )
+
+def _switch(value):
+    return (
+        isinstance(value, dict) and set(value) - {'on'} == {'position', 'rotation'}
+        and _vec(3)(value['position']) and _vec(3)(value['rotation']) and _bool(value.get('on', True))
+    )
+
+def _distance(value):
+    return _number(value) and value >= 0
+
+def _decorators(value):
+    return isinstance(value, (list, tuple)) and all(name in DECORATORS for name in value)
+
+
+VEC2 = _vec(2)
+VEC3 = _vec(3)
+
+# field: (check, required). A door's open and locked, a switch's on, a photo table's crept
+# and a room's locked are set while playing (and by a restored save), so a layout saved
+# from a game in progress keeps them.
+ITEM_SCHEMA = {
+    'floor': {'position': (VEC3, True), 'scale': (_vec(3, positive=True), True)},
+    'wall': {'position': (VEC3, True), 'scale': (_vec(3, positive=True), True), 'color': (_color, False), 'texture': (_string, False), 'texture_scale': (VEC2, False)},
+    'block': {'position': (VEC3, True), 'scale': (_vec(3, positive=True), True), 'color': (_color, False), 'texture': (_string, False), 'collider': (_bool, False)},
+    'stairs': {'position': (VEC3, True), 'steps': (_count, True), 'rise': (_positive, True), 'run': (_positive, True), 'width': (_positive, True), 'color': (_color, False), 'texture': (_string, False)},
+    'door': {'position': (VEC3, True), 'rotation': (VEC3, False), 'width': (_positive, False), 'height': (_positive, False), 'color': (_color, False), 'room': (_string, False), 'open': (_bool, False), 'locked': (_bool, False)},
+    'wall_light': {'position': (VEC3, True), 'rotation': (VEC3, False), 'flicker': (_bool, False), 'interval_range': (VEC2, False), 'intensity_range': (VEC2, False)},
+    'point_light': {'position': (VEC3, True), 'color': (_color, False), 'flicker': (_flicker, False), 'switch': (_switch, False), 'shadows': (_bool, False)},
+    'toilet': {'position': (VEC3, True), 'rotation': (VEC3, False), 'scale': (_positive, False)},
+    'photo_table': {'position': (VEC3, True), 'rotation': (VEC3, False), 'texture': (_string, False), 'crept': (_distance, False)},
+    'painting': {'position': (VEC3, True), 'rotation': (VEC3, False), 'scale': (_vec(2, positive=True), False), 'texture': (_string, False)},
+    'decal': {'model': (lambda v: v in DECAL_MODELS, True), 'position': (VEC3, True), 'scale': (_scale, True), 'color': (_color, False), 'rotation': (VEC3, False), 'unlit': (_bool, False), 'billboard': (_bool, False), 'double_sided': (_bool, False)},
+    'room': {'center': (VEC2, True), 'size': (_vec(2, positive=True), True), 'door_dir': (lambda v: v in DOOR_DIRECTIONS, True), 'light_color': (_color, False), 'flicker': (_bool, False), 'decorators': (_decorators, False), 'elevation': (_number, False), 'locked': (_bool, False)},
+}
+
+
+def _check_fields(where, item, schema, problems):
+    for key, (check, required) in schema.items():
+        if key not in item:
+            if required:
+                problems.append(f'{where}: missing {key!r}')
+        elif not check(item[key]):
+            problems.append(f'{where}: bad {key!r}: {item[key]!r}')
+    for key in item:
+        if key not in schema and key != 'type':
+            problems.append(f'{where}: unknown field {key!r}')
+
+
+def validate_layout(layout):
+    problems = []
+    if not isinstance(layout, dict):
+        raise LayoutError(['layout must be an object'])
+    if layout.get('version') != LAYOUT_VERSION:
+        problems.append(f'unsupported version {layout.get("version")!r} (expected {LAYOUT_VERSION})')
+    if not VEC3(layout.get('spawn')):
+        problems.append(f'bad spawn: {layout.get("spawn")!r}')
+    if 'ambient' in layout and not _color(layout['ambient']):
+        problems.append(f'bad ambient: {layout["ambient"]!r}')
+
+    segments = layout.get('segments')
+    if not isinstance(segments, list) or not segments:
+        problems.append('layout needs a non-empty segments list')
+        raise LayoutError(problems)
+
+    kinds = {}
+    door_rooms = []
+    for index, segment in enumerate(segments):
+        name = segment.get('name') if isinstance(segment, dict) else None
+        where = f'segment {name or index}'
+        if not _string(name):
+            problems.append(f'{where}: missing name')
+        elif name in kinds:
+            problems.append(f'{where}: duplicate name')
+        if segment.get('kind') not in SEGMENT_KINDS:
+            problems.append(f'{where}: bad kind {segment.get("kind")!r}')
+        kinds[name] = segment.get('kind')
+
+        items = segment.get('items')
+        if not isinstance(items, list):
+            problems.append(f'{where}: items must be a list')
+            continue
+        for item_index, item in enumerate(items):
+            item_where = f'{where} item {item_index}'
+            schema = ITEM_SCHEMA.get(item.get('type')) if isinstance(item, dict) else None
+            if schema is None:
+                problems.append(f'{item_where}: unknown type {item.get("type") if isinstance(item, dict) else item!r}')
+                continue
+            _check_fields(item_where, item, schema, problems)
+            if item['type'] == 'door' and 'room' in item:
+                door_rooms.append((item_where, item['room']))
+
+    for where, room in door_rooms:
+        if kinds.get(room) != 'room':
+            problems.append(f'{where}: door leads to unknown room {room!r}')
+
+    if problems:
+        raise LayoutError(problems)
+    return layout
+
+
+# -------------------------------
+# FILES
+# -------------------------------
+def load_layout(path):
+    with open(path) as f:
+        return validate_layout(json.load(f))
+
+
+def dumps_layout(layout):
+    # One item per line keeps layouts readable and diffable
+    lines = ['{']
+    for key, value in layout.items():
+        if key != 'segments':
+            lines.append(f'  {json.dumps(key)}: {json.dumps(value)},')
+    lines.append('  "segments": [')
+    segments = layout['segments']
+    for segment_index, segment in enumerate(segments):
+        lines.append('    {')
+        for key, value in segment.items():
+            if key != 'items':
+                lines.append(f'      {json.dumps(key)}: {json.dumps(value)},')
+        lines.append('      "items": [')
+        items = segment['items']
+        for item_index, item in enumerate(items):
+            lines.append('        ' + json.dumps(item) + (',' if item_index < len(items) - 1 else ''))
+        lines.append('      ]')
+        lines.append('    }' + (',' if segment_index < len(segments) - 1 else ''))
+    lines.append('  ]')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def save_layout(layout, path):
+    validate_layout(layout)
+    with open(path, 'w') as f:
+        f.write(dumps_layout(layout))
+
+
+if __name__ == '__main__':
+    # python layout.py layouts/hotel.json ...  -> validate without building anything
+    status = 0
+    for path in sys.argv[1:] or ['layouts/hotel.json']:
+        start = time.perf_counter()
+        try:
+            layout = load_layout(path)
+        except LayoutError as e:
+            print(f'{path}: {e}')
+            status = 1
+            continue
+        counts = {}
+        entities = 0
+        for segment in layout['segments']:
+            entities += count_entities(segment['items'])
+            for item in expand_items(segment['items']):
+                counts[item['type']] = counts.get(item['type'], 0) + 1
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'{path}: ok in {elapsed:.2f} ms, {len(layout["segments"])} segments, {entities} entities')
+        print('  ' + ', '.join(f'{kind}={count}' for kind, count in sorted(counts.items())))
+    sys.exit(status)
@@ -0,0 +1,144 @@
+from panda3d.core import BoundingSphere, Point3
+
+
+class ManagedLight:
+    __slots__ = ('light', 'node', 'position', 'wants_shadows', 'cell', 'active', 'shadowed', 'score')
+
+    def __init__(self, light, node, wants_shadows):
+        self.light = light
+        self.node = node
+        self.position = light.world_position
+        self.wants_shadows = wants_shadows
+        self.cell = None          # the portal cell it is in, once assign() has been told
+        self.active = False
+        self.shadowed = False
+        self.score = 0.0
+
+    @property
+    def switched_on(self):
+        switch = getattr(self.light, 'switch', None)
+        return self.light.enabled and (switch is None or switch.is_on)
+
+
+def view_frustum(camera_node, lens):
+    # The camera lens frustum in world space, or None when there is no lens (headless)
+    if lens is None:
+        return None
+    bounds = lens.makeBounds()
+    if bounds is None:
+        return None
+    bounds.xform(camera_node.getMat(camera_node.getTop()))
+    return bounds
+
+
+class LightBudget:
+    # Keeps at most max_lights point lights applied to the scene and at most max_shadows of
+    # them casting shadows. Lights are ranked by distance to the eye, lights whose reach is
+    # out of view count as farther away, and lights that are already on get a head start so
+    # two similar lights don't swap every frame. Lights that lose their slot keep their
+    # emissive fixture; they just stop lighting the scene. Lights in sealed cells (behind a
+    # closed door or on another floor) are switched off outright; a light in a cell that is
+    # only culled can still light walls in view, so it is ranked like any other.
+    def __init__(self, render, max_lights=8, max_shadows=2, shadow_map_size=512, light_range=15,
+                 offscreen_weight=3, hysteresis=0.8):
+        self.render = render
+        self.max_lights = max_lights
+        self.max_shadows = max_shadows
+        self.shadow_map_size = shadow_map_size
+        self.light_range = light_range
+        self.offscreen_weight = offscreen_weight
+        self.hysteresis = hysteresis
+        self.lights = []
+        self.changes = 0
+        self.frame_stats = {}
+
+    def add(self, light, shadows=False):
+        node = light.find('**/+Light')
+        if node.isEmpty():
+            return None
+        managed = ManagedLight(light, node, shadows)
+        # Every ursina light starts applied to render; it stays off until it wins a slot
+        self.render.clearLight(node)
+        node.node().setShadowCaster(False)
+        self.lights.append(managed)
+        return managed
+
+    def assign(self, root, cell):
+        # Lights under root, a cell's node, are in that cell
+        for managed in self.lights:
+            if managed.cell is None and root.isAncestorOf(managed.node):
+                managed.cell = cell
+
+    def _set_active(self, managed, active):
+        if managed.active != active:
+            managed.active = active
+            if active:
+                self.render.setLight(managed.node)
+            else:
+                self.render.clearLight(managed.node)
+            self.changes += 1
+
+    def _set_shadowed(self, managed, shadowed):
+        if managed.shadowed != shadowed:
+            managed.shadowed = shadowed
+            if shadowed:
+                managed.node.node().setShadowCaster(True, self.shadow_map_size, self.shadow_map_size)
+            else:
+                managed.node.node().setShadowCaster(False)
+            self.changes += 1
+
+    def update(self, eye, frustum=None, sealed=()):
+        # sealed: the names of the cells nothing in view can be lit from
+        self.changes = 0
+        # Lights whose entity has been destroyed (segment unloaded) drop out
+        self.lights = [m for m in self.lights if not m.light.isEmpty() and m.node.getTop() == self.render]
+
+        candidates = []
+        switched_off = in_sealed = 0
+        for managed in self.lights:
+            if not managed.switched_on:
+                switched_off += 1
+                self._set_active(managed, False)
+                self._set_shadowed(managed, False)
+                continue
+            if managed.cell in sealed:
+                in_sealed += 1
+                self._set_active(managed, False)
+                self._set_shadowed(managed, False)
+                continue
+            dx = managed.position[0] - eye[0]
+            dy = managed.position[1] - eye[1]
+            dz = managed.position[2] - eye[2]
+            score = (dx * dx + dy * dy + dz * dz) ** 0.5
+            if frustum is not None and not frustum.contains(BoundingSphere(Point3(*managed.position), self.light_range)):
+                score *= self.offscreen_weight
+            if managed.active:
+                score *= self.hysteresis
+            managed.score = score
+            candidates.append(managed)
+
+        candidates.sort(key=lambda m: m.score)
+        active = candidates[:self.max_lights]
+        for managed in candidates[self.max_lights:]:
+            self._set_shadowed(managed, False)
+            self._set_active(managed, False)
+        for managed in active:
+            self._set_active(managed, True)
+
+        shadowed = [m for m in active if m.wants_shadows][:self.max_shadows]
+        for managed in active:
+            self._set_shadowed(managed, managed in shadowed)
+
+        self.frame_stats = {
+            'lights': len(self.lights),
+            'switched_off': switched_off,
+            'sealed': in_sealed,
+            'active': len(active),
+            'shadowed': len(shadowed),
+            'changes': self.changes,
+        }
+        return self.frame_stats
+
+    @property
+    def stats(self):
+        return dict(self.frame_stats, max_lights=self.max_lights, max_shadows=self.max_shadows)
@@ -0,0 +1,477 @@
+import argparse
+import hashlib
+import json
+import math
+import struct
+import time
+from pathlib import Path
+from random import Random
+
+import numpy as np
+from panda3d.core import SamplerState, Texture, TransformState, Vec2
+
+from batching import EPSILON, FACE_AXES, LIGHTMAP_STAGE, box_faces, optimize_faces, plane_face
+
+
+ROOT = Path(__file__).parent
+CACHE_DIR = ROOT / '.cache' / 'lightmaps'
+
+# Bump when the bake changes; old lightmaps then stop matching
+BAKE_VERSION = 3
+MAGIC = b'OCCL'
+HEADER = struct.Struct('<4sIIIIII')  # magic, version, width, height, face count, light count, part count
+PART_ROW = struct.Struct('<4fI')       # the part's place on the atlas (u, v, width, height), its face count
+FACE_ROW = struct.Struct('<Bb9f')      # axis, sign, plane, lo, hi, atlas rect u0 v0 u1 v1
+LIGHT_ROW = struct.Struct('<6f')       # fixture position, color (0-255)
+
+TEXELS_PER_UNIT = 2
+MAX_FACE_TEXELS = 128
+MAX_ATLAS_SIZE = 2048
+# WallLight's falloff (constant, linear, quadratic), which the baked light follows
+ATTENUATION = (0.5, 0, 0.05)
+# Baked light stops where it would add less than a few steps of an 8-bit channel
+LIGHT_RANGE = 25
+# Light leaves a wall light from its face; the fixture's own PointLight sits behind it, in the wall
+LIGHT_OFFSET = 0.3
+# Texels are lit from just off their face, so the face itself doesn't shadow them
+SURFACE_OFFSET = 0.02
+SHADOW_EPSILON = 1e-3
+
+
+# -------------------------------
+# WHAT A SEGMENT'S BAKE READS
+# -------------------------------
+def static_items(items):
+    # What create_floor, create_wall and create_block draw into a segment's batch
+    return [item for item in items if item['type'] in ('floor', 'wall', 'block')]
+
+
+def item_faces(item):
+    if item['type'] == 'floor':
+        return [plane_face(item['position'], item['scale'], None)]
+    return box_faces(item['position'], item['scale'], None)
+
+
+def item_box(item):
+    # As StaticBatch collects colliders: a floor is a plane
+    x, y, z = item['position']
+    sx, sy, sz = item['scale']
+    half = (sx / 2, 0 if item['type'] == 'floor' else sy / 2, sz / 2)
+    return (x - half[0], y - half[1], z - half[2]), (x + half[0], y + half[1], z + half[2])
+
+
+def neighbour_occluders(segment, segments):
+    # Static boxes of the segments touching this one, which hide the faces at the seam (a
+    # room's wall ending in the corridor's). Decorations are left out: they get swapped.
+    return [item_box(item) for other in segments if other is not segment
+            and all(other.lo[i] <= segment.hi[i] + EPSILON and segment.lo[i] - EPSILON <= other.hi[i] for i in range(3))
+            for item in static_items(other.items) if not item.get('decorator')]
+
+
+def segment_faces(segment, segments):
+    # The faces StaticBatch.optimize leaves, merged wherever they line up whatever their
+    # material; the batch's own merges then always fall inside one of them
+    surfaces = static_items(segment.items)
+    faces = [face for item in surfaces for face in item_faces(item)]
+    return optimize_faces(faces, [item_box(item) for item in surfaces] + neighbour_occluders(segment, segments))
+
+
+def segment_parts(segment, segments):
+    # The faces to bake, in parts that each get a rect of the atlas to themselves. A room's
+    # shell and each of its decorators is a part, laid out from its own items alone as its
+    # prefab is built (main.room_prefabs), so rooms alike get the same layout and can share
+    # the prefab, each with its own atlas on it. Anything else is one part.
+    if segment.kind != 'room':
+        return [segment_faces(segment, segments)]
+    parts = {}
+    for item in static_items(segment.items):
+        parts.setdefault(item.get('decorator'), []).append(item)
+    return [optimize_faces([face for item in items for face in item_faces(item)], [item_box(item) for item in items])
+            for items in parts.values()]
+
+
+def is_static_light(item):
+    # Lights nothing changes while playing: no flicker and no switch
+    if item['type'] == 'wall_light':
+        return not item.get('flicker')
+    if item['type'] == 'point_light':
+        return not item.get('flicker') and not item.get('switch')
+    return False
+
+
+def fixed_color(item):
+    # main.haunted_light_color's range (0-255), picked once per light so the bake and the fixture agree
+    if item.get('color') is not None and not isinstance(item['color'], str):
+        return tuple(item['color'][:3])
+    rng = Random(json.dumps([item['type'], list(item['position'])]))
+    r = max(30, min(140, 90 + rng.uniform(-20, 25)))
+    g = max(0, min(40, 5 + rng.uniform(-5, 10)))
+    b = max(0, min(70, 20 + rng.uniform(-10, 15)))
+    return r, g, b
+
+
+def emission_point(item):
+    x, y, z = item['position']
+    if item['type'] != 'wall_light':
+        return x, y, z
+    # ursina's forward for a turn around y
+    yaw = math.radians(item.get('rotation', (0, 0, 0))[1])
+    return x + math.sin(yaw) * LIGHT_OFFSET, y, z + math.cos(yaw) * LIGHT_OFFSET
+
+
+def near(lo, hi, point, reach):
+    return all(lo[i] - reach <= point[i] <= hi[i] + reach for i in range(3))
+
+
+def bake_inputs(segment, segments):
+    # The segment's own static geometry, the static lights that reach it (from any segment)
+    # and what can shadow them: the static boxes of every segment within reach
+    lights = [item for other in segments for item in other.items
+              if is_static_light(item) and near(segment.lo, segment.hi, emission_point(item), LIGHT_RANGE)]
+    occluders = [item for other in segments
+                 if all(other.lo[i] <= segment.hi[i] + LIGHT_RANGE and segment.lo[i] - LIGHT_RANGE <= other.hi[i] for i in range(3))
+                 for item in static_items(other.items)]
+    return static_items(segment.items), lights, occluders
+
+
+def source_hash(inputs):
+    surfaces, lights, occluders = inputs
+    keep = ('type', 'position', 'rotation', 'scale', 'color', 'flicker', 'switch')
+    digest = hashlib.sha1(f'{BAKE_VERSION}:{TEXELS_PER_UNIT}:{ATTENUATION}:{LIGHT_RANGE}'.encode())
+    for group in (surfaces, lights, occluders):
+        digest.update(json.dumps([{k: item[k] for k in keep if k in item} for item in group], sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_path(segment, inputs, cache_dir=None):
+    return Path(cache_dir or CACHE_DIR) / f'{segment.name}-{source_hash(inputs)}.lmap'
+
+
+def face_key(axis, sign, plane, lo, hi):
+    return (axis, sign) + tuple(round(v, 3) for v in (plane, lo[0], lo[1], hi[0], hi[1]))
+
+
+# -------------------------------
+# BAKING
+# -------------------------------
+def face_texels(face, density):
+    # Rounded first, so a face gets the same texels wherever it is
+    size_u, size_v = face.hi[0] - face.lo[0], face.hi[1] - face.lo[1]
+    return (max(1, min(MAX_FACE_TEXELS, math.ceil(round(size_u * density, 6)))),
+            max(1, min(MAX_FACE_TEXELS, math.ceil(round(size_v * density, 6)))))
+
+
+def texel_points(face, width, height):
+    # World positions of the texel centres, a hair off the face
+    u_axis, v_axis = FACE_AXES[face.axis]
+    u = face.lo[0] + (np.arange(width) + 0.5) * (face.hi[0] - face.lo[0]) / width
+    v = face.lo[1] + (np.arange(height) + 0.5) * (face.hi[1] - face.lo[1]) / height
+    uu, vv = np.meshgrid(u, v)
+    points = np.empty((height, width, 3))
+    points[..., face.axis] = face.plane + face.sign * SURFACE_OFFSET
+    points[..., u_axis] = uu
+    points[..., v_axis] = vv
+    return points.reshape(-1, 3)
+
+
+def blocked(origins, target, box_lo, box_hi, chunk=2048):
+    # Which segments from origins to target pass through any of the boxes (slab test)
+    if len(box_lo) == 0:
+        return np.zeros(len(origins), dtype=bool)
+    if len(origins) > chunk:
+        return np.concatenate([blocked(origins[i:i + chunk], target, box_lo, box_hi, chunk)
+                               for i in range(0, len(origins), chunk)])
+    direction = target - origins
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = 1 / direction
+        t0 = (box_lo[None, :, :] - origins[:, None, :]) * inverse[:, None, :]
+        t1 = (box_hi[None, :, :] - origins[:, None, :]) * inverse[:, None, :]
+    # A ray parallel to a slab is inside it for all t or for none
+    parallel = direction[:, None, :] == 0
+    inside = (origins[:, None, :] >= box_lo[None, :, :]) & (origins[:, None, :] <= box_hi[None, :, :])
+    t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t0, t1)).max(axis=2)
+    t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t0, t1)).min(axis=2)
+    return ((t_near <= t_far) & (t_far > SHADOW_EPSILON) & (t_near < 1 - SHADOW_EPSILON)).any(axis=1)
+
+
+def light_face(face, points, lights, box_lo, box_hi):
+    normal = np.array(face.normal, dtype=float)
+    total = np.zeros((len(points), 3))
+    face_lo, face_hi = points.min(axis=0), points.max(axis=0)
+    for position, color in lights:
+        to_light = position - points
+        distance = np.sqrt((to_light * to_light).sum(axis=1))
+        facing = (to_light @ normal) / np.maximum(distance, 1e-6)
+        c, l, q = ATTENUATION
+        strength = np.where(facing > 0, facing, 0) / (c + l * distance + q * distance * distance)
+        lit = strength * max(color) > 1 / 512
+        if not lit.any():
+            continue
+        # Only boxes between the face and the light can shadow it
+        lo, hi = np.minimum(face_lo, position), np.maximum(face_hi, position)
+        candidates = ((box_lo <= hi) & (box_hi >= lo)).all(axis=1)
+        shadowed = blocked(points[lit], position, box_lo[candidates], box_hi[candidates])
+        index = np.flatnonzero(lit)[~shadowed]
+        total[index] += strength[index, None] * color
+    return total
+
+
+def pack(sizes, max_size=MAX_ATLAS_SIZE):
+    # Shelf packing, tallest first; each rect gets a one-texel border. Texel (0, 0) stays
+    # black for faces the lightmap doesn't know. Returns (width, height, origins) or None.
+    area = sum((w + 2) * (h + 2) for w, h in sizes)
+    width = 64
+    while width * width < area * 1.3 and width < max_size:
+        width *= 2
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    origins = [None] * len(sizes)
+    x, y, shelf = 1, 0, 1
+    for i in order:
+        w, h = sizes[i][0] + 2, sizes[i][1] + 2
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        if w > width:
+            return None
+        origins[i] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    height = 64
+    while height < y + shelf:
+        height *= 2
+    if height > max_size:
+        return None
+    return width, height, origins
+
+
+def pack_parts(parts, density):
+    # Each part packed on its own, the parts stacked up the atlas. Returns (width, height,
+    # [(x, y) of each part, its texel sizes and origins]) or None if they don't fit.
+    packed = []
+    for faces in parts:
+        sizes = [face_texels(face, density) for face in faces]
+        part = pack(sizes)
+        if part is None:
+            return None
+        packed.append((sizes, part))
+    width = max((part[0] for _, part in packed), default=64)
+    height = 64
+    while height < sum(part[1] for _, part in packed):
+        height *= 2
+    if height > MAX_ATLAS_SIZE:
+        return None
+    places, y = [], 0
+    for sizes, (_, part_height, origins) in packed:
+        places.append(((0, y), sizes, origins))
+        y += part_height
+    return width, height, places
+
+
+def bake_segment(segment, segments, density=TEXELS_PER_UNIT):
+    # Returns the atlas (height, width, 3 floats), part rows, face rows and light rows
+    _, light_items, occluders = bake_inputs(segment, segments)
+    parts = segment_parts(segment, segments)
+    lights = [(np.array(emission_point(item)), np.array(fixed_color(item)) / 255) for item in light_items]
+    boxes = [item_box(item) for item in occluders]
+    box_lo = np.array([lo for lo, _ in boxes], dtype=float).reshape(-1, 3)
+    box_hi = np.array([hi for _, hi in boxes], dtype=float).reshape(-1, 3)
+
+    while True:
+        packed = pack_parts(parts, density)
+        if packed:
+            break
+        density /= 2
+    width, height, places = packed
+
+    atlas = np.zeros((height, width, 3))
+    part_rows, rows = [], []
+    for faces, ((part_x, part_y), sizes, origins) in zip(parts, places):
+        seen = set()
+        part_width = max((x + w + 2 for (w, _), (x, _) in zip(sizes, origins)), default=1)
+        part_height = max((y + h + 2 for (_, h), (_, y) in zip(sizes, origins)), default=1)
+        count = len(rows)
+        for face, (w, h), (x, y) in zip(faces, sizes, origins):
+            key = face_key(face.axis, face.sign, face.plane, face.lo, face.hi)
+            if key in seen:
+                continue
+            seen.add(key)
+            x, y = x + part_x, y + part_y
+            texels = light_face(face, texel_points(face, w, h), lights, box_lo, box_hi).reshape(h, w, 3)
+            # The border repeats the edge, so filtering at the rect's edge doesn't pull in a neighbour
+            atlas[y:y + h + 2, x:x + w + 2] = np.pad(texels, ((1, 1), (1, 1), (0, 0)), mode='edge')
+            rows.append((face.axis, face.sign, face.plane, *face.lo, *face.hi,
+                         (x + 1) / width, (y + 1) / height, (x + 1 + w) / width, (y + 1 + h) / height))
+        part_rows.append((part_x / width, part_y / height, part_width / width, part_height / height, len(rows) - count))
+    light_rows = [(*item['position'], *fixed_color(item)) for item in light_items]
+    return atlas, part_rows, rows, light_rows
+
+
+def write_lightmap(out, atlas, part_rows, rows, light_rows):
+    height, width, _ = atlas.shape
+    pixels = np.clip(atlas * 255 + 0.5, 0, 255).astype(np.uint8)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, BAKE_VERSION, width, height, len(rows), len(light_rows), len(part_rows)))
+        for row in part_rows:
+            f.write(PART_ROW.pack(*row))
+        for row in rows:
+            f.write(FACE_ROW.pack(*row))
+        for row in light_rows:
+            f.write(LIGHT_ROW.pack(*row))
+        f.write(pixels.tobytes())
+    tmp.replace(out)
+
+
+def bake(segments, cache_dir=None, force=False):
+    # Bakes every segment whose inputs changed; returns {segment name: (path, ms or None if it was current)}
+    results = {}
+    for segment in segments:
+        inputs = bake_inputs(segment, segments)
+        out = cache_path(segment, inputs, cache_dir)
+        if out.exists() and not force:
+            results[segment.name] = (out, None)
+            continue
+        start = time.perf_counter()
+        write_lightmap(out, *bake_segment(segment, segments))
+        results[segment.name] = (out, (time.perf_counter() - start) * 1000)
+        # Drop stale bakes of the same segment
+        for old in out.parent.glob(f'{segment.name}-*.lmap'):
+            if old != out:
+                old.unlink()
+    return results
+
+
+# -------------------------------
+# RUNTIME
+# -------------------------------
+class Lightmap:
+    # A baked segment: the atlas texture, where each baked face is in it and which lights it
+    # holds. parts are the atlas's rects as (offset, size, face count), the faces in part order;
+    # by default one part covers the atlas.
+    def __init__(self, texture, faces, lights, parts=None):
+        self.texture = texture
+        self.faces = list(faces)
+        self.parts = parts if parts is not None else [((0, 0), (1, 1), len(self.faces))]
+        self.planes = {}              # (axis, sign, plane) -> [(lo, hi, (u0, v0, u1, v1))]
+        for axis, sign, plane, lo, hi, rect in self.faces:
+            self.planes.setdefault((axis, sign, round(plane, 3)), []).append((lo, hi, rect))
+        self.lights = lights          # rounded fixture position -> color
+        # Where the faces are on the atlas, whatever it holds
+        self.layout = hashlib.sha1(repr([(axis, sign, round(plane, 3), tuple(round(v, 3) for v in (*lo, *hi, *rect)))
+                                         for axis, sign, plane, lo, hi, rect in self.faces]).encode()).hexdigest()[:12]
+
+    def part(self, index, origin):
+        # One part on its own, with its faces around origin and their rects across the part
+        # alone; a prefab built with it takes any atlas with the same part layout (see apply).
+        # None if there is no such part.
+        if index >= len(self.parts):
+            return None
+        start = sum(count for _, _, count in self.parts[:index])
+        (u, v), (width, height), count = self.parts[index]
+        faces = []
+        for axis, sign, plane, lo, hi, (u0, v0, u1, v1) in self.faces[start:start + count]:
+            u_axis, v_axis = FACE_AXES[axis]
+            faces.append((axis, sign, plane - origin[axis],
+                          (lo[0] - origin[u_axis], lo[1] - origin[v_axis]), (hi[0] - origin[u_axis], hi[1] - origin[v_axis]),
+                          ((u0 - u) / width, (v0 - v) / height, (u1 - u) / width, (v1 - v) / height)))
+        return Lightmap(None, faces, {})
+
+    def apply(self, node_path, index):
+        # Lights a copy of part index's prefab with this atlas: the prefab's uvs are mapped into
+        # the part's rect by a texture matrix on the copy
+        (u, v), (width, height), _ = self.parts[index]
+        node_path.setTexture(LIGHTMAP_STAGE, self.texture)
+        node_path.setTexTransform(LIGHTMAP_STAGE, TransformState.makePosRotateScale2d(Vec2(u, v), 0, Vec2(width, height)))
+
+    def find(self, face):
+        # The baked face this face lies within: (lo, hi, rect) or None
+        for lo, hi, rect in self.planes.get((face.axis, face.sign, round(face.plane, 3)), ()):
+            if (lo[0] - EPSILON <= face.lo[0] and face.hi[0] <= hi[0] + EPSILON
+                    and lo[1] - EPSILON <= face.lo[1] and face.hi[1] <= hi[1] + EPSILON):
+                return lo, hi, rect
+        return None
+
+    def holds(self, face):
+        return self.find(face) is not None
+
+    def uv(self, face, point):
+        # Lightmap coordinates of a point on a face; the black texel for an unknown face
+        found = self.find(face)
+        if found is None:
+            return 0, 0
+        lo, hi, (u0, v0, u1, v1) = found
+        u_axis, v_axis = FACE_AXES[face.axis]
+        s = (point[u_axis] - lo[0]) / ((hi[0] - lo[0]) or 1)
+        t = (point[v_axis] - lo[1]) / ((hi[1] - lo[1]) or 1)
+        return u0 + s * (u1 - u0), v0 + t * (v1 - v0)
+
+    def light_color(self, item):
+        # The color a baked light was baked with, None if the light stays dynamic
+        if not is_static_light(item):
+            return None
+        return self.lights.get(tuple(round(v, 3) for v in item['position']))
+
+
+def read_lightmap(path):
+    with open(path, 'rb') as f:
+        magic, version, width, height, face_count, light_count, part_count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != BAKE_VERSION:
+            raise ValueError(f'{path} is not a version {BAKE_VERSION} lightmap')
+        parts = []
+        for _ in range(part_count):
+            u, v, part_width, part_height, count = PART_ROW.unpack(f.read(PART_ROW.size))
+            parts.append(((u, v), (part_width, part_height), count))
+        faces = []
+        for _ in range(face_count):
+            axis, sign, plane, lo_u, lo_v, hi_u, hi_v, *rect = FACE_ROW.unpack(f.read(FACE_ROW.size))
+            faces.append((axis, sign, plane, (lo_u, lo_v), (hi_u, hi_v), tuple(rect)))
+        lights = {}
+        for _ in range(light_count):
+            x, y, z, *color = LIGHT_ROW.unpack(f.read(LIGHT_ROW.size))
+            lights[tuple(round(v, 3) for v in (x, y, z))] = tuple(color)
+        pixels = f.read(width * height * 3)
+
+    texture = Texture(Path(path).stem)
+    texture.setup2dTexture(width, height, Texture.T_unsigned_byte, Texture.F_rgb8)
+    # Row 0 is v = 0 in Panda as in the atlas; only the channel order differs
+    texture.setRamImageAs(pixels, 'RGB')
+    texture.setWrapU(SamplerState.WM_clamp)
+    texture.setWrapV(SamplerState.WM_clamp)
+    texture.setMinfilter(SamplerState.FT_linear)
+    texture.setMagfilter(SamplerState.FT_linear)
+    return Lightmap(texture, faces, lights, parts)
+
+
+def load_lightmap(segment, segments, cache_dir=None):
+    # The segment's lightmap if it has been baked for exactly this geometry and these lights
+    path = cache_path(segment, bake_inputs(segment, segments), cache_dir)
+    if not path.exists():
+        return None
+    try:
+        return read_lightmap(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+if __name__ == '__main__':
+    # python lightbake.py [--layout layouts/hotel.json | --seed N --floors N] [--force]
+    from generator import generate_hotel
+    from layout import load_layout, validate_layout
+    from streaming import make_segments
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--layout', default='layouts/hotel.json')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--floors', type=int, default=3)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args()
+
+    layout = load_layout(args.layout) if args.seed is None else validate_layout(generate_hotel(args.seed, args.floors))
+    segments = make_segments(layout)
+    start = time.perf_counter()
+    for name, (path, ms) in bake(segments, force=args.force).items():
+        with open(path, 'rb') as f:
+            _, _, width, height, faces, lights, _ = HEADER.unpack(f.read(HEADER.size))
+        timing = 'up to date' if ms is None else f'{ms:.0f} ms'
+        print(f'{name}: {width}x{height}, {faces} faces, {lights} baked lights ({timing})')
+    print(f'{len(segments)} segments in {(time.perf_counter() - start):.1f} s')
@@ -0,0 +1,172 @@
+import sys
+import time
+
+from panda3d.core import GeomNode
+
+from asset_cache import HEADER, ROOT, compile_mesh
+
+
+# The full mesh, then what share of its vertices each coarser level keeps (asset_cache's vertex clustering)
+LOD_RATIOS = (None, 0.06, 0.015)
+
+
+def compile_levels(path, ratios=LOD_RATIOS, force=False):
+    # Offline: every level's cache file for an OBJ, so nothing is decimated while playing
+    return [compile_mesh(path, ratio, force=force) for ratio in ratios]
+
+
+def count_triangles(root, visible_only=False):
+    total = 0
+    paths = root.findAllMatches('**/+GeomNode')
+    if root.node().isOfType(GeomNode.getClassType()):
+        paths.addPath(root)
+    for node_path in paths:
+        if visible_only and node_path.isHidden():
+            continue
+        node = node_path.node()
+        for i in range(node.getNumGeoms()):
+            geom = node.getGeom(i)
+            for p in range(geom.getNumPrimitives()):
+                total += geom.getPrimitive(p).getNumFaces()
+    return total
+
+
+def make_impostor(nodes, render, min_size=0.3):
+    # One flattened copy of a cluster of entities, leaving out the parts too small to see
+    # from far away. It goes beside them under their parent, hidden until it is needed.
+    parent = nodes[0].getParent()
+    impostor = parent.attachNewNode('impostor')
+    for node in nodes:
+        scale = node.getScale(render)
+        if max(abs(scale[0]), abs(scale[1]), abs(scale[2])) < min_size:
+            continue
+        copy = node.copyTo(impostor)
+        for node_path in [copy] + list(copy.findAllMatches('**')):
+            node_path.clearPythonTag('Entity')
+    impostor.flattenStrong()
+    impostor.hide()
+    return impostor
+
+
+class LODGroup:
+    __slots__ = ('levels', 'position', 'triangles', 'level', 'owned')
+
+    def __init__(self, levels, position, owned=()):
+        self.levels = levels          # a list of NodePaths per level, finest first
+        self.position = tuple(position)
+        self.triangles = [sum(count_triangles(node) for node in nodes) for nodes in levels]
+        self.level = 0
+        self.owned = owned            # nodes made for the group, removed with it
+
+    @property
+    def alive(self):
+        # Destroying the entities (unloading, swapping decorations) ends the group
+        return not self.levels[0][0].isEmpty()
+
+
+class LODManager:
+    # Shows one level of detail per group by distance to the camera. Level n is used from
+    # distances[n - 1] on; a group only moves to another level once it is `hysteresis`
+    # past the boundary, so standing on one doesn't make it flip every frame. Groups whose
+    # segment is culled keep their level and aren't counted.
+    def __init__(self, render, distances=(12, 28), hysteresis=2):
+        self.render = render
+        self.distances = distances
+        self.hysteresis = hysteresis
+        self.groups = []
+        self.switches = 0
+        self.frame_stats = {}
+
+    def add(self, levels, position, owned=()):
+        levels = [list(nodes) if isinstance(nodes, (list, tuple)) else [nodes] for nodes in levels]
+        group = LODGroup(levels, position, owned)
+        for nodes in levels[1:]:
+            for node in nodes:
+                node.hide()
+        self.groups.append(group)
+        return group
+
+    def add_cluster(self, nodes, min_size=0.3):
+        # Many small entities that collapse into one impostor at distance
+        nodes = [node for node in nodes if not node.isEmpty()]
+        if not nodes:
+            return None
+        points = [node.getPos(self.render) for node in nodes]
+        center = [sum(p[i] for p in points) / len(points) for i in range(3)]
+        impostor = make_impostor(nodes, self.render, min_size)
+        return self.add([nodes, [impostor]], center, owned=(impostor,))
+
+    def target_level(self, group, distance):
+        last = min(len(group.levels) - 1, len(self.distances))
+        level = min(group.level, last)
+        while level < last and distance > self.distances[level] + self.hysteresis:
+            level += 1
+        while level > 0 and distance < self.distances[level - 1] - self.hysteresis:
+            level -= 1
+        return level
+
+    def prune(self):
+        alive = []
+        for group in self.groups:
+            if group.alive:
+                alive.append(group)
+            else:
+                for node in group.owned:
+                    if not node.isEmpty():
+                        node.removeNode()
+        self.groups = alive
+
+    def update(self, eye):
+        if any(not group.alive for group in self.groups):
+            self.prune()
+        self.switches = 0
+        counts = [0] * (max((len(group.levels) for group in self.groups), default=1))
+        triangles = full_triangles = culled = 0
+        for group in self.groups:
+            current = group.levels[group.level]
+            if current[0].isHidden():
+                culled += 1
+                continue
+            dx = group.position[0] - eye[0]
+            dy = group.position[1] - eye[1]
+            dz = group.position[2] - eye[2]
+            level = self.target_level(group, (dx * dx + dy * dy + dz * dz) ** 0.5)
+            if level != group.level:
+                for node in current:
+                    node.hide()
+                for node in group.levels[level]:
+                    node.show()
+                group.level = level
+                self.switches += 1
+            counts[level] += 1
+            triangles += group.triangles[level]
+            full_triangles += group.triangles[0]
+
+        self.frame_stats = {
+            'groups': len(self.groups),
+            'culled': culled,
+            'levels': counts,
+            'switches': self.switches,
+            'triangles': triangles,
+            'full_detail_triangles': full_triangles,
+        }
+        return triangles
+
+    @property
+    def stats(self):
+        return dict(self.frame_stats, distances=list(self.distances), hysteresis=self.hysteresis)
+
+
+if __name__ == '__main__':
+    # python lod.py [--force] assets/3d/*.obj  -> build every level's cache file ahead of time
+    args = sys.argv[1:]
+    force = '--force' in args
+    paths = [arg for arg in args if not arg.startswith('--')] or sorted(str(p.relative_to(ROOT)) for p in (ROOT / 'assets' / '3d').glob('*.obj'))
+    for path in paths:
+        start = time.perf_counter()
+        levels = []
+        for out in compile_levels(path, force=force):
+            with open(out, 'rb') as f:
+                _, _, _, _, index_count, *_ = HEADER.unpack(f.read(HEADER.size))
+            levels.append(f'{index_count // 3}')
+        print(f'{path}: {" / ".join(levels)} triangles in {(time.perf_counter() - start) * 1000:.0f} ms')
@@ -1,19 +1,113 @@
+from startup import StagedLoader, Wait, since_launch  # first, so startup times include importing ursina
+import math
+import os
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
-from random import uniform
-
-app = Ursina(borderless=False)
+from random import choice, uniform
+from atlas import TextureAtlas
+from asset_cache import load_mesh
+from batching import StaticBatch
+from collision import ColliderGrid
+from flicker import FlickerEngine
+from instancing import PropLibrary
+from interactables import InteractionGrid
+from light_budget import LightBudget, view_frustum
+from lod import LOD_RATIOS, LODManager
+from lightbake import load_lightmap, neighbour_occluders
+from layout import DECORATORS, DOOR_HEIGHT, DOOR_WIDTH, THEME, decorator_items, expand_items, load_layout, validate_layout
+from generator import generate_hotel
+from streaming import MB, StreamingManager, make_segments
+from texture_cache import QUALITY_TIERS, cached_texture, compile_in_background
+from telemetry import Telemetry
+from mutation import MutationScheduler, pick_kind
+from photo_cache import FULL_TIER, PhotoCache
+from portals import PortalGraph
+from prefab import STATIC_TYPES, RoomPrefabs, prefab_parts
+from profiler import Profiler
+from shadow_cache import ShadowCache
+from snapshot import SAVE_PATH, SnapshotError, SnapshotWriter, layout_hash, read_snapshot, restore_segment, segment_state
+
+# 'offscreen' or 'none' run without a desktop session (benchmarks, CI); there is no cursor or audio then
+WINDOW_TYPE = os.environ.get('OCCUPIED_WINDOW_TYPE', 'onscreen')
+HEADLESS = WINDOW_TYPE != 'onscreen'
+VERBOSE = os.environ.get('OCCUPIED_VERBOSE') == '1'  # print startup timings and other notes to stdout
+app = Ursina(borderless=False, window_type=WINDOW_TYPE)
 window.title = 'THE OCCUPIED'
 window.color = color.rgb(5, 0, 0)
 window.multisamples = 4  # Enable 4x MSAA (Anti-Aliasing)
+if HEADLESS:
+    # An offscreen buffer can't take cursor requests; keep ursina's mouse state without asking the window
+    Mouse = type(mouse)
+    Mouse.locked = property(Mouse.locked.fget, lambda self, value: setattr(self, '_locked', value))
+    Mouse.visible = property(Mouse.visible.fget, lambda self, value: setattr(self, '_visible', value))
 mouse.visible = True
 
 SHOW_SPLASH = False
 game_state = 'splash' if SHOW_SPLASH else 'game'
-flickering_lights = []
+flicker_engine = FlickerEngine()
 ambient_audio = None
 player_control_backup = {'speed': None, 'sensitivity': None}
 TOILET_MODEL = 'assets/3d/Toilet.obj'
+LAYOUT_PATH = 'layouts/hotel.json'
+LAYOUT_SEED = None  # set to an int to play a generated hotel instead of LAYOUT_PATH
+LAYOUT_FLOORS = 3
+static_batch = None
+painting_batch = None  # the segment being built's paintings go under this, to be flattened into one
+props = PropLibrary()
+MAX_ACTIVE_LIGHTS = 8
+MAX_SHADOW_LIGHTS = 2
+SHADOW_MAP_SIZE = 512
+light_budget = LightBudget(render, max_lights=MAX_ACTIVE_LIGHTS, max_shadows=MAX_SHADOW_LIGHTS, shadow_map_size=SHADOW_MAP_SIZE)
+SHADOW_CACHE = True  # shadow maps are redrawn only when something within their light's reach moves
+shadow_cache = ShadowCache(light_range=light_budget.light_range)
+LOD_DISTANCES = (12, 28)  # camera distance at which props drop to their next level of detail
+LOD_HYSTERESIS = 2
+lod = LODManager(render, distances=LOD_DISTANCES, hysteresis=LOD_HYSTERESIS)
+LIGHTMAPS = True  # static lights come from baked lightmaps (python lightbake.py) where there are any
+ROOM_PREFABS = True  # rooms alike share their walls, floor and bathroom, built once
+prefabs = RoomPrefabs()
+TEXTURE_ATLAS = True  # paintings, photos and the door wood come from shared atlas pages
+atlas = TextureAtlas()
+COLLISION_CELL_SIZE = 8  # the player only collides with the cells next to theirs
+colliders = ColliderGrid(cell_size=COLLISION_CELL_SIZE)
+STREAMING = True
+STREAM_LOAD_RADIUS = 40
+STREAM_UNLOAD_RADIUS = 60
+STREAM_MEMORY_BUDGET = 96 * MB
+STREAM_FRAME_BUDGET = 4  # ms of segment building per frame
+world = None
+TEXTURE_QUALITY = 'medium'  # 'high', 'medium' or 'low' texture cache tier; None loads the source images
+PHOTO_CACHE_BUDGET = 64 * MB  # full resolution photos kept for the photo viewer
+PHOTO_PREFETCH_RADIUS = 12  # photo tables this close have their photo loaded before it is looked at
+PHOTO_PREFETCH_INTERVAL = 0.5  # seconds between looks for photo tables nearby
+photo_cache = PhotoCache(memory_budget=PHOTO_CACHE_BUDGET)
+since_photo_prefetch = 0.0
+interactables = InteractionGrid()
+INTERACT_DISTANCE = 5
+STARTUP_FRAME_BUDGET = 12  # ms of world building per loading screen frame
+loader = None
+current_layout = None
+startup_times = {}  # 'first_frame' and 'interactive', ms since launch
+telemetry = None  # set up once the world is built
+MUTATION_FRAME_BUDGET = 2  # ms per frame for changing rooms the player can't see
+mutations = None
+level_segments = []  # every layout Segment, loaded or not
+room_segments = {}  # room name -> its layout Segment, what the room is (re)built from
+room_parts = {}  # room name -> the live lights, doors, photo tables and decorations built for it
+building_room = None  # the room whose items build_item is making
+PORTAL_CULLING = True  # draw only the segment the camera is in and those seen through it
+portals = None
+AUTOSAVE_INTERVAL = 30  # seconds between saves, written on a background thread
+RESUME_ON_LAUNCH = True  # carry on from the last save instead of checking in afresh
+snapshot_writer = None
+resume_from = None  # the snapshot start_game is resuming
+layout_source = {}  # where current_layout came from, for the save
+since_autosave = 0.0
+PROFILE = os.environ.get('OCCUPIED_PROFILE') == '1'  # time the parts of each frame from launch; F3 toggles it, F4 writes a trace
+PROFILE_OVERLAY_INTERVAL = 0.5  # seconds between overlay refreshes
+profiler = Profiler(enabled=PROFILE)
+profile_text = None
+since_profile_overlay = 0.0
 
 
 splash_bg = Entity(
@@ -47,44 +141,77 @@ continue_text = Text(
     enabled=SHOW_SPLASH
 )
 
+loading_screen = None
+loading_text = None
+loading_bar = None
+
+def show_loading_screen():
+    # Covers the world while it is built behind it
+    global loading_screen, loading_text, loading_bar
+    if loading_screen is None:
+        loading_screen = Entity(parent=camera.ui, z=-0.5)
+        Entity(parent=loading_screen, model='quad', color=color.black, scale=(4, 1))
+        loading_text = Text(parent=loading_screen, text='', origin=(0, 0), y=0.05, scale=1.1, color=color.light_gray, z=-0.01)
+        bar_back = Entity(parent=loading_screen, model='quad', color=color.rgb(30, 0, 0), scale=(0.6, 0.012), y=-0.05, z=-0.01)
+        loading_bar = Entity(parent=bar_back, model='quad', color=color.rgb(150, 10, 10), origin_x=-0.5, x=-0.5, scale_x=0, z=-0.01)
+    loading_screen.enabled = True
+    update_loading_screen(0, None)
+
+def update_loading_screen(progress, stage):
+    loading_text.text = f'{stage or "checking in"}... {int(progress * 100)}%'
+    loading_bar.scale_x = progress
+
+
 viewing_photo = False
-photo_overlay = Entity(
-    parent=camera.ui,
-    model='quad',
-    color=color.rgba(0, 0, 0, 220),
-    scale=(1.8, 1.0),
-    enabled=False,
-    z=-0.01
-)
-photo_frame = Entity(
-    parent=photo_overlay,
-    model='quad',
-    color=color.rgb(24, 24, 24),
-    scale=(1.3, 0.85),
-    z=-0.01
-)
-photo_image = Entity(
-    parent=photo_frame,
-    model='quad',
-    color=color.white,
-    texture='white_cube',
-    scale=(0.95, 0.9),
-    z=-0.02,
-    unlit=True
-)
-photo_caption = Text(
-    parent=photo_overlay,
-    text='Press E or ESC to close',
-    y=-0.42,
-    origin=(0, 0),
-    scale=0.8,
-    color=color.light_gray
-)
+photo_overlay = None
+photo_image = None
+
+def build_photo_overlay():
+    # Built the first time a photo is looked at rather than at startup
+    global photo_overlay, photo_image
+    photo_overlay = Entity(
+        parent=camera.ui,
+        model='quad',
+        color=color.rgba(0, 0, 0, 220),
+        scale=(1.8, 1.0),
+        enabled=False,
+        z=-0.01
+    )
+    photo_frame = Entity(
+        parent=photo_overlay,
+        model='quad',
+        color=color.rgb(24, 24, 24),
+        scale=(1.3, 0.85),
+        z=-0.01
+    )
+    photo_image = Entity(
+        parent=photo_frame,
+        model='quad',
+        color=color.white,
+        texture='white_cube',
+        scale=(0.95, 0.9),
+        z=-0.02,
+        unlit=True
+    )
+    Text(
+        parent=photo_overlay,
+        text='Press E or ESC to close',
+        y=-0.42,
+        origin=(0, 0),
+        scale=0.8,
+        color=color.light_gray
+    )
 
 def show_photo(texture_path):
     global viewing_photo
+    if photo_overlay is None:
+        build_photo_overlay()
     viewing_photo = True
-    photo_image.texture = texture_path
+    # The game's own copy at once; the full resolution one when the photo cache has it
+    photo_image.texture = cached_texture(texture_path, TEXTURE_QUALITY)
+    full = photo_cache.get(texture_path) if TEXTURE_QUALITY else None
+    if full:
+        photo_image.model.setTexture(full, 1)
     photo_overlay.enabled = True
     mouse.visible = True
     if hasattr(mouse, 'locked'):
@@ -104,6 +231,7 @@ def hide_photo():
     if not viewing_photo:
         return
     viewing_photo = False
+    photo_cache.release()
     photo_overlay.enabled = False
     mouse.visible = False
     scene.fog_color = color.rgb(10, 0, 0)
@@ -123,95 +251,74 @@ def hide_photo():
 
 
 class LightSwitch(Entity):
-    def __init__(self, position, rotation=(0,0,0), light_source=None, **kwargs):
+    def __init__(self, position, rotation=(0,0,0), light_source=None, is_on=True, item=None, room=None, **kwargs):
         super().__init__(
-            model='cube',
-            color=color.dark_gray,
             scale=(0.2, 0.3, 0.05),
             position=position,
             rotation=rotation,
-            collider='box',
             **kwargs
         )
         self.light_source = light_source
-        self.indicator = Entity(
-            parent=self,
-            model='quad',
-            scale=(0.5, 0.2),
-            position=(0, 0.2, -0.51),
-            color=color.green,
-            unlit=True
-        )
-        self.is_on = True
+        if light_source:
+            light_source.switch = self
+            if not is_on:
+                light_source.disable()
+        self.is_on = is_on
+        self.item = item  # the layout's switch; it remembers the switch's state for the next rebuild and the save
+        self.room = room  # the room whose light it works; None outside rooms
+        self.instance = props.instance(self, 'light_switch', self.is_on)
+        # Set into the wall, so nothing walks into it; only interaction needs its box
+        interactables.add(self, center=Vec3(0, 0, 0), size=Vec3(1, 1, 1))
 
     def toggle(self):
         self.is_on = not self.is_on
+        if self.item is not None:
+            self.item['on'] = self.is_on
+        # On and off switches are separate shared prototypes; swap which one this switch shows
+        self.instance.removeNode()
+        self.instance = props.instance(self, 'light_switch', self.is_on)
         if self.is_on:
-            self.indicator.color = color.green
             if self.light_source: 
                 self.light_source.enable()
         else:
-            self.indicator.color = color.red
             if self.light_source: 
                 self.light_source.disable()
+        if telemetry:
+            telemetry.light_switched(self.world_position, self.is_on, room=self.room)
 
 
-class FlickeringLight:
-    def __init__(self, light, interval_range=(0.08, 0.25), intensity_range=(0.35, 1.0)):
-        self.light = light
-        self.interval_range = interval_range
-        self.intensity_range = intensity_range
-        self.base_color = (
-            light.color.r,
-            light.color.g,
-            light.color.b,
-            light.color.a
-        )
-        self.current_intensity = intensity_range[1]
-        self.target_intensity = intensity_range[1]
-        self.timer = uniform(*self.interval_range)
-
-    def update(self):
-        self.timer -= time.dt
-        if self.timer <= 0:
-            self.timer = uniform(*self.interval_range)
-            self.target_intensity = uniform(*self.intensity_range)
-        self.current_intensity = lerp(
-            self.current_intensity,
-            self.target_intensity,
-            min(1, time.dt * 8)
-        )
-        self._apply_intensity(self.current_intensity)
-
-    def _apply_intensity(self, intensity):
-        clamped = max(0.0, min(1.0, intensity))
-        r, g, b, a = self.base_color
-        self.light.color = Color(
-            max(0.0, min(1.0, r * clamped)),
-            max(0.0, min(1.0, g * clamped)),
-            max(0.0, min(1.0, b * clamped)),
-            a
-        )
+def build_light_switch(parent, is_on):
+    Entity(parent=parent, model='cube', color=color.dark_gray, add_to_scene_entities=False)
+    Entity(
+        parent=parent,
+        model='quad',
+        scale=(0.5, 0.2),
+        position=(0, 0.2, -0.51),
+        color=color.green if is_on else color.red,
+        unlit=True,
+        add_to_scene_entities=False
+    )
+
 
 class WallLight(Entity):
-    def __init__(self, position, rotation=(0,0,0), light_color=None, flicker=False, interval_range=(0.08, 0.25), intensity_range=(0.35, 1.0), **kwargs):
+    def __init__(self, position, rotation=(0,0,0), light_color=None, flicker=False, interval_range=(0.08, 0.25), intensity_range=(0.35, 1.0), baked=False, **kwargs):
         super().__init__(
-            model='cube',
             scale=(0.5, 0.8, 0.1), # Tall rectangular light like in image
             position=position,
             rotation=rotation,
-            color=color.dark_gray,
             **kwargs
         )
         light_color = light_color or haunted_light_color()
-        self.emissive = Entity(
-            parent=self,
-            model='quad',
-            scale=(0.8, 0.9),
-            z=-0.51,
-            color=light_color,
-            unlit=True
-        )
+        props.instance(self, 'wall_light')
+        # The glow is shared too; each light tints its own copy
+        self.emissive = self.attachNewNode('emissive')
+        self.emissive.setColorScale(light_color)
+        props.instance(self.emissive, 'wall_light_emissive')
+        self.light = None
+        self.flicker_controller = None
+        if baked:
+            # What it lights is in the segment's lightmap; only the fixture is left to draw
+            return
         self.light = PointLight(
             parent=self,
             position=(0, 0, -2),
@@ -219,20 +326,26 @@ class WallLight(Entity):
             shadows=True
         )
         self.light.attenuation = (0.5, 0, 0.05)
-        self.flicker_controller = None
+        light_budget.add(self.light, shadows=True)
 
         if flicker:
-            # Register a flicker controller so the hallway lighting stays unsettled
-            controller = FlickeringLight(self.light, interval_range=interval_range, intensity_range=intensity_range)
-            flickering_lights.append(controller)
-            self.flicker_controller = controller
+            # Register with the flicker engine so the hallway lighting stays unsettled
+            self.flicker_controller = flicker_engine.add(self.light, interval_range=interval_range, intensity_range=intensity_range)
+
+
+def build_wall_light(parent):
+    Entity(parent=parent, model='cube', color=color.dark_gray, add_to_scene_entities=False)
+
+
+def build_wall_light_emissive(parent):
+    Entity(parent=parent, model='quad', scale=(0.8, 0.9), z=-0.51, unlit=True, add_to_scene_entities=False)
+
 
 class Door(Entity):
-    def __init__(self, position, rotation=(0,0,0), width=3.2, height=3.5, thickness=0.12, door_color=color.white, texture='assets/wood1.jpg', **kwargs):
+    def __init__(self, position, rotation=(0,0,0), width=3.2, height=3.5, thickness=0.12, door_color=color.white, texture='assets/wood1.jpg', locked=False, is_open=False, item=None, **kwargs):
         super().__init__(
             model='cube',
             color=door_color,
-            texture=texture,
             scale=(width, height, thickness),
             position=position,
             rotation=rotation,
@@ -240,14 +353,43 @@ class Door(Entity):
             origin_x=0.5,
             **kwargs
         )
-        self.is_open = False
+        small_texture(self, texture)
+        self.is_open = is_open
+        self.ajar = is_open  # open or still swinging shut; the room behind it can be seen
+        self.locked = locked
+        self.item = item  # the layout's door; it remembers whether the door was left open
+        if is_open:
+            self.rotation_y += 90
+        interactables.add(self)
+        colliders.add_dynamic(self)
 
     def toggle(self):
+        if self.locked and not self.is_open:
+            # It only rattles
+            self.shake(duration=0.3, magnitude=0.03)
+            return
         self.is_open = not self.is_open
+        if self.item is not None:
+            self.item['open'] = self.is_open
+        # The lights around it see it swing
+        shadow_cache.invalidate(self.world_position, radius=self.scale_x, seconds=0.6)
         if self.is_open:
+            self.ajar = True
             self.animate_rotation_y(self.rotation_y + 90, duration=0.5)
         else:
             self.animate_rotation_y(self.rotation_y - 90, duration=0.5)
+        invoke(self.settle, delay=0.5)
+
+    def settle(self):
+        # The swung door's box moves once the animation has finished
+        self.ajar = self.is_open
+        interactables.update(self)
+        colliders.update_dynamic(self)
+
+    def lock(self):
+        self.locked = True
+        if self.is_open:
+            self.toggle()
 
 
 class PhotoTable(Entity):
@@ -256,78 +398,98 @@ class PhotoTable(Entity):
         self.photo_texture = photo_texture
         half_height = table_scale[1] * 0.5
         self.collider = BoxCollider(self, center=Vec3(0, half_height, 0), size=Vec3(*table_scale))
+        props.instance(self, 'photo_table', photo_texture, tuple(table_scale))
+        interactables.add(self)
+        colliders.add_dynamic(self)
 
-        top_color = color.rgb(70, 45, 28)
-        leg_color = color.rgb(210, 210, 210)
-
-        self.table_top = Entity(
-            parent=self,
-            model='cube',
-            texture='assets/wood1.jpg',
-            color=top_color,
-            scale=(table_scale[0], 0.12, table_scale[2]),
-            position=(0, half_height, 0)
-        )
+    def interact(self):
+        show_photo(self.photo_texture)
 
-        leg_offsets = (
-            (table_scale[0] * 0.45, table_scale[2] * 0.4),
-            (-table_scale[0] * 0.45, table_scale[2] * 0.4),
-            (table_scale[0] * 0.45, -table_scale[2] * 0.4),
-            (-table_scale[0] * 0.45, -table_scale[2] * 0.4)
-        )
-        leg_height = max(0.6, table_scale[1] - 0.1)
-        for lx, lz in leg_offsets:
-            Entity(
-                parent=self,
-                model='cube',
-                color=leg_color,
-                scale=(0.12, leg_height, 0.12),
-                position=(lx, leg_height * 0.5, lz)
-            )
 
-        Entity(
-            parent=self.table_top,
-            model='quad',
-            color=color.rgba(140, 0, 0, 120),
-            rotation_x=90,
-            position=(0.35, 0.07, -0.18),
-            scale=(0.75, 0.3),
-            unlit=True
-        )
+def build_photo_table(parent, photo_texture, table_scale):
+    half_height = table_scale[1] * 0.5
+    top_color = color.rgb(70, 45, 28)
+    leg_color = color.rgb(210, 210, 210)
 
-        frame = Entity(
-            parent=self.table_top,
-            model='quad',
-            color=color.rgb(15, 15, 15),
-            rotation=(65, 180, 0),
-            position=(-0.05, 0.22, 0.1),
-            scale=(0.72, 0.52),
-            unlit=True,
-            double_sided=True
-        )
-        Entity(
-            parent=frame,
-            model='quad',
-            texture=photo_texture,
-            rotation=(0, 0, 0),
-            position=(0, 0, -0.02),
-            scale=(0.9, 0.9),
-            unlit=True
-        )
+    table_top = Entity(
+        parent=parent,
+        model='cube',
+        color=top_color,
+        scale=(table_scale[0], 0.12, table_scale[2]),
+        position=(0, half_height, 0),
+        add_to_scene_entities=False
+    )
+    small_texture(table_top, 'assets/wood1.jpg')
 
+    leg_offsets = (
+        (table_scale[0] * 0.45, table_scale[2] * 0.4),
+        (-table_scale[0] * 0.45, table_scale[2] * 0.4),
+        (table_scale[0] * 0.45, -table_scale[2] * 0.4),
+        (-table_scale[0] * 0.45, -table_scale[2] * 0.4)
+    )
+    leg_height = max(0.6, table_scale[1] - 0.1)
+    for lx, lz in leg_offsets:
         Entity(
-            parent=self.table_top,
+            parent=parent,
             model='cube',
-            color=color.rgb(25, 20, 20),
-            position=(-0.05, 0.09, -0.02),
-            rotation=(0, 20, 0),
-            scale=(0.1, 0.22, 0.4)
+            color=leg_color,
+            scale=(0.12, leg_height, 0.12),
+            position=(lx, leg_height * 0.5, lz),
+            add_to_scene_entities=False
         )
 
-    def interact(self):
-        show_photo(self.photo_texture)
+    Entity(
+        parent=table_top,
+        model='quad',
+        color=color.rgba(140, 0, 0, 120),
+        rotation_x=90,
+        position=(0.35, 0.07, -0.18),
+        scale=(0.75, 0.3),
+        unlit=True,
+        add_to_scene_entities=False
+    )
+
+    frame = Entity(
+        parent=table_top,
+        model='quad',
+        color=color.rgb(15, 15, 15),
+        rotation=(65, 180, 0),
+        position=(-0.05, 0.22, 0.1),
+        scale=(0.72, 0.52),
+        unlit=True,
+        double_sided=True,
+        add_to_scene_entities=False
+    )
+    photo = Entity(
+        parent=frame,
+        model='quad',
+        rotation=(0, 0, 0),
+        position=(0, 0, -0.02),
+        scale=(0.9, 0.9),
+        unlit=True,
+        add_to_scene_entities=False
+    )
+    small_texture(photo, photo_texture)
+
+    Entity(
+        parent=table_top,
+        model='cube',
+        color=color.rgb(25, 20, 20),
+        position=(-0.05, 0.09, -0.02),
+        rotation=(0, 20, 0),
+        scale=(0.1, 0.22, 0.4),
+        add_to_scene_entities=False
+    )
+
 
 def create_wall(position, scale, color=color.white, texture='assets/wall.jpg', texture_scale=None):
+    if not texture_scale:
+        # Reduce texture repetition on walls too
+        texture_scale = (scale[0] * 0.5, scale[1] * 0.5)
+    texture = cached_texture(texture, TEXTURE_QUALITY)
+    if static_batch is not None:
+        static_batch.add_cube(position, scale, color, texture, texture_scale)
+        return None
     e = Entity(
         model='cube', 
         position=position, 
@@ -336,26 +498,42 @@ def create_wall(position, scale, color=color.white, texture='assets/wall.jpg', t
         texture=texture, 
         collider='box'
     )
-    if texture_scale:
-        e.texture_scale = texture_scale
-    else:
-        # Reduce texture repetition on walls too
-        e.texture_scale = (scale[0] * 0.5, scale[1] * 0.5)
+    e.texture_scale = texture_scale
     return e
 
 def create_floor(position, scale):
+    # Reduce texture repetition to avoid grainy look (make tiles larger)
+    texture_scale = (scale[0] * 0.25, scale[2] * 0.25)
+    texture = cached_texture('assets/stonetiles_002_diff.png', TEXTURE_QUALITY)
+    if static_batch is not None:
+        static_batch.add_plane(position, scale, color.white, texture, texture_scale)
+        return None
     e = Entity(
         model='plane', 
         position=position, 
         scale=scale, 
         color=color.white, 
-        texture='assets/stonetiles_002_diff.png', 
+        texture=texture, 
         collider='box'
     )
-    # Reduce texture repetition to avoid grainy look (make tiles larger)
-    e.texture_scale = (scale[0] * 0.25, scale[2] * 0.25)
+    e.texture_scale = texture_scale
     return e
 
+def create_block(position, scale, color=color.white, texture=None, collider=False):
+    # Plain non-interactive cube (frames, counters, steps); batched like walls when possible
+    texture = cached_texture(texture, TEXTURE_QUALITY)
+    if static_batch is not None:
+        static_batch.add_cube(position, scale, color, texture, collider=collider)
+        return None
+    return Entity(
+        model='cube',
+        position=position,
+        scale=scale,
+        color=color,
+        texture=texture,
+        collider='box' if collider else None
+    )
+
 
 def haunted_light_color():
     r = max(30, min(140, 90 + uniform(-20, 25)))
@@ -366,680 +544,865 @@ def haunted_light_color():
 
 def spawn_toilet(position, rotation=(0, 0, 0), scale=0.5):
     toilet = Entity(
-        model=TOILET_MODEL,
         position=position,
         rotation=rotation,
-        scale=scale,
-        color=color.white,
-        collider='box',
-        unlit=False
+        scale=scale
     )
+    # Each level hangs under a node of this toilet's own; hiding the shared instance would hide every toilet
+    levels = []
+    for ratio in LOD_RATIOS:
+        level = toilet.attachNewNode(f'lod_{ratio}')
+        props.instance(level, 'toilet', ratio)
+        levels.append(level)
     toilet.y = position.y
+    lod.add(levels, toilet.world_position)
+    if static_batch is not None:
+        # Solid like the walls: one more static box, blocking movement and interaction rays
+        low, high = toilet.getTightBounds(toilet.getParent())
+        static_batch.colliders.append((tuple((low + high) / 2), tuple((high - low) / 2)))
+        return toilet
+    low, high = props.bounds('toilet', LOD_RATIOS[0])
+    toilet.collider = BoxCollider(toilet, center=(low + high) / 2, size=high - low)
+    # Solid, so it still stops interaction rays
+    interactables.add(toilet, interactive=False)
     return toilet
 
+
+def build_toilet(parent, decimate_ratio=None):
+    Entity(parent=parent, model=load_mesh(TOILET_MODEL, decimate_ratio), color=color.white, add_to_scene_entities=False)
+
+
+props.register('toilet', build_toilet)
+props.register('light_switch', build_light_switch)
+props.register('wall_light', build_wall_light)
+props.register('wall_light_emissive', build_wall_light_emissive)
+props.register('photo_table', build_photo_table)
+
 # -------------------------------
-# GAME WORLD
+# LAYOUT BUILDING
 # -------------------------------
-player = None
+painting_textures = [
+    'assets/photo_placeholder1.png',
+    'assets/photo_placeholder2.png',
+    'assets/photo_placeholder3.png',
+    'assets/photo_placeholder1.png',
+    'assets/photo_placeholder2.png',
+    'assets/photo_placeholder3.png',
+    'assets/photo_placeholder1.png',
+    'assets/photo_placeholder2.png',
+    'assets/photo_placeholder3.png',
+    'assets/photo_placeholder1.png',
+]
+painting_index = 0
+
+photo_textures = [
+    'assets/photo_placeholder1.png',
+    'assets/photo_placeholder2.png',
+    'assets/photo_placeholder3.png'
+]
+photo_index = 0
+
+
+def layout_color(value, default=color.white):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = THEME[value]
+    if len(value) == 4:
+        return color.rgba(*value)
+    return color.rgb(*value)
+
+
+def place_painting(position, rotation=(0, 0, 0), scale=(3, 2.4), texture=None):
+    global painting_index
+    if texture is None:
+        if not painting_textures:
+            return
+        texture = painting_textures[painting_index % len(painting_textures)]
+        painting_index += 1
+    painting = Entity(
+        parent=painting_batch or scene,
+        model='quad',
+        position=position,
+        rotation=rotation,
+        scale=scale,
+        unlit=True,
+        double_sided=False,
+        add_to_scene_entities=painting_batch is None
+    )
+    small_texture(painting, texture)
+    # Pull the painting slightly off the wall so the texture is visible head-on.
+    painting.position += painting.forward * 0.03
 
-def start_game():
-    global game_state, player, flickering_lights, ambient_audio
 
-    game_state = 'game'
-    flickering_lights.clear()
+def small_texture(entity, path):
+    # Paintings, photos and the wood: from an atlas page where the image is on one, so they
+    # all bind the same texture, otherwise on their own as before
+    region = atlas.region(path) if TEXTURE_ATLAS else None
+    if region:
+        region.apply(entity.model)
+    else:
+        entity.texture = cached_texture(path, TEXTURE_QUALITY)
 
-    # Hide splash UI
-    splash_bg.disable()
-    warning_text.disable()
-    continue_text.disable()
 
-    mouse.visible = False
+def place_photo_table(position, rotation=(0, 0, 0), texture=None):
+    global photo_index
+    if texture is None:
+        if not photo_textures:
+            return
+        texture = photo_textures[photo_index % len(photo_textures)]
+        photo_index += 1
+    return PhotoTable(position=position, rotation=rotation, photo_texture=texture)
 
-    if ambient_audio is None:
-        ambient_audio = Audio('assets/audio/bg.mp3', loop=True, autoplay=False)
-        ambient_audio.volume = 0.8
-    if not ambient_audio.playing:
-        ambient_audio.volume = 0.8
-        ambient_audio.play()
 
-    # Player
-    player = FirstPersonController(
-        speed=6,
-        mouse_sensitivity=Vec2(40, 40),
-        position=(0, 1, -40),
-        gravity=1,
-        jump_height=2
-    )
-    player.collider = 'box'
+def build_item(item):
+    kind = item['type']
+    position = tuple(item['position'])
+    rotation = tuple(item.get('rotation', (0, 0, 0)))
 
-    # -------------------
-    # CONSTANTS
-    # -------------------
-    CORRIDOR_WIDTH = 10
-    CORRIDOR_HEIGHT = 6
-    ROOM_HEIGHT = 6
-    DOOR_WIDTH = 2.0
-    DOOR_HEIGHT = 3.5
-    
-    theme_wall = color.rgb(212, 195, 178)
-    theme_ceiling = color.rgb(245, 237, 224)
-    theme_door = color.white
-    
-    # -------------------
-    # HELPERS
-    # -------------------
-    def make_room(pos, size, door_dir, light_color=None, flicker=False, decorator=None):
-        # pos: (x, z) center of room
-        # size: (width, depth)
-        # door_dir: 'north', 'south', 'east', 'west' (direction pointing INTO the room from corridor)
-        w, d = size
-        x, z = pos
-
-        if light_color is None:
-            light_color = haunted_light_color()
-
-        # Floor and ceiling
-        create_floor(position=(x, 0, z), scale=(w, 1, d))
-        create_wall(position=(x, ROOM_HEIGHT, z), scale=(w, 0.2, d), color=theme_ceiling, texture='assets/rustytiles01_spec.png', texture_scale=(max(1, w/3), max(1, d/3)))
-
-        t = 0.2
-        half_w = w / 2
-        half_d = d / 2
-
-        light_switch_position = None
-        light_switch_rotation = (0, 0, 0)
-
-        if door_dir == 'west':
-            create_wall(position=(x - half_w, ROOM_HEIGHT/2, z), scale=(t, ROOM_HEIGHT, d), color=theme_wall)  # Back
-            create_wall(position=(x, ROOM_HEIGHT/2, z + half_d), scale=(w, ROOM_HEIGHT, t), color=theme_wall)  # Top
-            create_wall(position=(x, ROOM_HEIGHT/2, z - half_d), scale=(w, ROOM_HEIGHT, t), color=theme_wall)  # Bottom
-            light_switch_position = (x + half_w + 0.2, 1.5, z + 2)
-            light_switch_rotation = (0, -90, 0)
-
-        elif door_dir == 'east':
-            create_wall(position=(x + half_w, ROOM_HEIGHT/2, z), scale=(t, ROOM_HEIGHT, d), color=theme_wall)  # Front
-            create_wall(position=(x, ROOM_HEIGHT/2, z + half_d), scale=(w, ROOM_HEIGHT, t), color=theme_wall)  # Top
-            create_wall(position=(x, ROOM_HEIGHT/2, z - half_d), scale=(w, ROOM_HEIGHT, t), color=theme_wall)  # Bottom
-            light_switch_position = (x - half_w - 0.2, 1.5, z + 2)
-            light_switch_rotation = (0, 90, 0)
-
-        elif door_dir == 'north':
-            create_wall(position=(x, ROOM_HEIGHT/2, z + half_d), scale=(w, ROOM_HEIGHT, t), color=theme_wall)  # Top
-            create_wall(position=(x - half_w, ROOM_HEIGHT/2, z), scale=(t, ROOM_HEIGHT, d), color=theme_wall)  # Left
-            create_wall(position=(x + half_w, ROOM_HEIGHT/2, z), scale=(t, ROOM_HEIGHT, d), color=theme_wall)  # Right
-            light_switch_position = (x + 2, 1.5, z - half_d - 0.2)
-            light_switch_rotation = (0, 0, 0)
-
-        elif door_dir == 'south':
-            create_wall(position=(x, ROOM_HEIGHT/2, z - half_d), scale=(w, ROOM_HEIGHT, t), color=theme_wall)  # Bottom
-            create_wall(position=(x - half_w, ROOM_HEIGHT/2, z), scale=(t, ROOM_HEIGHT, d), color=theme_wall)  # Left
-            create_wall(position=(x + half_w, ROOM_HEIGHT/2, z), scale=(t, ROOM_HEIGHT, d), color=theme_wall)  # Right
-            light_switch_position = (x - 2, 1.5, z + half_d + 0.2)
-            light_switch_rotation = (0, 180, 0)
+    if kind == 'floor':
+        create_floor(position=position, scale=tuple(item['scale']))
 
-        else:
-            raise ValueError(f'Unsupported door_dir {door_dir}')
-
-        def add_bathroom():
-            bath_w = min(max(2.4, w * 0.45), max(2.4, w - 1.2))
-            bath_d = min(max(2.4, d * 0.45), max(2.4, d - 1.2))
-            if bath_w <= 1.5 or bath_d <= 1.5:
-                return
-
-            wall_thickness = 0.18
-            inset = 0.4
-            bath_height = ROOM_HEIGHT - 0.4
-            wall_center_y = bath_height / 2
-            bath_wall_color = color.rgb(228, 230, 236)
-
-            if door_dir == 'west':
-                bath_cx = x - half_w + bath_w / 2 + inset
-                bath_cz = z + half_d - bath_d / 2 - inset
-                door_axis = 'south'
-            elif door_dir == 'east':
-                bath_cx = x + half_w - bath_w / 2 - inset
-                bath_cz = z + half_d - bath_d / 2 - inset
-                door_axis = 'south'
-            elif door_dir == 'north':
-                bath_cx = x + half_w - bath_w / 2 - inset
-                bath_cz = z + half_d - bath_d / 2 - inset
-                door_axis = 'west'
-            elif door_dir == 'south':
-                bath_cx = x + half_w - bath_w / 2 - inset
-                bath_cz = z - half_d + bath_d / 2 + inset
-                door_axis = 'north'
-            else:
-                return
-
-            door_span = bath_w if door_axis in ('north', 'south') else bath_d
-            door_width = max(0.8, min(1.2, door_span - 0.6))
-            if door_width >= door_span:
-                door_width = max(0.6, door_span - 0.4)
-
-            create_floor(position=(bath_cx, 0.02, bath_cz), scale=(bath_w, 1, bath_d))
-            create_wall(position=(bath_cx, ROOM_HEIGHT - 0.1, bath_cz), scale=(bath_w, 0.12, bath_d), color=theme_ceiling, texture='assets/wood.jpg', texture_scale=(max(1, bath_w / 2), max(1, bath_d / 2)))
-
-            def wall(position, scale):
-                create_wall(position=position, scale=scale, color=bath_wall_color, texture='assets/wall.png')
-
-            def full_wall(axis):
-                if axis == 'north':
-                    wall(position=(bath_cx, wall_center_y, bath_cz + bath_d / 2), scale=(bath_w, bath_height, wall_thickness))
-                elif axis == 'south':
-                    wall(position=(bath_cx, wall_center_y, bath_cz - bath_d / 2), scale=(bath_w, bath_height, wall_thickness))
-                elif axis == 'east':
-                    wall(position=(bath_cx + bath_w / 2, wall_center_y, bath_cz), scale=(wall_thickness, bath_height, bath_d))
-                else:
-                    wall(position=(bath_cx - bath_w / 2, wall_center_y, bath_cz), scale=(wall_thickness, bath_height, bath_d))
-
-            for axis in ('north', 'south', 'east', 'west'):
-                if axis != door_axis:
-                    full_wall(axis)
-
-            side_total = bath_w - door_width if door_axis in ('north', 'south') else bath_d - door_width
-            if door_axis in ('south', 'north') and side_total > 0.2:
-                left = max(0.2, side_total / 2)
-                right = max(0.2, side_total - left)
-                if door_axis == 'south':
-                    wall(position=(bath_cx - (door_width / 2 + left / 2), wall_center_y, bath_cz - bath_d / 2), scale=(left, bath_height, wall_thickness))
-                    wall(position=(bath_cx + (door_width / 2 + right / 2), wall_center_y, bath_cz - bath_d / 2), scale=(right, bath_height, wall_thickness))
-                else:
-                    wall(position=(bath_cx - (door_width / 2 + left / 2), wall_center_y, bath_cz + bath_d / 2), scale=(left, bath_height, wall_thickness))
-                    wall(position=(bath_cx + (door_width / 2 + right / 2), wall_center_y, bath_cz + bath_d / 2), scale=(right, bath_height, wall_thickness))
-            elif door_axis in ('east', 'west') and side_total > 0.2:
-                near = max(0.2, side_total / 2)
-                far_segment = max(0.2, side_total - near)
-                if door_axis == 'east':
-                    wall(position=(bath_cx + bath_w / 2, wall_center_y, bath_cz - (door_width / 2 + near / 2)), scale=(wall_thickness, bath_height, near))
-                    wall(position=(bath_cx + bath_w / 2, wall_center_y, bath_cz + (door_width / 2 + far_segment / 2)), scale=(wall_thickness, bath_height, far_segment))
-                else:
-                    wall(position=(bath_cx - bath_w / 2, wall_center_y, bath_cz - (door_width / 2 + near / 2)), scale=(wall_thickness, bath_height, near))
-                    wall(position=(bath_cx - bath_w / 2, wall_center_y, bath_cz + (door_width / 2 + far_segment / 2)), scale=(wall_thickness, bath_height, far_segment))
-
-            # Door frame visuals
-            frame_color = color.rgb(120, 100, 80)
-            frame_height = 3.0
-            frame_thickness = 0.12
-            frame_depth = 0.18
-            if door_axis == 'south':
-                door_z = bath_cz - bath_d / 2
-                Entity(model='cube', color=frame_color, position=(bath_cx - door_width / 2 + frame_thickness / 2, frame_height / 2, door_z - frame_depth / 2), scale=(frame_thickness, frame_height, frame_depth))
-                Entity(model='cube', color=frame_color, position=(bath_cx + door_width / 2 - frame_thickness / 2, frame_height / 2, door_z - frame_depth / 2), scale=(frame_thickness, frame_height, frame_depth))
-                Entity(model='cube', color=frame_color, position=(bath_cx, frame_height - 1.2, door_z - frame_depth / 2), scale=(door_width, frame_thickness, frame_depth))
-                switch_pos = (bath_cx + door_width / 2 + 0.25, 1.3, door_z + 0.3)
-                switch_rot = (0, -90, 0)
-            elif door_axis == 'north':
-                door_z = bath_cz + bath_d / 2
-                Entity(model='cube', color=frame_color, position=(bath_cx - door_width / 2 + frame_thickness / 2, frame_height / 2, door_z + frame_depth / 2), scale=(frame_thickness, frame_height, frame_depth))
-                Entity(model='cube', color=frame_color, position=(bath_cx + door_width / 2 - frame_thickness / 2, frame_height / 2, door_z + frame_depth / 2), scale=(frame_thickness, frame_height, frame_depth))
-                Entity(model='cube', color=frame_color, position=(bath_cx, frame_height - 1.2, door_z + frame_depth / 2), scale=(door_width, frame_thickness, frame_depth))
-                switch_pos = (bath_cx + door_width / 2 + 0.25, 1.3, door_z - 0.3)
-                switch_rot = (0, -90, 0)
-            elif door_axis == 'east':
-                door_x = bath_cx + bath_w / 2
-                Entity(model='cube', color=frame_color, position=(door_x + frame_depth / 2, frame_height / 2, bath_cz - door_width / 2 + frame_thickness / 2), scale=(frame_depth, frame_height, frame_thickness))
-                Entity(model='cube', color=frame_color, position=(door_x + frame_depth / 2, frame_height / 2, bath_cz + door_width / 2 - frame_thickness / 2), scale=(frame_depth, frame_height, frame_thickness))
-                Entity(model='cube', color=frame_color, position=(door_x + frame_depth / 2, frame_height - 1.2, bath_cz, ), scale=(frame_depth, frame_thickness, door_width))
-                switch_pos = (door_x - 0.3, 1.3, bath_cz + door_width / 2 + 0.25)
-                switch_rot = (0, 0, 0)
-            else:
-                door_x = bath_cx - bath_w / 2
-                Entity(model='cube', color=frame_color, position=(door_x - frame_depth / 2, frame_height / 2, bath_cz - door_width / 2 + frame_thickness / 2), scale=(frame_depth, frame_height, frame_thickness))
-                Entity(model='cube', color=frame_color, position=(door_x - frame_depth / 2, frame_height / 2, bath_cz + door_width / 2 - frame_thickness / 2), scale=(frame_depth, frame_height, frame_thickness))
-                Entity(model='cube', color=frame_color, position=(door_x - frame_depth / 2, frame_height - 1.2, bath_cz), scale=(frame_depth, frame_thickness, door_width))
-                switch_pos = (door_x + 0.3, 1.3, bath_cz + door_width / 2 + 0.25)
-                switch_rot = (0, 180, 0)
-
-            bath_light = PointLight(parent=scene, position=(bath_cx, ROOM_HEIGHT - 1.2, bath_cz), color=color.rgb(190, 205, 220))
-            LightSwitch(position=switch_pos, rotation=switch_rot, light_source=bath_light)
-
-            # Add real toilet asset along the side wall relative to entrance
-            toilet_pos = Vec3(bath_cx, 0, bath_cz)
-            toilet_rot = (0, 0, 0)
-            if door_axis == 'south':
-                toilet_pos = Vec3(bath_cx - bath_w / 2 + 0.9, 0, bath_cz + 0.3)
-                toilet_rot = (0, 90, 0)
-            elif door_axis == 'north':
-                toilet_pos = Vec3(bath_cx - bath_w / 2 + 0.9, 0, bath_cz - 0.3)
-                toilet_rot = (0, 90, 0)
-            elif door_axis == 'east':
-                toilet_pos = Vec3(bath_cx - 0.3, 0, bath_cz + bath_d / 2 - 1.0)
-                toilet_rot = (0, 0, 0)
-            else:  # west
-                toilet_pos = Vec3(bath_cx + 0.3, 0, bath_cz + bath_d / 2 - 1.0)
-                toilet_rot = (0, 180, 0)
-            spawn_toilet(position=toilet_pos, rotation=toilet_rot, scale=0.5)
-
-            # Small counter and cabinet to keep scene populated
-            Entity(model='cube', color=color.rgb(235, 235, 240), position=(bath_cx + bath_w / 2 - 0.7, 0.45, bath_cz + bath_d / 2 - 0.6), scale=(0.9, 0.9, 0.5))
-            Entity(model='cube', color=color.rgb(200, 200, 205), position=(bath_cx + bath_w / 2 - 0.6, 0.35, bath_cz + bath_d / 2 - 0.6), scale=(0.7, 0.6, 0.7))
-
-        add_bathroom()
-
-        room_light = PointLight(parent=scene, position=(x, ROOM_HEIGHT - 1, z), color=light_color)
+    elif kind == 'wall':
+        create_wall(
+            position=position,
+            scale=tuple(item['scale']),
+            color=layout_color(item.get('color')),
+            texture=item.get('texture', 'assets/wall.jpg'),
+            texture_scale=item.get('texture_scale')
+        )
 
-        if flicker:
-            flickering_lights.append(FlickeringLight(room_light, interval_range=(0.05, 0.3), intensity_range=(0.15, 1.0)))
-
-        if light_switch_position:
-            LightSwitch(position=light_switch_position, rotation=light_switch_rotation, light_source=room_light)
-
-        if decorator:
-            decorator(center=(x, z), size=(w, d))
-
-    painting_textures = [
-        'assets/photo_placeholder1.png',
-        'assets/photo_placeholder2.png',
-        'assets/photo_placeholder3.png',
-        'assets/photo_placeholder1.png',
-        'assets/photo_placeholder2.png',
-        'assets/photo_placeholder3.png',
-        'assets/photo_placeholder1.png',
-        'assets/photo_placeholder2.png',
-        'assets/photo_placeholder3.png',
-        'assets/photo_placeholder1.png',
-    ]
-    painting_index = 0
+    elif kind == 'block':
+        create_block(
+            position=position,
+            scale=tuple(item['scale']),
+            color=layout_color(item.get('color')),
+            texture=item.get('texture'),
+            collider=item.get('collider', False)
+        )
 
-    def place_painting(position, rotation=(0, 0, 0), scale=(3, 2.4)):
-        nonlocal painting_index
-        if not painting_textures:
-            return
-        texture_path = painting_textures[painting_index % len(painting_textures)]
-        painting_index += 1
-        painting = Entity(
-            model='quad',
-            texture=texture_path,
+    elif kind == 'door':
+        door = Door(
             position=position,
             rotation=rotation,
-            scale=scale,
-            unlit=True,
-            double_sided=False
+            width=item.get('width', DOOR_WIDTH),
+            height=item.get('height', DOOR_HEIGHT),
+            door_color=layout_color(item.get('color')),
+            locked=item.get('locked', False),
+            is_open=item.get('open', False),
+            item=item
         )
-        # Pull the painting slightly off the wall so the texture is visible head-on.
-        painting.position += painting.forward * 0.03
-
-    photo_textures = [
-        'assets/photo_placeholder1.png',
-        'assets/photo_placeholder2.png',
-        'assets/photo_placeholder3.png'
-    ]
-    photo_index = 0
+        if item.get('room'):
+            room_part(item['room'])['doors'].append(door)
 
-    def add_photo_table_factory(door_direction):
-        def decorator(center, size):
-            nonlocal photo_index
-            if not photo_textures:
-                return
-
-            cx, cz = center
-            w, d = size
-            wall_offset = 1.4
-            y = 0
-
-            if door_direction == 'west':
-                position = (cx - w / 2 + wall_offset, y, cz)
-                rotation = (0, 90, 0)
-            elif door_direction == 'east':
-                position = (cx + w / 2 - wall_offset, y, cz)
-                rotation = (0, -90, 0)
-            elif door_direction == 'north':
-                position = (cx, y, cz + d / 2 - wall_offset)
-                rotation = (0, 180, 0)
-            else:  # 'south'
-                position = (cx, y, cz - d / 2 + wall_offset)
-                rotation = (0, 0, 0)
-
-            texture_path = photo_textures[photo_index % len(photo_textures)]
-            photo_index += 1
-            PhotoTable(position=position, rotation=rotation, photo_texture=texture_path)
-
-        return decorator
-
-    def combine_decorators(*decorators):
-        def wrapper(center, size):
-            for deco in decorators:
-                if deco:
-                    deco(center=center, size=size)
-        return wrapper
-
-    def add_occult_circle(center, size):
-        cx, cz = center
-        Entity(
-            model='quad',
-            color=color.rgb(120, 0, 0),
-            position=(cx, 0.04, cz),
-            rotation_x=90,
-            scale=(size[0] * 0.7, size[1] * 0.7),
-            unlit=True
-        )
-        Entity(
-            model='quad',
-            color=color.rgb(200, 40, 40),
-            position=(cx, 2.4, cz + size[1] * 0.18),
-            scale=(2.4, 1.2),
-            unlit=True
-        )
-        Entity(
-            model='cube',
-            color=color.rgb(30, 30, 30),
-            position=(cx, 0.6, cz - size[1] * 0.25),
-            scale=(size[0] * 0.5, 1.1, 0.6)
-        )
-        for offset in (-1.2, 0, 1.2):
-            Entity(
-                model='cube',
-                color=color.rgb(200, 160, 90),
-                position=(cx + offset, 0.6, cz + size[1] * 0.18),
-                scale=(0.14, 0.6, 0.14)
-            )
-            Entity(
-                model='sphere',
-                color=color.rgb(255, 210, 120),
-                position=(cx + offset, 1.0, cz + size[1] * 0.18),
-                scale=0.2,
-                unlit=True
-            )
-
-    def add_storage_abattoir(center, size):
-        cx, cz = center
-        Entity(
-            model='quad',
-            color=color.rgb(140, 0, 0),
-            position=(cx - size[0] * 0.2, 0.04, cz + size[1] * 0.15),
-            rotation_x=90,
-            scale=(size[0] * 0.5, size[1] * 0.4),
-            unlit=True
-        )
-        Entity(
-            model='cube',
-            color=color.rgb(45, 45, 45),
-            position=(cx + size[0] * 0.25, 1.2, cz - size[1] * 0.1),
-            scale=(size[0] * 0.4, 2.5, size[1] * 0.2)
-        )
-        for n in range(3):
-            Entity(
-                model='cube',
-                color=color.rgb(25, 20, 20),
-                position=(cx - size[0] * 0.25 + n * 1.2, 2.0, cz - size[1] * 0.2),
-                scale=(0.4, 1.6, 0.4)
-            )
-        Entity(
-            model='quad',
-            color=color.rgb(255, 120, 120),
-            position=(cx, 3.5, cz + size[1] * 0.4),
-            rotation=(90, 0, 0),
-            scale=(size[0] * 0.6, size[1] * 0.2),
-            unlit=True
+    elif kind == 'wall_light':
+        baked = baked_light_color(item)
+        WallLight(
+            position=position,
+            rotation=rotation,
+            light_color=color.rgb(*baked) if baked else None,
+            flicker=item.get('flicker', False),
+            interval_range=tuple(item.get('interval_range', (0.08, 0.25))),
+            intensity_range=tuple(item.get('intensity_range', (0.35, 1.0))),
+            baked=bool(baked)
         )
 
-    # -------------------
-    # LAYOUT GENERATION
-    # -------------------
-    
-    # --- SEGMENT A (Entrance) ---
-    # From Z=-50 to Z=0
-    # Floor & Ceiling
-    create_floor(position=(0, 0, -25), scale=(CORRIDOR_WIDTH, 1, 50))
-    create_wall(position=(0, CORRIDOR_HEIGHT, -25), scale=(CORRIDOR_WIDTH, 0.2, 50), color=theme_ceiling, texture='assets/rustytiles01_spec.png', texture_scale=(3, 15))
-    
-    # Entrance Wall
-    create_wall(position=(0, CORRIDOR_HEIGHT/2, -50), scale=(CORRIDOR_WIDTH, CORRIDOR_HEIGHT, 0.2), color=theme_wall)
-
-    # Left Wall (X=-5)
-    # Room 1 (Small) at Z=-40
-    create_wall(position=(-5, CORRIDOR_HEIGHT/2, -45.5), scale=(0.2, CORRIDOR_HEIGHT, 9), color=theme_wall)
-    create_wall(position=(-5, CORRIDOR_HEIGHT - 1.2, -40), scale=(0.2, 2.4, DOOR_WIDTH), color=theme_wall) # Header
-    Door(position=(-5, DOOR_HEIGHT/2, -40 + DOOR_WIDTH/2), rotation=(0, -90, 0), width=DOOR_WIDTH, height=DOOR_HEIGHT, door_color=theme_door)
-    create_wall(position=(-5, CORRIDOR_HEIGHT/2, -17), scale=(0.2, CORRIDOR_HEIGHT, 44), color=theme_wall)
-    
-    make_room((-9, -40), (8, 8), 'west', decorator=add_photo_table_factory('west'))
-
-    # Right Wall (X=5)
-    # Room 2 (Big) at Z=-15
-    create_wall(position=(5, CORRIDOR_HEIGHT/2, -33), scale=(0.2, CORRIDOR_HEIGHT, 34), color=theme_wall)
-    create_wall(position=(5, CORRIDOR_HEIGHT - 1.2, -15), scale=(0.2, 2.4, DOOR_WIDTH), color=theme_wall) # Header
-    Door(position=(5, DOOR_HEIGHT/2, -15 - DOOR_WIDTH/2), rotation=(0, 90, 0), width=DOOR_WIDTH, height=DOOR_HEIGHT, door_color=theme_door)
-    create_wall(position=(5, CORRIDOR_HEIGHT/2, -9.5), scale=(0.2, CORRIDOR_HEIGHT, 9), color=theme_wall)
-    
-    make_room((12, -15), (14, 14), 'east', decorator=add_photo_table_factory('east'))
-
-    # Lights Segment A
-    for z in range(-40, -5, 15):
-        WallLight(position=(-4.8, 4, z), rotation=(0, 90, 0), flicker=(z % 30 == 0))
-        WallLight(position=(4.8, 4, z), rotation=(0, -90, 0), flicker=(z % 20 == 0), intensity_range=(0.1, 0.85))
-
-    place_painting(position=(-4.6, 3.2, -32), rotation=(0, 90, 0))
-    place_painting(position=(4.6, 3.2, -18), rotation=(0, -90, 0))
-
-    # --- INTERSECTION 1 (A -> B) ---
-    # Fill missing corner (-5 to 0, 0 to 5)
-    create_floor(position=(-2.5, 0, 2.5), scale=(5, 1, 5))
-    create_wall(position=(-2.5, CORRIDOR_HEIGHT, 2.5), scale=(5, 0.2, 5), color=theme_ceiling, texture='assets/wood.jpg', texture_scale=(1.5, 1.5))
-    create_wall(position=(-5, CORRIDOR_HEIGHT/2, 2.5), scale=(0.2, CORRIDOR_HEIGHT, 5), color=theme_wall)
-    create_wall(position=(-2.5, CORRIDOR_HEIGHT/2, 5), scale=(5, CORRIDOR_HEIGHT, 0.2), color=theme_wall)
-
-    # --- SEGMENT B (The Turn) ---
-    # From X=0 to X=30 (at Z=0)
-    # Floor & Ceiling
-    create_floor(position=(15, 0, 0), scale=(30, 1, CORRIDOR_WIDTH))
-    create_wall(position=(15, CORRIDOR_HEIGHT, 0), scale=(30, 0.2, CORRIDOR_WIDTH), color=theme_ceiling, texture='assets/wood.jpg', texture_scale=(10, 3))
-    
-    # Top Wall (Z=5)
-    # Room 3 (Small) at X=15
-    create_wall(position=(4.5, CORRIDOR_HEIGHT/2, 5), scale=(19, CORRIDOR_HEIGHT, 0.2), color=theme_wall)
-    create_wall(position=(15, CORRIDOR_HEIGHT - 1.2, 5), scale=(DOOR_WIDTH, 2.4, 0.2), color=theme_wall) # Header
-    Door(position=(15 - DOOR_WIDTH/2, DOOR_HEIGHT/2, 5), rotation=(0, 0, 0), width=DOOR_WIDTH, height=DOOR_HEIGHT, door_color=theme_door)
-    create_wall(position=(20.5, CORRIDOR_HEIGHT/2, 5), scale=(9, CORRIDOR_HEIGHT, 0.2), color=theme_wall)
-    
-    make_room((15, 10), (10, 10), 'north')
-    
-    # Bottom Wall (Z=-5)
-    create_wall(position=(20, CORRIDOR_HEIGHT/2, -5), scale=(30, CORRIDOR_HEIGHT, 0.2), color=theme_wall)
-
-    # Lights Segment B
-    for x in range(5, 30, 15):
-        WallLight(position=(x, 4, 4.8), rotation=(0, 180, 0), flicker=(x == 20), intensity_range=(1.8, 5))
-        WallLight(position=(x, 4, -4.8), rotation=(0, 0, 0), flicker=(x == 5))
-
-    # --- INTERSECTION 2 (B -> C) ---
-    # Fill missing corner (30 to 35, -5 to 0)
-    create_floor(position=(32.5, 0, -2.5), scale=(5, 1, 5))
-    create_wall(position=(32.5, CORRIDOR_HEIGHT, -2.5), scale=(5, 0.2, 5), color=theme_ceiling, texture='assets/wood.jpg', texture_scale=(1.5, 1.5))
-    create_wall(position=(35, CORRIDOR_HEIGHT/2, -2.5), scale=(0.2, CORRIDOR_HEIGHT, 5), color=theme_wall)
-    create_wall(position=(32.5, CORRIDOR_HEIGHT/2, -5), scale=(5, CORRIDOR_HEIGHT, 0.2), color=theme_wall)
-
-    # --- SEGMENT C (To Stairs) ---
-    # From Z=0 to Z=40 (at X=30)
-    # Floor & Ceiling
-    create_floor(position=(30, 0, 20), scale=(CORRIDOR_WIDTH, 1, 40))
-    create_wall(position=(30, CORRIDOR_HEIGHT, 20), scale=(CORRIDOR_WIDTH, 0.2, 40), color=theme_ceiling, texture='assets/wood.jpg', texture_scale=(3, 12))
-    
-    # Left Wall (X=25)
-    create_wall(position=(25, CORRIDOR_HEIGHT/2, 22.5), scale=(0.2, CORRIDOR_HEIGHT, 35), color=theme_wall)
-    
-    # Right Wall (X=35)
-    # Room 4 (Big) at Z=25
-    create_wall(position=(35, CORRIDOR_HEIGHT/2, 9.5), scale=(0.2, CORRIDOR_HEIGHT, 29), color=theme_wall)
-    create_wall(position=(35, CORRIDOR_HEIGHT - 1.2, 25), scale=(0.2, 2.4, DOOR_WIDTH), color=theme_wall) # Header
-    Door(position=(35, DOOR_HEIGHT/2, 25 - DOOR_WIDTH/2), rotation=(0, 90, 0), width=DOOR_WIDTH, height=DOOR_HEIGHT, door_color=theme_door)
-    create_wall(position=(35, CORRIDOR_HEIGHT/2, 33), scale=(0.2, CORRIDOR_HEIGHT, 14), color=theme_wall)
-    
-    make_room((42, 25), (12, 12), 'east', decorator=add_photo_table_factory('east'))
-
-    # Lights Segment C
-    for z in range(10, 35, 15):
-        WallLight(position=(25.2, 4, z), rotation=(0, 90, 0), flicker=(z == 25), intensity_range=(0.08, 0.9))
-        WallLight(position=(34.8, 4, z), rotation=(0, -90, 0), flicker=(z != 10))
-
-    place_painting(position=(12, 3, 4.6), rotation=(0, 180, 0))
-    place_painting(position=(24, 3, -4.6), rotation=(0, 0, 0))
-
-    place_painting(position=(25.4, 3.1, 18), rotation=(0, 90, 0))
-    place_painting(position=(34.6, 3.1, 30), rotation=(0, -90, 0))
-
-    # -------------------
-    # STAIRCASE
-    # -------------------
-    stair_z_start = 40
-    stair_x = 30
-    
-    # Floor for stair area
-    create_floor(position=(stair_x, 0, stair_z_start + 10), scale=(CORRIDOR_WIDTH, 1, 20))
-    create_wall(position=(stair_x, CORRIDOR_HEIGHT + 4, stair_z_start + 10), scale=(CORRIDOR_WIDTH, 0.2, 20), color=theme_ceiling, texture='assets/wood.jpg', texture_scale=(3, 6))
-    
-    # Walls around stairwell
-    create_wall(position=(stair_x - 5, CORRIDOR_HEIGHT/2 + 2, stair_z_start + 10), scale=(0.2, CORRIDOR_HEIGHT+4, 20), color=theme_wall)
-    create_wall(position=(stair_x + 5, CORRIDOR_HEIGHT/2 + 2, stair_z_start + 10), scale=(0.2, CORRIDOR_HEIGHT+4, 20), color=theme_wall)
-    create_wall(position=(stair_x, CORRIDOR_HEIGHT/2 + 2, stair_z_start + 20), scale=(CORRIDOR_WIDTH, CORRIDOR_HEIGHT+4, 0.2), color=theme_wall)
-
-    # Steps
-    for i in range(20):
-        Entity(
-            model='cube',
-            color=color.rgb(100, 100, 100),
-            texture='assets/wood1.jpg',
-            position=(stair_x, i*0.3, stair_z_start + i*0.5),
-            scale=(6, 0.3, 0.5),
-            collider='box'
+    elif kind == 'point_light' and baked_light_color(item):
+        # Already in the lightmap
+        pass
+
+    elif kind == 'point_light':
+        light_color = layout_color(item.get('color'), default=None) or haunted_light_color()
+        light = PointLight(parent=scene, position=position, color=light_color, shadows=item.get('shadows', False))
+        light_budget.add(light, shadows=item.get('shadows', False))
+        if building_room:
+            room_part(building_room)['lights'].append(light)
+        flicker = item.get('flicker')
+        if flicker:
+            flicker_engine.add(light, interval_range=tuple(flicker['interval_range']), intensity_range=tuple(flicker['intensity_range']))
+        switch = item.get('switch')
+        if switch:
+            LightSwitch(position=tuple(switch['position']), rotation=tuple(switch['rotation']), light_source=light,
+                        is_on=switch.get('on', True), item=switch, room=building_room)
+
+    elif kind == 'toilet':
+        spawn_toilet(position=Vec3(*position), rotation=rotation, scale=item.get('scale', 0.5))
+
+    elif kind == 'photo_table':
+        table = place_photo_table(position=position, rotation=rotation, texture=item.get('texture'))
+        if table and building_room:
+            room_part(building_room)['tables'].append(table)
+
+    elif kind == 'painting':
+        place_painting(position=position, rotation=rotation, scale=tuple(item.get('scale', (3, 2.4))), texture=item.get('texture'))
+
+    elif kind == 'decal':
+        scale = item['scale']
+        decal = Entity(
+            model=item['model'],
+            color=layout_color(item.get('color')),
+            position=position,
+            rotation=rotation,
+            scale=tuple(scale) if isinstance(scale, list) else scale,
+            unlit=item.get('unlit', False),
+            billboard=item.get('billboard', False),
+            double_sided=item.get('double_sided', False)
         )
-    
-    # Landing at top
-    landing_z = stair_z_start + 10
-    landing_height = 6
-    create_floor(position=(stair_x, landing_height, landing_z + 5), scale=(CORRIDOR_WIDTH, 1, 10))
-
-    # Upper level corridor extension
-    upper_length = 40
-    upper_start = landing_z + 5
-    upper_end = upper_start + upper_length
-    upper_center = upper_start + upper_length / 2
-    upper_wall_y = landing_height + CORRIDOR_HEIGHT / 2
-
-    create_floor(position=(stair_x, landing_height, upper_center), scale=(CORRIDOR_WIDTH, 1, upper_length))
-    create_wall(
-        position=(stair_x, landing_height + CORRIDOR_HEIGHT, upper_center),
-        scale=(CORRIDOR_WIDTH, 0.2, upper_length),
-        color=theme_ceiling,
-        texture='assets/wood.jpg',
-        texture_scale=(3, max(3, upper_length / 6))
-    )
-
-    left_wall_start = upper_start + 6
-    left_door_flush = upper_start + 12
-    right_wall_start = upper_start + 6
-    right_door_flush = upper_start + 22
+        if item.get('decorator') and building_room:
+            room_part(building_room)['decor'].setdefault(item['decorator'], []).append(decal)
 
-    # Left wall segments (west side)
-    create_wall(
-        position=(stair_x - CORRIDOR_WIDTH / 2, upper_wall_y, (left_wall_start + left_door_flush) / 2),
-        scale=(0.2, CORRIDOR_HEIGHT, max(0.2, left_door_flush - left_wall_start)),
-        color=theme_wall
-    )
-    create_wall(
-        position=(stair_x - CORRIDOR_WIDTH / 2, upper_wall_y, (left_door_flush + DOOR_WIDTH + upper_end) / 2),
-        scale=(0.2, CORRIDOR_HEIGHT, max(0.2, upper_end - (left_door_flush + DOOR_WIDTH))),
-        color=theme_wall
-    )
+    else:
+        raise ValueError(f'Unsupported layout item {kind}')
 
-    # Right wall segments (east side)
-    create_wall(
-        position=(stair_x + CORRIDOR_WIDTH / 2, upper_wall_y, (right_wall_start + right_door_flush) / 2),
-        scale=(0.2, CORRIDOR_HEIGHT, max(0.2, right_door_flush - right_wall_start)),
-        color=theme_wall
-    )
-    create_wall(
-        position=(stair_x + CORRIDOR_WIDTH / 2, upper_wall_y, (right_door_flush + DOOR_WIDTH + upper_end) / 2),
-        scale=(0.2, CORRIDOR_HEIGHT, max(0.2, upper_end - (right_door_flush + DOOR_WIDTH))),
-        color=theme_wall
-    )
 
-    # Corridor end cap
-    create_wall(
-        position=(stair_x, upper_wall_y, upper_end),
-        scale=(CORRIDOR_WIDTH, CORRIDOR_HEIGHT, 0.2),
-        color=theme_wall
-    )
+def baked_light_color(item):
+    # The color a light was baked with, if the segment being built has a lightmap holding it
+    if static_batch is None or static_batch.lightmap is None:
+        return None
+    return static_batch.lightmap.light_color(item)
 
-    # Doors to upper rooms
-    Door(position=(stair_x - CORRIDOR_WIDTH / 2, DOOR_HEIGHT/2 + landing_height, left_door_flush + DOOR_WIDTH/2), rotation=(0, -90, 0), width=DOOR_WIDTH, height=DOOR_HEIGHT, door_color=theme_door)
-    Door(position=(stair_x + CORRIDOR_WIDTH / 2, DOOR_HEIGHT/2 + landing_height, right_door_flush + DOOR_WIDTH/2), rotation=(0, 90, 0), width=DOOR_WIDTH, height=DOOR_HEIGHT, door_color=theme_door)
-
-    # Upper rooms
-    left_room_center = (stair_x - CORRIDOR_WIDTH / 2 - 6, left_door_flush + DOOR_WIDTH)
-    right_room_center = (stair_x + CORRIDOR_WIDTH / 2 + 6, right_door_flush + DOOR_WIDTH)
-    make_room(
-        left_room_center,
-        (12, 14),
-        'west',
-        light_color=color.rgb(140, 50, 20),
-        flicker=True,
-        decorator=combine_decorators(add_occult_circle, add_photo_table_factory('west'))
-    )
-    make_room(right_room_center, (10, 12), 'east', light_color=color.rgb(90, 20, 20), flicker=True, decorator=add_storage_abattoir)
 
-    # Upper hallway lighting and props
-    for z in range(int(upper_start + 8), int(upper_end), 12):
-        WallLight(position=(stair_x - CORRIDOR_WIDTH / 2 + 0.2, landing_height + 4, z), rotation=(0, 90, 0), flicker=True, intensity_range=(0.1, 0.9))
-        WallLight(position=(stair_x + CORRIDOR_WIDTH / 2 - 0.2, landing_height + 4, z), rotation=(0, -90, 0), flicker=(z % 24 == 0), intensity_range=(0.05, 0.8))
+def room_part(name):
+    return room_parts.setdefault(name, {'lights': [], 'doors': [], 'tables': [], 'decor': {}})
 
-    place_painting(position=(stair_x - CORRIDOR_WIDTH / 2 + 0.3, landing_height + 2.8, upper_start + 14), rotation=(0, 90, 0), scale=(2.6, 2.2))
-    place_painting(position=(stair_x + CORRIDOR_WIDTH / 2 - 0.3, landing_height + 2.8, upper_start + 26), rotation=(0, -90, 0), scale=(2.6, 2.2))
 
-    dread_light = PointLight(parent=scene, position=(stair_x, landing_height + 3.5, upper_end - 3), color=color.rgb(180, 20, 20), shadows=True)
-    flickering_lights.append(FlickeringLight(dread_light, interval_range=(0.02, 0.15), intensity_range=(0.03, 0.7)))
+def build_room_item(item, room, root=None):
+    # Builds one item for a room (None outside rooms); new top-level entities go under root
+    global building_room
+    first = len(scene.entities)
+    building_room = room
+    try:
+        build_item(item)
+    finally:
+        building_room = None
+    if root:
+        for entity in scene.entities[first:]:
+            if entity.parent == scene:
+                entity.parent = root
 
-    Entity(
-        model='quad',
-        color=color.rgb(150, 0, 0),
-        position=(stair_x, landing_height + 0.05, upper_end - 3),
-        rotation_x=90,
-        scale=(4, 2),
-        unlit=True
-    )
 
-    Entity(
-        model='quad',
-        color=color.rgb(20, 20, 20),
-        position=(stair_x, landing_height + 2.4, upper_end - 2),
-        scale=(1.6, 3.6),
-        billboard=True
-    )
+# -------------------------------
+# STREAMING
+# -------------------------------
+def assign_textures(segments):
+    # Fix paintings and photos up front so a segment looks the same every time it reloads
+    global painting_index, photo_index
+    for segment in segments:
+        for item in segment.items:
+            if item['type'] == 'painting' and 'texture' not in item and painting_textures:
+                item['texture'] = painting_textures[painting_index % len(painting_textures)]
+                painting_index += 1
+            elif item['type'] == 'photo_table' and 'texture' not in item and photo_textures:
+                item['texture'] = photo_textures[photo_index % len(photo_textures)]
+                photo_index += 1
+
+
+def load_segment(segment):
+    global static_batch, painting_batch
+    root = Entity(name=segment.name)
+    segment.root = root
+    batch = StaticBatch()
+    paintings = Entity(parent=root, name='paintings', add_to_scene_entities=False)
+    batch.lightmap = load_lightmap(segment, level_segments) if LIGHTMAPS else None
+    shared = room_prefabs(segment, batch.lightmap) if ROOM_PREFABS and segment.kind == 'room' else None
+
+    for item in segment.items:
+        if shared and item['type'] in STATIC_TYPES:
+            continue
+        static_batch = batch
+        painting_batch = paintings
+        try:
+            build_room_item(item, segment.name if segment.kind == 'room' else None, root)
+        finally:
+            static_batch = None
+            painting_batch = None
+        yield
+
+    if shared:
+        # The batch only holds the toilet's box then
+        origin = room_origin(room_item(segment.name))
+        for index, prefab in enumerate(shared):
+            holder, boxes = prefabs.stamp(prefab, root, origin)
+            if batch.lightmap:
+                batch.lightmap.apply(holder, index)
+            batch.colliders = boxes + batch.colliders
+    else:
+        # Faces buried in other walls (its own or the next segment's) go, and pieces in line merge
+        batch.optimize(neighbour_occluders(segment, level_segments))
+        batch.build(parent=root, collide=False)
+    invalidate_shadows(segment)
+    light_budget.assign(root, segment.name)
+    # Nothing moves a painting once it is hung; with one atlas page they become a single mesh
+    if paintings.getNumChildren():
+        for node_path in paintings.findAllMatches('**/*'):
+            node_path.clearPythonTag('Entity')
+        paintings.flattenStrong()
+    else:
+        destroy(paintings)
+    # Walls and floors stop interaction rays, and the player as simplified solids
+    interactables.add_occluders(segment.name, batch.colliders)
+    colliders.add_static(segment.name, batch.colliders)
+    for decals in room_parts.get(segment.name, {}).get('decor', {}).values():
+        lod.add_cluster(decals)
+
+
+def invalidate_shadows(segment):
+    # Its geometry came or went; the shadows of the lights in reach of it are out of date
+    center = tuple((lo + hi) / 2 for lo, hi in zip(segment.lo, segment.hi))
+    shadow_cache.invalidate(center, radius=math.dist(segment.lo, segment.hi) / 2)
+
+
+def room_origin(room):
+    x, z = room['center']
+    return (x, room.get('elevation', 0), z)
+
+
+def room_prefabs(segment, lightmap=None):
+    # The shared static geometry for a room like this one, each part built now if it is the
+    # first of its kind; None if any part can't be shared. A lightmapped room's parts are
+    # shared with rooms whose bake laid them out the same way; each copy gets its own
+    # room's lightmap (Lightmap.apply).
+    room = room_item(segment.name)
+    if room is None:
+        return None
+    origin = room_origin(room)
+    found = []
+    for index, (key, items) in enumerate(prefab_parts(room, [item for item in segment.items if item['type'] in STATIC_TYPES])):
+        part = lightmap.part(index, origin) if lightmap else None
+        if lightmap and part is None:
+            return None
+        if part:
+            key += (part.layout,)
+        prefab = prefabs.get(key, items, origin, lambda local, part=part: build_prefab(local, part))
+        if prefab is None:
+            return None
+        found.append(prefab)
+    return found
+
+
+def build_prefab(items, lightmap=None):
+    # As load_segment batches a room's static items, around the origin and under a holder of their own
+    global static_batch
+    batch = StaticBatch()
+    batch.lightmap = lightmap
+    static_batch = batch
+    try:
+        for item in items:
+            build_item(item)
+    finally:
+        static_batch = None
+    batch.optimize()
+    holder = Entity(add_to_scene_entities=False)
+    # The prefab keeps the geometry, not the entities
+    batch.build(parent=holder, collide=False, add_to_scene_entities=False)
+    return holder, batch.colliders
+
+
+def unload_segment(segment):
+    if segment.root is None:
+        return
+    # Lights stay applied to render after their node is gone unless cleared
+    for light in segment.root.findAllMatches('**/+Light;+s'):
+        render.clearLight(light)
+    destroy(segment.root)
+    invalidate_shadows(segment)
+    flicker_engine.prune()
+    # Doors stay listed under their room; they go with the corridor they are in
+    if segment.name in room_parts:
+        room_parts[segment.name].update(lights=[], tables=[], decor={})
+    for parts in room_parts.values():
+        parts['doors'] = [door for door in parts['doors'] if not door.isEmpty()]
+    interactables.remove_occluders(segment.name)
+    interactables.prune()
+    colliders.remove(segment.name)
+    colliders.prune()
 
-    # Ambient light
-    AmbientLight(color=color.rgba(6, 6, 6, 255))
 
+# -------------------------------
+# VISIBILITY
+# -------------------------------
+def door_open(room, position):
+    for door in live(room_part(room)['doors']):
+        if all(abs(door.position[i] - position[i]) < 0.01 for i in range(3)):
+            return door.ajar
+    return False
+
+
+def show_cells(visible):
+    # Hidden segments are skipped by the renderer; they still collide, and their lights may still light what is seen
+    for segment in level_segments:
+        if segment.root is None:
+            continue
+        hidden = segment.name not in visible
+        if hidden != segment.root.isHidden():
+            if hidden:
+                segment.root.hide()
+            else:
+                segment.root.show()
 
-if not SHOW_SPLASH:
-    start_game()
 
 # -------------------------------
-# INPUT HANDLING
+# MUTATION
 # -------------------------------
-def attempt_interaction():
-    hit_info = raycast(camera.world_position, camera.forward, distance=5)
-    if not hit_info.hit:
+SWAPPABLE_DECORATORS = ('occult_circle', 'storage_abattoir')
+MAX_TABLE_CREEP = 2.5  # how far a photo table may wander from its wall in all
+
+
+def live(entities):
+    return [entity for entity in entities if not entity.isEmpty()]
+
+
+def room_item(name):
+    for segment in current_layout['segments']:
+        if segment['name'] == name:
+            return next((item for item in segment['items'] if item['type'] == 'room'), None)
+
+
+def door_positions(name):
+    return [item['position'] for segment in current_layout['segments'] for item in segment['items']
+            if item['type'] == 'door' and item.get('room') == name]
+
+
+# Each mutation changes the room's items, so it is rebuilt the same way after streaming
+# out, and the live entities if the room is built.
+def retint_room(name):
+    light_color = haunted_light_color()
+    for item in room_segments[name].items:
+        if item['type'] == 'point_light':
+            item['color'] = (round(light_color.r), round(light_color.g), round(light_color.b))
+    for light in live(room_part(name)['lights']):
+        light.color = light_color
+        flicker_engine.recolor(light)
+
+
+def swap_decorator(name):
+    room = room_item(name)
+    segment = room_segments[name]
+    # A segment being built is still reading its item list
+    while segment.state == 'loading':
+        yield
+    decorators = list(room.get('decorators', ()))
+    old = next((d for d in decorators if d in SWAPPABLE_DECORATORS), None)
+    new = choice([d for d in SWAPPABLE_DECORATORS if d != old])
+    old_items = segment.items
+    room['decorators'] = [new if d == old else d for d in decorators] if old else decorators + [new]
+    items = decorator_items(room, new)
+    if old:
+        segment.items = [item for item in segment.items if item.get('decorator') != old]
+    segment.items = segment.items + items
+
+    if name not in room_parts or segment.state != 'loaded':
+        return
+    decor = room_parts[name]['decor']
+    old_decor = decor.pop(old, []) if old else []
+    try:
+        for item in items:
+            build_room_item(item, name, segment.root)
+            yield
+    except GeneratorExit:
+        # The room came into view part-way: it goes back to how it was
+        for entity in decor.pop(new, []):
+            destroy(entity)
+        if old:
+            decor[old] = old_decor
+        room['decorators'] = decorators
+        segment.items = old_items
+        raise
+    lod.add_cluster(decor.get(new, []))
+    for entity in old_decor:
+        destroy(entity)
+    invalidate_shadows(segment)
+
+
+def move_photo_table(name):
+    # The table creeps away from its wall and turns a little
+    tables = live(room_part(name)['tables'])
+    items = [item for item in room_segments[name].items if item['type'] == 'photo_table']
+    for i, item in enumerate(items):
+        x, y, z = item['position']
+        rx, ry, rz = item.get('rotation', (0, 0, 0))
+        distance = min(uniform(0.4, 1.2), MAX_TABLE_CREEP - item.get('crept', 0))
+        if distance > 0:
+            x += math.sin(math.radians(ry)) * distance
+            z += math.cos(math.radians(ry)) * distance
+            item['crept'] = item.get('crept', 0) + distance
+        item['position'] = (x, y, z)
+        item['rotation'] = (rx, ry + uniform(-25, 25), rz)
+        if i < len(tables):
+            tables[i].position = item['position']
+            tables[i].rotation = item['rotation']
+            interactables.update(tables[i])
+            colliders.update_dynamic(tables[i])
+            # Its old place is within reach too
+            shadow_cache.invalidate(item['position'], radius=3)
+
+
+def lock_door(name):
+    room = room_item(name)
+    if room:
+        room['locked'] = True
+    # Doors belong to the corridor segments
+    for segment in level_segments:
+        for item in segment.items:
+            if item['type'] == 'door' and item.get('room') == name:
+                item['locked'] = True
+    for door in live(room_part(name)['doors']):
+        door.lock()
+
+
+MUTATIONS = {
+    'retint': retint_room,
+    'swap_decorator': swap_decorator,
+    'move_table': move_photo_table,
+    'lock_door': lock_door,
+}
+
+
+def queue_mutation(name, kind):
+    lo, hi = mutations.rooms[name]
+    if kind == 'lock_door':
+        # The door is out in the corridor and has to be out of sight too
+        for x, y, z in door_positions(name):
+            lo = (min(lo[0], x - 1.5), min(lo[1], y - 2), min(lo[2], z - 1.5))
+            hi = (max(hi[0], x + 1.5), max(hi[1], y + 2), max(hi[2], z + 1.5))
+    return mutations.queue(name, kind, lambda: MUTATIONS[kind](name), lo, hi)
+
+
+def left_room(name):
+    # A room seen once stays as it was; after that it changes behind the player's back
+    if name not in room_segments or mutations.queued(name):
+        return
+    stats = telemetry.room_stats(name)
+    if stats['visits'] < 2:
         return
+    room = room_item(name)
+    kinds = ['retint']
+    if room:
+        kinds.append('swap_decorator')
+    if any(item['type'] == 'photo_table' for item in room_segments[name].items):
+        kinds.append('move_table')
+    queue_mutation(name, pick_kind(stats, kinds, lockable=bool(door_positions(name)) and not (room or {}).get('locked')))
 
-    entity = hit_info.entity
-    if isinstance(entity, LightSwitch):
-        entity.toggle()
+
+# -------------------------------
+# SAVING
+# -------------------------------
+def capture_state():
+    # Plain values only, read off the layout items; the writer thread packs them
+    snapshot = {
+        'meta': dict(layout_source, saved=time.time()),
+        'player': (player.x, player.y, player.z, player.rotation_y, player.camera_pivot.rotation_x),
+        'rng': flicker_engine.rng.bit_generator.state,
+    }
+    rooms = {segment['name']: next((item for item in segment['items'] if item['type'] == 'room'), None)
+             for segment in current_layout['segments'] if segment['kind'] == 'room'}
+    for segment in level_segments:
+        snapshot[f'segment/{segment.name}'] = segment_state(segment, rooms.get(segment.name))
+    return snapshot
+
+
+def save_game(wait=False):
+    global snapshot_writer
+    if game_state != 'game' or player is None:
         return
-    if isinstance(entity, Door):
-        entity.toggle()
+    if snapshot_writer is None:
+        snapshot_writer = SnapshotWriter(SAVE_PATH)
+    snapshot_writer.save(capture_state())
+    if wait:
+        snapshot_writer.flush(timeout=2)
+
+
+def load_saved_game():
+    start = time.perf_counter()
+    try:
+        snapshot = read_snapshot(SAVE_PATH)
+    except FileNotFoundError:
+        return None
+    except (OSError, SnapshotError) as e:
+        if VERBOSE:
+            print(f'save ignored: {e}')
+        return None
+    startup_times['read_save'] = (time.perf_counter() - start) * 1000
+    return snapshot
+
+
+def restore_world(snapshot):
+    # Before anything is built: the items take the saved state, and the flicker picks up where it was
+    start = time.perf_counter()
+    if snapshot.get('rng'):
+        flicker_engine.rng.bit_generator.state = snapshot['rng']
+    for segment in level_segments:
+        state = snapshot.get(f'segment/{segment.name}')
+        if state:
+            restore_segment(segment, state, room_item(segment.name) if segment.kind == 'room' else None)
+    startup_times['restore'] = (time.perf_counter() - start) * 1000
+
+
+# -------------------------------
+# GAME WORLD
+# -------------------------------
+player = None
+
+def start_game(block=False, snapshot=None):
+    # The loading screen goes up at once and the world is built over the next frames
+    # (all in this call with block=True); the player gets control when it is done.
+    # With a snapshot the world is built as it was saved and the player put back.
+    global game_state, loader, resume_from
+
+    game_state = 'loading'
+    resume_from = snapshot
+    flicker_engine.clear()
+
+    # Hide splash UI
+    splash_bg.disable()
+    warning_text.disable()
+    continue_text.disable()
+    show_loading_screen()
+
+    loader = StagedLoader([
+        ('reading the layout', 1, load_layout_stage),
+        ('preparing textures', 3, texture_stage),
+        ('building the hotel', 6, world_stage),
+        ('rearranging the rooms', 1, decoration_stage),
+        ('opening the doors', 1, player_stage),
+    ], frame_budget=STARTUP_FRAME_BUDGET, profiler=profiler)
+    if block:
+        loader.run()
+        finish_loading()
+
+
+def load_layout_stage():
+    global current_layout, layout_source, resume_from
+    layout_source = {'layout': LAYOUT_PATH if LAYOUT_SEED is None else None, 'seed': LAYOUT_SEED, 'floors': LAYOUT_FLOORS}
+    if layout_source['seed'] is None:
+        current_layout = load_layout(layout_source['layout'])
+    else:
+        current_layout = validate_layout(generate_hotel(layout_source['seed'], layout_source['floors']))
+    layout_source['hash'] = layout_hash(current_layout)
+    if resume_from:
+        # The save is restored item by item, so it has to be of this very layout
+        meta = resume_from['meta']
+        if meta['hash'] != layout_source['hash'] or any(meta[key] != layout_source[key] for key in ('layout', 'seed', 'floors')):
+            if VERBOSE:
+                print('save ignored: it is of another layout')
+            resume_from = None
+    yield 1
+
+
+def layout_texture_paths(layout):
+    paths = {'assets/wall.jpg', 'assets/stonetiles_002_diff.png', 'assets/wood1.jpg'}
+    paths.update(painting_textures)
+    paths.update(photo_textures)
+    for segment in layout['segments']:
+        for item in expand_items(segment['items']):
+            if item.get('texture'):
+                paths.add(item['texture'])
+    return sorted(paths)
+
+
+def atlas_paths(layout):
+    # What small_texture textures: images used whole, never repeated
+    paths = {'assets/wood1.jpg'}
+    paths.update(painting_textures)
+    paths.update(photo_paths(layout))
+    for segment in layout['segments']:
+        for item in expand_items(segment['items']):
+            if item['type'] == 'painting' and item.get('texture'):
+                paths.add(item['texture'])
+    return sorted(paths)
+
+
+def photo_paths(layout):
+    # Every photo a table can show, and so the photo viewer
+    paths = set(photo_textures)
+    for segment in layout['segments']:
+        for item in expand_items(segment['items']):
+            if item['type'] == 'photo_table' and item.get('texture'):
+                paths.add(item['texture'])
+    return sorted(paths)
+
+
+def texture_stage():
+    if TEXTURE_ATLAS:
+        atlas.compress = bool(TEXTURE_QUALITY) and QUALITY_TIERS[TEXTURE_QUALITY]['compress']
+        for path in atlas_paths(current_layout):
+            atlas.add(path)
+        atlas.build()
+    if TEXTURE_QUALITY is None:
         return
+    paths = layout_texture_paths(current_layout)
+    # Missing cache files are built on worker threads while the loading screen keeps drawing.
+    # The photo viewer's full size photos too: its loader only reads them.
+    jobs = compile_in_background(paths, TEXTURE_QUALITY)
+    if TEXTURE_QUALITY != FULL_TIER:
+        jobs += compile_in_background(photo_paths(current_layout), FULL_TIER)
+    while not all(job.done() for job in jobs):
+        yield Wait(0.8 * sum(job.done() for job in jobs) / len(jobs))
+    for job in jobs:
+        try:
+            job.result()
+        except ValueError:
+            pass  # unreadable images are left for ursina, as cached_texture does
+    for i, path in enumerate(paths):
+        cached_texture(path, TEXTURE_QUALITY)
+        yield 0.8 + 0.2 * (i + 1) / len(paths)
+
+
+def world_stage():
+    global painting_index, photo_index, world, level_segments
+
+    painting_index = 0
+    photo_index = 0
+    spawn = Vec3(*current_layout['spawn'])
+    if world:
+        world.unload_all()
+    level_segments = make_segments(current_layout)
+    assign_textures(level_segments)
+    if resume_from:
+        restore_world(resume_from)
+        spawn = Vec3(*resume_from['player'][:3])
+    if STREAMING:
+        # Only segments near the player exist; the rest load and unload as they move
+        world = StreamingManager(
+            level_segments, load_segment, unload_segment,
+            load_radius=STREAM_LOAD_RADIUS,
+            unload_radius=STREAM_UNLOAD_RADIUS,
+            memory_budget=STREAM_MEMORY_BUDGET,
+            frame_budget=STREAM_FRAME_BUDGET
+        )
+        nearby = [s for s in level_segments if s.distance(spawn, world.vertical_weight) <= world.load_radius]
+        world.update(spawn)
+        while world.current or world.queue:
+            yield sum(s.state == 'loaded' for s in nearby) / max(1, len(nearby))
+            world.update(spawn)
+    else:
+        # Everything is built up front, still with a root and a static batch per segment so portal culling can hide it
+        for i, segment in enumerate(level_segments):
+            for _ in load_segment(segment):
+                yield i / len(level_segments)
+            segment.state = 'loaded'
+            yield (i + 1) / len(level_segments)
+
+
+def decoration_stage():
+    # ursina parses a model file the first time it is used; do it now, not in the middle of a swap
+    models = sorted({item['model'] for name in SWAPPABLE_DECORATORS for item in DECORATORS[name]('north')((0, 0), (8, 8))})
+    for i, model in enumerate(models):
+        load_model(model, application.asset_folder) or load_model(model, application.internal_models_compressed_folder)
+        yield (i + 1) / len(models)
+
+
+def player_stage():
+    global player, telemetry, mutations, room_segments, portals
+
+    # Player; it walks on the collision grid's nearby cells, not the whole scene
+    spawn = tuple(resume_from['player'][:3]) if resume_from else tuple(current_layout['spawn'])
+    colliders.update(spawn)
+    player = FirstPersonController(
+        speed=6,
+        mouse_sensitivity=Vec2(40, 40),
+        position=spawn,
+        gravity=1,
+        jump_height=2,
+        traverse_target=colliders.root
+    )
+    player.collider = 'box'
+    # Its update is the movement and the collision rays
+    player.update = profiler.wrap(player.update, 'player')
+    telemetry = Telemetry([(segment.name, segment.lo, segment.hi) for segment in level_segments])
+    if resume_from:
+        _, _, _, yaw, pitch = resume_from['player']
+        player.rotation_y = yaw
+        player.camera_pivot.rotation_x = pitch
+        # Rooms left dark stay dark
+        for segment in level_segments:
+            for item in segment.items:
+                if item.get('switch') and not item['switch'].get('on', True):
+                    telemetry.light_switched(item['switch']['position'], False, record=False,
+                                             room=segment.name if segment.kind == 'room' else None)
+    room_segments = {segment.name: segment for segment in level_segments if segment.kind == 'room'}
+    if PORTAL_CULLING:
+        portals = PortalGraph(level_segments, [(segment.name, item) for segment in level_segments for item in segment.items
+                                               if item['type'] == 'door'], door_open)
+    mutations = MutationScheduler({name: (room.lo, room.hi) for name, room in room_segments.items()},
+                                  frame_budget=MUTATION_FRAME_BUDGET)
+
+    # Ambient light
+    AmbientLight(color=layout_color(current_layout.get('ambient', (6, 6, 6, 255))))
+    yield 1
+
+
+def finish_loading():
+    global game_state, ambient_audio, resume_from, since_autosave
+
+    game_state = 'game'
+    since_autosave = 0.0
+    loading_screen.enabled = False
+    mouse.visible = False
 
-    target = entity
-    while target and not isinstance(target, PhotoTable):
-        target = target.parent
-    if isinstance(target, PhotoTable):
-        target.interact()
+    if not HEADLESS:
+        if ambient_audio is None:
+            ambient_audio = Audio('assets/audio/bg.mp3', loop=True, autoplay=False)
+            ambient_audio.volume = 0.8
+        if not ambient_audio.playing:
+            ambient_audio.volume = 0.8
+            ambient_audio.play()
+
+    startup_times['interactive'] = since_launch()
+    if VERBOSE:
+        stages = ', '.join(f'{name} {timing["ms"]:.0f} ms' for name, timing in loader.stats.items())
+        print(f'startup: first frame {startup_times.get("first_frame", 0):.0f} ms, '
+              f'interactive {startup_times["interactive"]:.0f} ms ({loader.frames} loading frames: {stages})')
+    if resume_from:
+        if VERBOSE:
+            print(f'resumed from {SAVE_PATH}: read {startup_times.get("read_save", 0):.1f} ms, restored {startup_times["restore"]:.1f} ms')
+        resume_from = None
+
+
+def mark_first_frame(task):
+    startup_times['first_frame'] = since_launch()
+    return task.done
+
+# Runs right after the first frame is rendered (the render task is sort 50)
+taskMgr.add(mark_first_frame, 'mark_first_frame', sort=55)
+
+
+# -------------------------------
+# INPUT HANDLING
+# -------------------------------
+def attempt_interaction():
+    with profiler.scope('interaction'):
+        entity = interactables.raycast(camera.world_position, camera.forward, distance=INTERACT_DISTANCE)
+        if isinstance(entity, LightSwitch):
+            entity.toggle()
+            kind = 'switch'
+        elif isinstance(entity, Door):
+            entity.toggle()
+            kind = 'door'
+        elif isinstance(entity, PhotoTable):
+            entity.interact()
+            kind = 'photo'
+        else:
+            kind = 'miss'
+        if telemetry:
+            telemetry.record(kind, camera.world_position)
 
 
 def input(key):
+    if key == 'f3':
+        toggle_profiler()
+    elif key == 'f4' and profiler.events:
+        path = profiler.export_trace()
+        if VERBOSE:
+            print(f'profile trace written to {path}')
+
     if game_state == 'splash':
         if key == 'enter':
-            start_game()
+            start_game(snapshot=load_saved_game() if RESUME_ON_LAUNCH else None)
+        if key == 'escape':
+            application.quit()
+
+    elif game_state == 'loading':
         if key == 'escape':
             application.quit()
 
@@ -1050,6 +1413,7 @@ def input(key):
             return
 
         if key == 'escape':
+            save_game(wait=True)
             application.quit()
         
         if key in ('e', 'left mouse down'):
@@ -1059,7 +1423,131 @@ def input(key):
 # UPDATE LOOP
 # -------------------------------
 def update():
-    for controller in flickering_lights:
-        controller.update()
+    profiler.tick()
+    if game_state == 'loading':
+        if loader.step():
+            finish_loading()
+        else:
+            update_loading_screen(loader.progress, loader.stage)
+        if profiler.enabled:
+            update_profile_overlay()
+        return
+
+    if world and player:
+        with profiler.scope('streaming'):
+            world.update(player.position)
+    if player:
+        with profiler.scope('collision grid'):
+            colliders.update(player.position)
+    if telemetry and player:
+        with profiler.scope('telemetry'):
+            room = telemetry.room
+            if telemetry.update(time.dt, player.position, player.rotation_y, player.camera_pivot.rotation_x) and telemetry.room != room and room is not None:
+                left_room(telemetry.names[room])
+    with profiler.scope('portals'):
+        frustum = view_frustum(base.cam, getattr(camera, 'lens', None))
+        if portals:
+            show_cells(portals.update(camera.world_position, frustum))
+    with profiler.scope('lod'):
+        lod.update(camera.world_position)
+    with profiler.scope('light budget'):
+        light_budget.update(camera.world_position, frustum, portals.sealed if portals else ())
+        # With the cache off every buffer is left drawing each frame, as Panda3D does
+        shadowed = [m for m in light_budget.lights if m.shadowed] if SHADOW_CACHE else []
+        shadow_cache.update(shadowed, app.win.getGsg() if app.win else None, time.dt)
+    if mutations:
+        with profiler.scope('mutations'):
+            mutations.update(camera.world_position, frustum)
+
+    with profiler.scope('flicker'):
+        flicker_engine.step(time.dt)
+    if TEXTURE_QUALITY:
+        with profiler.scope('photos'):
+            update_photos()
+
+    global since_autosave
+    since_autosave += time.dt
+    if since_autosave >= AUTOSAVE_INTERVAL:
+        since_autosave = 0.0
+        with profiler.scope('autosave'):
+            save_game()
+
+    if profiler.enabled:
+        update_profile_overlay()
+
+
+def update_photos():
+    global since_photo_prefetch
+    for path, texture in photo_cache.poll():
+        if viewing_photo and path == photo_cache.pinned:
+            photo_image.model.setTexture(texture, 1)
+    since_photo_prefetch += time.dt
+    if since_photo_prefetch < PHOTO_PREFETCH_INTERVAL or not player:
+        return
+    since_photo_prefetch = 0.0
+    nearby = []
+    for parts in room_parts.values():
+        for table in live(parts['tables']):
+            distance = (table.world_position - player.position).length()
+            if distance <= PHOTO_PREFETCH_RADIUS:
+                nearby.append((distance, table.photo_texture))
+    photo_cache.prefetch([path for _, path in sorted(nearby)])
+
+
+# -------------------------------
+# PROFILER
+# -------------------------------
+def toggle_profiler():
+    profiler.enable(not profiler.enabled)
+    if profile_text:
+        profile_text.enabled = profiler.enabled
+    if VERBOSE:
+        print(f'profiler {"on" if profiler.enabled else "off"}')
+
+
+def scene_counts():
+    # Geoms under shown nodes: what could be drawn before the camera's frustum culls any
+    shown = [node for node in render.findAllMatches('**/+GeomNode') if not node.isHidden()]
+    stats = light_budget.frame_stats
+    return {
+        'nodes': render.countNumDescendants(),
+        'geoms': sum(node.node().getNumGeoms() for node in shown),
+        'lights': f'{stats.get("active", 0)}/{len(light_budget.lights)}',
+        'shadows': stats.get('shadowed', 0),
+    }
+
+
+def update_profile_overlay():
+    global profile_text, since_profile_overlay
+    since_profile_overlay += time.dt
+    if profile_text and since_profile_overlay < PROFILE_OVERLAY_INTERVAL:
+        return
+    since_profile_overlay = 0.0
+    with profiler.scope('profiler overlay'):
+        if profile_text is None:
+            profile_text = Text(parent=camera.ui, text='', position=window.top_left + Vec2(0.01, -0.01), origin=(-0.5, 0.5),
+                                scale=0.7, color=color.light_gray, z=-0.1)
+        counts = scene_counts()
+        profiler.counter('scene', {name: value for name, value in counts.items() if isinstance(value, int)})
+        profile_text.text = profiler.report(counts)
+
+
+def begin_render(task):
+    profiler.begin('render')
+    return task.cont
+
+
+def end_render(task):
+    profiler.end('render')
+    return task.cont
+
+# On either side of the render task (sort 50)
+taskMgr.add(begin_render, 'profile_render_begin', sort=49)
+taskMgr.add(end_render, 'profile_render_end', sort=51)
+
 
-app.run()
+# Importing main (benchmarks) sets up the app without building the world or entering the loop
+if __name__ == '__main__':
+    if not SHOW_SPLASH:
+        start_game(snapshot=load_saved_game() if RESUME_ON_LAUNCH else None)
+    app.run()
@@ -0,0 +1,135 @@
+import time
+from collections import deque
+from random import choice
+from types import GeneratorType
+
+from panda3d.core import BoundingBox, Point3
+
+
+class Mutation:
+    __slots__ = ('room', 'kind', 'apply', 'lo', 'hi', 'bounds', 'frame', 'ms')
+
+    def __init__(self, room, kind, apply, lo, hi, frame):
+        self.room = room
+        self.kind = kind
+        self.apply = apply
+        self.lo = tuple(lo)
+        self.hi = tuple(hi)
+        self.bounds = BoundingBox(Point3(*self.lo), Point3(*self.hi))
+        self.frame = frame            # when it was queued
+        self.ms = 0.0
+
+    def __repr__(self):
+        return f'<Mutation {self.kind} {self.room}>'
+
+
+def pick_kind(stats, kinds, lockable=False, pick=choice):
+    # What to change in a room the player has just left, from their time in it (a Telemetry
+    # room_stats entry): the door of a room they kept stopping in is locked, a room they kept
+    # dark is retinted, anything else gets one of kinds at random
+    if stats['hesitations'] >= 2 and lockable:
+        return 'lock_door'
+    if stats['dark'] > stats['lit']:
+        return 'retint'
+    return pick(kinds)
+
+
+class MutationScheduler:
+    # Applies changes to rooms only while they can't be seen: the room's box (plus whatever
+    # else the change touches) is outside the view frustum and the camera isn't in or near it.
+    # Mutations waiting for that keep their place in the queue. apply() either does its work
+    # at once or returns a generator that does a slice per step; at most frame_budget ms of
+    # that runs per frame. A mutation that comes into view part-way is closed, its generator
+    # undoing the steps it had done, and waits at the front of the queue to start over.
+    def __init__(self, rooms, frame_budget=2, margin=2):
+        self.rooms = rooms            # room name -> (lo, hi)
+        self.frame_budget = frame_budget
+        self.margin = margin
+        self.pending = deque()
+        self.current = None           # (mutation, generator) part-way through
+        self.frame = 0
+        self.events = deque(maxlen=64)  # (frame queued, frame applied, room, kind, ms)
+        self.applied = 0
+        self.cancelled = 0
+        self.waiting = 0
+        self.last_frame_ms = 0.0
+        self.slowest_frame_ms = 0.0
+
+    def queue(self, room, kind, apply, lo=None, hi=None):
+        if lo is None:
+            lo, hi = self.rooms[room]
+        mutation = Mutation(room, kind, apply, lo, hi, self.frame)
+        self.pending.append(mutation)
+        return mutation
+
+    def queued(self, room):
+        mutations = [m for m in self.pending if m.room == room]
+        if self.current and self.current[0].room == room:
+            mutations.insert(0, self.current[0])
+        return mutations
+
+    def hidden(self, mutation, eye, frustum=None):
+        margin = self.margin
+        lo, hi = mutation.lo, mutation.hi
+        if all(lo[i] - margin <= eye[i] <= hi[i] + margin for i in range(3)):
+            return False
+        return frustum is None or not frustum.contains(mutation.bounds)
+
+    def update(self, eye, frustum=None):
+        self.frame += 1
+        start = time.perf_counter()
+        self.waiting = 0
+        if self.current and not self.hidden(self.current[0], eye, frustum):
+            mutation, steps = self.current
+            self.current = None
+            steps.close()
+            self.cancelled += 1
+            self.pending.appendleft(mutation)
+        unchecked = len(self.pending)
+        while True:
+            if self.current is None:
+                if not unchecked:
+                    break
+                unchecked -= 1
+                mutation = self.pending.popleft()
+                if not self.hidden(mutation, eye, frustum):
+                    self.pending.append(mutation)
+                    self.waiting += 1
+                    continue
+                step_start = time.perf_counter()
+                steps = mutation.apply()
+                mutation.ms += (time.perf_counter() - step_start) * 1000
+                self.current = (mutation, steps if isinstance(steps, GeneratorType) else None)
+
+            mutation, steps = self.current
+            finished = steps is None
+            if not finished:
+                step_start = time.perf_counter()
+                try:
+                    next(steps)
+                except StopIteration:
+                    finished = True
+                mutation.ms += (time.perf_counter() - step_start) * 1000
+
+            if finished:
+                self.current = None
+                self.applied += 1
+                self.events.append((mutation.frame, self.frame, mutation.room, mutation.kind, round(mutation.ms, 3)))
+            if (time.perf_counter() - start) * 1000 >= self.frame_budget:
+                break
+
+        self.last_frame_ms = (time.perf_counter() - start) * 1000
+        self.slowest_frame_ms = max(self.slowest_frame_ms, self.last_frame_ms)
+        return self.applied
+
+    @property
+    def stats(self):
+        return {
+            'queued': len(self.pending) + (1 if self.current else 0),
+            'waiting': self.waiting,
+            'applied': self.applied,
+            'cancelled': self.cancelled,
+            'last_frame_ms': self.last_frame_ms,
+            'slowest_frame_ms': self.slowest_frame_ms,
+            'slowest_mutation_ms': max((event[4] for event in self.events), default=0.0),
+        }
@@ -0,0 +1,136 @@
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from profiler import percentile
+from streaming import MB
+from texture_cache import cache_path, read_texture, resolve, texture_memory
+
+
+# The tier photos are shown at; it has to be in the texture cache before play (main.texture_stage)
+FULL_TIER = 'high'
+
+
+def load_full(path, tier=FULL_TIER):
+    # The photo at its own resolution, from the texture cache. Only read here: the cache files
+    # are written on the main thread's watch, so no two threads ever write the same one.
+    source = resolve(path)
+    if not source.exists():
+        raise ValueError(f'{path} does not exist')
+    return read_texture(cache_path(source, tier))
+
+
+class PhotoCache:
+    # Full resolution photos for the photo viewer, decoded on worker threads and kept in
+    # memory up to memory_budget bytes, the least recently looked at going first. get()
+    # returns a photo's texture if it is in memory; if not it starts loading it and returns
+    # None, and the viewer shows the thumbnail it already has until poll() hands the photo
+    # over. prefetch() loads the photos of the tables near the player before they are looked
+    # at, so most looks are hits. The photo on screen is never evicted. A photo missing from
+    # the texture cache stays a thumbnail.
+    def __init__(self, memory_budget=64 * MB, workers=1, load=load_full, history=256):
+        self.memory_budget = memory_budget
+        self.load = load
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='photo_cache')
+        self.textures = OrderedDict()     # path -> (Panda3D texture, bytes), least recently used first
+        self.pending = {}                 # path -> (future, when it was asked for)
+        self.waiting = {}                 # path -> when get() missed it
+        self.failed = set()
+        self.pinned = None                # the photo on screen
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.evictions = 0
+        self.load_ms = deque(maxlen=history)   # asked for to decoded
+        self.wait_ms = deque(maxlen=history)   # a missed get() to the full photo being there
+
+    def timed_load(self, path):
+        return self.load(path), time.perf_counter()
+
+    def request(self, path):
+        # Starts loading path unless it is loaded, loading or unreadable; True if it started
+        if path in self.textures or path in self.pending or path in self.failed:
+            return False
+        self.pending[path] = (self.executor.submit(self.timed_load, path), time.perf_counter())
+        return True
+
+    def get(self, path):
+        # The full photo to show now, or None while it loads
+        self.pinned = path
+        entry = self.textures.get(path)
+        if entry is not None:
+            self.textures.move_to_end(path)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        if path not in self.failed:
+            self.waiting.setdefault(path, time.perf_counter())
+            self.request(path)
+        return None
+
+    def release(self):
+        # The viewer closed; its photo can be evicted again
+        self.pinned = None
+
+    def prefetch(self, paths):
+        # paths: what the player may look at next, most likely first
+        for path in paths:
+            if self.request(path):
+                self.prefetched += 1
+
+    def poll(self):
+        # Call once per frame: keeps the loads that finished. Returns [(path, texture)] for them.
+        arrived = []
+        for path, (future, requested) in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[path]
+            try:
+                texture, finished = future.result()
+            except (ValueError, OSError):
+                # Unreadable; the viewer keeps the thumbnail
+                self.failed.add(path)
+                self.waiting.pop(path, None)
+                continue
+            size = texture_memory(texture)
+            self.textures[path] = (texture, size)
+            self.bytes += size
+            self.load_ms.append((finished - requested) * 1000)
+            if path in self.waiting:
+                self.wait_ms.append((finished - self.waiting.pop(path)) * 1000)
+            arrived.append((path, texture))
+        self.evict()
+        return arrived
+
+    def evict(self):
+        for path in list(self.textures):
+            if self.bytes <= self.memory_budget:
+                break
+            if path == self.pinned:
+                continue
+            texture, size = self.textures.pop(path)
+            self.bytes -= size
+            self.evictions += 1
+            # Its copy on the GPU goes too
+            texture.releaseAll()
+
+    @property
+    def stats(self):
+        looks = self.hits + self.misses
+        return {
+            'photos': len(self.textures),
+            'mb': round(self.bytes / MB, 2),
+            'budget_mb': self.memory_budget / MB,
+            'loading': len(self.pending),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / looks, 3) if looks else None,
+            'prefetched': self.prefetched,
+            'evictions': self.evictions,
+            'failed': len(self.failed),
+            'load_ms': {'mean': round(sum(self.load_ms) / len(self.load_ms), 2) if self.load_ms else 0.0,
+                        'p95': round(percentile(self.load_ms, 0.95), 2), 'max': round(max(self.load_ms, default=0.0), 2)},
+            'wait_ms': {'mean': round(sum(self.wait_ms) / len(self.wait_ms), 2) if self.wait_ms else 0.0,
+                        'max': round(max(self.wait_ms, default=0.0), 2)},
+        }
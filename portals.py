@@ -0,0 +1,157 @@
+from panda3d.core import BoundingBox, Point3
+
+
+# Corridors whose boxes come this close are joined by an opening
+TOUCH_DISTANCE = 0.3
+# Half the depth of a door's portal box, either side of the door
+DOOR_DEPTH = 0.5
+
+
+class Cell:
+    __slots__ = ('name', 'kind', 'lo', 'hi', 'portals')
+
+    def __init__(self, name, kind, lo, hi):
+        self.name = name
+        self.kind = kind
+        self.lo = tuple(lo)
+        self.hi = tuple(hi)
+        self.portals = []
+
+    def contains(self, point):
+        return all(self.lo[i] <= point[i] <= self.hi[i] for i in range(3))
+
+    def __repr__(self):
+        return f'<Cell {self.name}>'
+
+
+class Portal:
+    __slots__ = ('cells', 'lo', 'hi', 'bounds', 'door')
+
+    def __init__(self, a, b, lo, hi, door=None):
+        self.cells = (a, b)
+        self.lo = tuple(lo)
+        self.hi = tuple(hi)
+        self.bounds = BoundingBox(Point3(*self.lo), Point3(*self.hi))
+        self.door = door              # (room, position) for a doorway, None for an open archway
+        a.portals.append(self)
+        b.portals.append(self)
+
+    def other(self, cell):
+        return self.cells[1] if self.cells[0] is cell else self.cells[0]
+
+    def __repr__(self):
+        return f'<Portal {self.cells[0].name} - {self.cells[1].name}{" (door)" if self.door else ""}>'
+
+
+def overlap(a, b, margin=0):
+    lo = tuple(max(a.lo[i], b.lo[i]) - margin for i in range(3))
+    hi = tuple(min(a.hi[i], b.hi[i]) + margin for i in range(3))
+    if all(lo[i] <= hi[i] for i in range(3)):
+        return lo, hi
+    return None
+
+
+class PortalGraph:
+    # Cells are the layout's segments. A room is entered only through its doors; corridors,
+    # intersections and stairwells are open to any of them they touch. Each frame the cells the
+    # camera is in are visible, and so is every cell behind a portal that is in view (and, for a
+    # door, open), recursively. Portals are only tested against the whole view frustum, not
+    # narrowed through the portals before them, so this can let through a cell that is hidden
+    # in fact; it never hides one that can be seen. Cells that are out of view but still open
+    # to the camera's are only culled; `sealed` holds those cut off from it by a closed door or
+    # on another floor, whose lights can't reach anything that is seen.
+    def __init__(self, segments, door_items, door_open):
+        # segments: objects with name, kind, lo and hi; door_items: (segment name, door item)
+        # door_open(room, position) says whether that door is open right now
+        self.cells = {segment.name: Cell(segment.name, segment.kind, segment.lo, segment.hi) for segment in segments}
+        self.door_open = door_open
+        self.portals = []
+
+        cells = list(self.cells.values())
+        for i, a in enumerate(cells):
+            for b in cells[i + 1:]:
+                if a.kind == 'room' or b.kind == 'room':
+                    continue
+                shared = overlap(a, b, TOUCH_DISTANCE)
+                if shared:
+                    self.portals.append(Portal(a, b, *shared))
+
+        for segment_name, item in door_items:
+            room = self.cells.get(item.get('room'))
+            corridor = self.cells.get(segment_name)
+            if room is None or corridor is None:
+                continue
+            x, y, z = item['position']
+            # The door hangs from its hinge at the position, so the box reaches a full width either side
+            half = item.get('width', 3.2) + DOOR_DEPTH
+            half_height = item.get('height', 3.5) / 2
+            self.portals.append(Portal(corridor, room, (x - half, y - half_height, z - half),
+                                       (x + half, y + half_height, z + half), door=(room.name, tuple(item['position']))))
+
+        self.visible = set(self.cells)
+        self.sealed = set()
+        self.frame_stats = {}
+
+    def update(self, eye, frustum=None):
+        # Cells are boxes around everything in them, so they overlap along shared walls; start from all that hold the eye
+        start = [cell for cell in self.cells.values() if cell.contains(eye)]
+        tested = 0
+        if not start:
+            self.visible = set(self.cells)
+        else:
+            visible = {cell.name for cell in start}
+            stack = list(start)
+            while stack:
+                cell = stack.pop()
+                for portal in cell.portals:
+                    other = portal.other(cell)
+                    if other.name in visible:
+                        continue
+                    tested += 1
+                    if portal.door and not self.door_open(*portal.door):
+                        continue
+                    if frustum is not None and not frustum.contains(portal.bounds) and not portal_holds(portal, eye):
+                        continue
+                    visible.add(other.name)
+                    stack.append(other)
+            self.visible = visible
+        self.sealed = set(self.cells) - self.open_to(start, eye) if start else set()
+
+        self.frame_stats = {
+            'cells': len(self.cells),
+            'visible': len(self.visible),
+            'sealed': len(self.sealed),
+            'start': [cell.name for cell in start],
+            'portals_tested': tested,
+        }
+        return self.visible
+
+    def open_to(self, start, eye):
+        # The cells on the eye's floor reachable from start through archways and open doors, in view or not
+        reached = {cell.name for cell in start}
+        stack = list(start)
+        while stack:
+            cell = stack.pop()
+            for portal in cell.portals:
+                other = portal.other(cell)
+                if other.name in reached or not on_floor(other, eye):
+                    continue
+                if portal.door and not self.door_open(*portal.door):
+                    continue
+                reached.add(other.name)
+                stack.append(other)
+        return reached
+
+    @property
+    def stats(self):
+        return dict(self.frame_stats, portals=len(self.portals), doors=sum(1 for p in self.portals if p.door))
+
+
+def on_floor(cell, eye):
+    # A stairwell spans the floors it joins; the floors above and below it are out of reach
+    return cell.lo[1] <= eye[1] <= cell.hi[1]
+
+
+def portal_holds(portal, eye):
+    # Standing in a doorway: the near plane can cut through the portal box
+    return all(portal.lo[i] <= eye[i] <= portal.hi[i] for i in range(3))
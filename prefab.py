@@ -0,0 +1,98 @@
+import time
+
+from panda3d.core import NodePath
+
+
+# What a room's prefab holds; everything else in a room is built per room
+STATIC_TYPES = ('floor', 'wall', 'block')
+
+
+def prefab_parts(room, items):
+    # A room's static items split into its shell (floor, ceiling, walls, bathroom) and each
+    # decorator's, with the key each part's prefab is shared under: [(key, items)]
+    parts = {}
+    for item in items:
+        parts.setdefault(item.get('decorator'), []).append(item)
+    return [((tuple(room['size']), room['door_dir'], decorator), part) for decorator, part in parts.items()]
+
+
+def local_items(items, origin):
+    # The items moved so origin is at (0, 0, 0)
+    moved = []
+    for item in items:
+        x, y, z = item['position']
+        moved.append(dict(item, position=(x - origin[0], y - origin[1], z - origin[2])))
+    return moved
+
+
+def signature(items):
+    # Everything about static items that ends up in the prefab's geometry
+    return tuple(
+        (item['type'], tuple(round(v, 3) for v in item['position']), tuple(item['scale']), str(item.get('color')),
+         item.get('texture'), tuple(item.get('texture_scale') or ()), bool(item.get('collider')))
+        for item in items
+    )
+
+
+class Prefab:
+    __slots__ = ('node', 'colliders', 'signature', 'sources')
+
+    def __init__(self, node, colliders, signature, sources):
+        self.node = node              # flattened geometry around the room's origin
+        self.colliders = colliders    # (center, half) boxes around the origin
+        self.signature = signature
+        self.sources = sources
+
+
+class RoomPrefabs:
+    # Rooms' static geometry built once per (size, door direction, decorator) around the
+    # origin, flattened, and instanced into every room with that key at the room's own place,
+    # like PropLibrary's props: one prefab for the shell (decorator None) and one for each
+    # decorator's blocks, so rooms that share a shape share it whatever their decorations.
+    # Lights, switches, props and everything else that differs between rooms is built per
+    # room. Items that aren't what their key's prefab was built from (an edited layout) get
+    # None, and the room is built as before.
+    def __init__(self):
+        self.prefabs = {}
+        self.stamped = 0
+        self.mismatched = 0
+        self.build_ms = 0.0
+
+    def get(self, key, items, origin, build):
+        # items: the room's static items; build(local items) -> (holder entity, collider boxes)
+        items = local_items(items, origin)
+        prefab = self.prefabs.get(key)
+        if prefab is None:
+            start = time.perf_counter()
+            holder, colliders = build(items)
+            for node_path in holder.findAllMatches('**'):
+                node_path.clearPythonTag('Entity')
+            holder.flattenStrong()
+            node = NodePath('room_' + '_'.join(str(part) for part in key))
+            holder.getChildren().reparentTo(node)
+            holder.removeNode()
+            prefab = self.prefabs[key] = Prefab(node, colliders, signature(items), len(items))
+            self.build_ms += (time.perf_counter() - start) * 1000
+        elif prefab.signature != signature(items):
+            self.mismatched += 1
+            return None
+        return prefab
+
+    def stamp(self, prefab, parent, origin):
+        # An instance of the prefab under parent at origin; returns it and its collider boxes there
+        holder = parent.attachNewNode(prefab.node.getName())
+        holder.setPos(*origin)
+        prefab.node.instanceTo(holder)
+        self.stamped += 1
+        colliders = [(tuple(center[i] + origin[i] for i in range(3)), half) for center, half in prefab.colliders]
+        return holder, colliders
+
+    @property
+    def stats(self):
+        return {
+            'prefabs': len(self.prefabs),
+            'stamped': self.stamped,
+            'mismatched': self.mismatched,
+            'build_ms': round(self.build_ms, 1),
+            'prefab_nodes': sum(prefab.node.countNumDescendants() + 1 for prefab in self.prefabs.values()),
+        }
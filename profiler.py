@@ -0,0 +1,163 @@
+import json
+import time
+from collections import deque
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent
+TRACE_PATH = ROOT / 'saves' / 'profile-trace.json'
+
+
+class NullScope:
+    # What scope() hands out while profiling is off: entering and leaving it does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class Profiler:
+    # Named timing scopes, gathered per frame. While it is off scope() returns one shared
+    # do-nothing context and tick() returns at once, so the scopes can stay in the hot paths.
+    # While it is on, the time each scope took is kept per frame for the last `history`
+    # frames (the overlay's numbers), and every scope as a trace event for the last
+    # `trace_capacity` of them (export_trace, for chrome://tracing or Perfetto). A scope's
+    # time includes the scopes inside it.
+    def __init__(self, enabled=False, history=600, trace_capacity=200000):
+        self.enabled = enabled
+        self.history = history
+        self.frames = deque(maxlen=history)           # (frame ms, {scope: ms}) per frame
+        self.events = deque(maxlen=trace_capacity)    # (name, start, end) in perf_counter seconds
+        self.counters = deque(maxlen=trace_capacity // 10)  # (name, time, {series: value})
+        self.current = {}             # scope -> ms so far this frame
+        self.open = {}                # scope -> start, for spans begun and ended in different places
+        self.frame_start = None
+        self.frame_count = 0
+        self.origin = time.perf_counter()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+        self.current = {}
+        self.open = {}
+        self.frame_start = None
+
+    def scope(self, name):
+        return Scope(self, name) if self.enabled else NULL_SCOPE
+
+    def wrap(self, function, name):
+        # function timed as `name` whenever it is called
+        def timed(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, start, time.perf_counter())
+        return timed
+
+    def begin(self, name):
+        if self.enabled:
+            self.open[name] = time.perf_counter()
+
+    def end(self, name):
+        start = self.open.pop(name, None)
+        if self.enabled and start is not None:
+            self.add(name, start, time.perf_counter())
+
+    def add(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + (end - start) * 1000
+        self.events.append((name, start, end))
+
+    def counter(self, name, values):
+        # Sampled numbers (lights, nodes) that go in the trace beside the scopes
+        if self.enabled:
+            self.counters.append((name, time.perf_counter(), dict(values)))
+
+    def tick(self):
+        # Call once per frame, at its start: closes the frame before it
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frames.append(((now - self.frame_start) * 1000, self.current))
+            self.events.append(('frame', self.frame_start, now))
+            self.frame_count += 1
+        self.current = {}
+        self.frame_start = now
+
+    def summary(self):
+        frame_ms = [ms for ms, _ in self.frames]
+        count = len(frame_ms)
+        scopes = {}
+        for _, times in self.frames:
+            for name, ms in times.items():
+                total, peak = scopes.get(name, (0.0, 0.0))
+                scopes[name] = (total + ms, max(peak, ms))
+        mean_frame = sum(frame_ms) / count if count else 0.0
+        return {
+            'frames': count,
+            'fps': round(1000 / mean_frame, 1) if mean_frame else 0.0,
+            'frame_ms': {'mean': round(mean_frame, 2), 'p50': round(percentile(frame_ms, 0.5), 2),
+                         'p95': round(percentile(frame_ms, 0.95), 2), 'p99': round(percentile(frame_ms, 0.99), 2),
+                         'max': round(max(frame_ms, default=0.0), 2)},
+            # Slowest first; mean over every frame in the history, including those the scope didn't run in
+            'scopes': {name: {'mean_ms': round(total / count, 3), 'max_ms': round(peak, 3)}
+                       for name, (total, peak) in sorted(scopes.items(), key=lambda item: -item[1][0])},
+        }
+
+    def report(self, counts=None):
+        # The overlay's text: frame percentiles, then each scope's mean and worst frame
+        summary = self.summary()
+        frame = summary['frame_ms']
+        lines = [f'{summary["fps"]:.0f} fps   frame ms p50 {frame["p50"]:.1f}  p95 {frame["p95"]:.1f}  '
+                 f'p99 {frame["p99"]:.1f}  max {frame["max"]:.1f}   ({summary["frames"]} frames)']
+        if counts:
+            lines.append('   '.join(f'{name} {value}' for name, value in counts.items()))
+        for name, timing in summary['scopes'].items():
+            lines.append(f'{name:<24}{timing["mean_ms"]:7.2f} ms  max {timing["max_ms"]:6.2f}')
+        return '\n'.join(lines)
+
+    def export_trace(self, path=TRACE_PATH):
+        # Chrome trace event format: complete events in microseconds since the profiler was made
+        events = [{'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+                   'ts': round((start - self.origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+                  for name, start, end in self.events]
+        events += [{'name': name, 'ph': 'C', 'pid': 1, 'ts': round((at - self.origin) * 1e6, 1), 'args': values}
+                   for name, at, values in self.counters]
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    @property
+    def stats(self):
+        return dict(self.summary(), enabled=self.enabled, trace_events=len(self.events))
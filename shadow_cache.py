@@ -0,0 +1,91 @@
+class CachedShadow:
+    __slots__ = ('managed', 'buffer', 'dirty', 'rendering', 'renders')
+
+    def __init__(self, managed, buffer):
+        self.managed = managed    # the light budget's ManagedLight
+        self.buffer = buffer      # the GraphicsOutput Panda3D renders its shadow map into
+        self.dirty = True         # its map is out of date
+        self.rendering = False    # its buffer is on for the frame being drawn
+        self.renders = 0
+
+
+class ShadowCache:
+    # Shadow maps rendered once and kept while nothing near the light moves. Panda3D draws a
+    # shadow caster's buffer every frame; here each shadowed light's buffer is switched on
+    # for one frame when its map is dirty and off again after, so a light whose surroundings
+    # are still costs no shadow pass. Anything that moves marks the lights within reach of it
+    # dirty with invalidate(position, radius, seconds): their maps are drawn in the next frame,
+    # or every frame for the seconds given (a door's swing). A light that newly casts shadows,
+    # or whose buffer Panda3D remade, starts dirty. Lights without a buffer (nothing samples
+    # their map yet) are left alone.
+    def __init__(self, light_range=15):
+        self.light_range = light_range
+        self.shadows = {}         # id(ManagedLight) -> CachedShadow
+        self.movers = []          # [position, radius, seconds left]
+        self.renders = 0
+        self.skipped = 0
+        self.invalidations = 0
+        self.frame_stats = {}
+
+    def invalidate(self, position, radius=0.0, seconds=0.0):
+        self.movers.append([tuple(position), radius, seconds])
+        self.invalidations += 1
+
+    def moved(self, shadow):
+        x, y, z = shadow.managed.position
+        for (mx, my, mz), radius, _ in self.movers:
+            reach = self.light_range + radius
+            if (x - mx) ** 2 + (y - my) ** 2 + (z - mz) ** 2 <= reach * reach:
+                return True
+        return False
+
+    def update(self, lights, gsg, dt=0.0):
+        # lights: the ManagedLights casting shadows this frame. Call after the light budget
+        # has picked them and before the frame is drawn.
+        shadows = {}
+        renders = unbuffered = 0
+        for managed in lights:
+            buffer = managed.node.node().getShadowBuffer(gsg) if gsg is not None else None
+            if buffer is None:
+                unbuffered += 1
+                continue
+            shadow = self.shadows.get(id(managed))
+            if shadow is None or shadow.managed is not managed or shadow.buffer != buffer:
+                shadow = CachedShadow(managed, buffer)
+            shadows[id(managed)] = shadow
+            if self.movers and self.moved(shadow):
+                shadow.dirty = True
+
+            # Drawn in the frame after it was switched on; off again once it has been
+            if shadow.dirty:
+                shadow.dirty = False
+                shadow.rendering = True
+                shadow.renders += 1
+                renders += 1
+                buffer.setActive(True)
+            elif shadow.rendering or buffer.isActive():
+                shadow.rendering = False
+                buffer.setActive(False)
+                self.skipped += 1
+            else:
+                self.skipped += 1
+        self.shadows = shadows
+        self.renders += renders
+
+        # Kept for one more update once its time is up, so the frame after a move redraws too
+        self.movers = [mover for mover in self.movers if mover[2] >= 0]
+        for mover in self.movers:
+            mover[2] -= dt
+
+        self.frame_stats = {
+            'cached': len(shadows) - renders,
+            'renders': renders,
+            'unbuffered': unbuffered,
+            'movers': len(self.movers),
+        }
+        return self.frame_stats
+
+    @property
+    def stats(self):
+        return dict(self.frame_stats, total_renders=self.renders, skipped=self.skipped,
+                    invalidations=self.invalidations)
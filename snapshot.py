@@ -0,0 +1,423 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from layout import decorator_items
+
+
+ROOT = Path(__file__).resolve().parent
+SAVE_PATH = ROOT / 'saves' / 'autosave.occ'
+
+MAGIC = b'OCCS'
+VERSION = 2
+
+HEADER = struct.Struct('<4sHH')           # magic, version, section count
+SECTION = struct.Struct('<BII')           # flags, stored size, raw size
+COMPRESSED = 1
+# Sections smaller than this aren't worth a zlib stream
+COMPRESS_MIN = 96
+
+PLAYER = struct.Struct('<5f')              # x, y, z, yaw, pitch
+TABLE = struct.Struct('<7fH')             # position, rotation, crept, texture
+NO_STRING = 0xFFFF
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def layout_hash(layout):
+    # Saved state is matched to items by their order, so it only fits the layout it was taken
+    # from; take this of the layout as loaded, before a save is restored into it
+    return hashlib.sha1(json.dumps(layout, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# -------------------------------
+# WORLD STATE
+# -------------------------------
+# A segment's state is what playing can change in its items: doors opened or locked,
+# switches and light colors, where the photo tables have crept to, which picture hangs
+# where, and for a room its decorators. It is a tuple of tuples, so checking whether
+# anything changed since the last save is one comparison.
+def segment_state(segment, room=None):
+    doors, lights, tables, paintings = [], [], [], []
+    for item in segment.items:
+        kind = item['type']
+        if kind == 'door':
+            doors.append((bool(item.get('open')), bool(item.get('locked'))))
+        elif kind == 'point_light':
+            color = item.get('color')
+            switch = item.get('switch')
+            lights.append((tuple(color) if isinstance(color, (list, tuple)) else color,
+                           None if switch is None else switch.get('on', True)))
+        elif kind == 'photo_table':
+            tables.append((tuple(item['position']), tuple(item.get('rotation', (0, 0, 0))), item.get('crept', 0), item.get('texture')))
+        elif kind == 'painting':
+            paintings.append(item.get('texture'))
+    if room is not None:
+        room = (bool(room.get('locked')), tuple(room.get('decorators', ())))
+    return tuple(doors), tuple(lights), tuple(tables), tuple(paintings), room
+
+
+def restore_segment(segment, state, room=None):
+    # Writes a saved state back into a freshly made segment's items, before it is built
+    doors, lights, tables, paintings, room_state = state
+    if room is not None and room_state is not None:
+        locked, decorators = room_state
+        room['locked'] = locked
+        current = list(room.get('decorators', ()))
+        removed = [name for name in current if name not in decorators]
+        if removed:
+            segment.items = [item for item in segment.items if item.get('decorator') not in removed]
+        for name in decorators:
+            if name not in current:
+                segment.items = segment.items + decorator_items(room, name)
+        room['decorators'] = list(decorators)
+
+    doors, lights, tables, paintings = iter(doors), iter(lights), iter(tables), iter(paintings)
+    for item in segment.items:
+        kind = item['type']
+        if kind == 'door':
+            item['open'], item['locked'] = next(doors, (False, item.get('locked', False)))
+        elif kind == 'point_light':
+            color, on = next(lights, (item.get('color'), None))
+            if color is not None:
+                item['color'] = color
+            if on is not None and item.get('switch'):
+                item['switch'] = dict(item['switch'], on=on)
+        elif kind == 'photo_table':
+            saved = next(tables, None)
+            if saved:
+                item['position'], item['rotation'], item['crept'], texture = saved
+                if texture:
+                    item['texture'] = texture
+        elif kind == 'painting':
+            texture = next(paintings, None)
+            if texture:
+                item['texture'] = texture
+
+
+# -------------------------------
+# ENCODING
+# -------------------------------
+class Writer:
+    def __init__(self):
+        self.parts = []
+        self.strings = {}
+
+    def pack(self, fmt, *values):
+        self.parts.append(struct.pack(fmt, *values))
+
+    def string(self, value):
+        # Index into the section's own string table, so a section decodes on its own
+        if value is None:
+            return NO_STRING
+        return self.strings.setdefault(value, len(self.strings))
+
+    def getvalue(self):
+        table = [struct.pack('<H', len(self.strings))]
+        for value in self.strings:
+            data = value.encode()
+            table.append(struct.pack('<H', len(data)) + data)
+        return b''.join(table + self.parts)
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+        count, = self.unpack('<H')
+        self.strings = []
+        for _ in range(count):
+            size, = self.unpack('<H')
+            self.strings.append(self.data[self.offset:self.offset + size].decode())
+            self.offset += size
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def string(self, index):
+        return None if index == NO_STRING else self.strings[index]
+
+
+def encode_meta(meta):
+    # The seed is any int the generator takes, so it is kept as text
+    writer = Writer()
+    seed = meta.get('seed')
+    writer.pack('<HHIdH', writer.string(meta.get('layout')), writer.string(None if seed is None else str(seed)),
+                meta.get('floors', 0), meta.get('saved', 0.0), writer.string(meta.get('hash')))
+    return writer.getvalue()
+
+
+def decode_meta(data):
+    reader = Reader(data)
+    layout, seed, floors, saved, layout_hash = reader.unpack('<HHIdH')
+    seed = reader.string(seed)
+    return {'layout': reader.string(layout), 'seed': None if seed is None else int(seed), 'floors': floors, 'saved': saved,
+            'hash': reader.string(layout_hash)}
+
+
+def encode_player(pose):
+    return PLAYER.pack(*pose)
+
+
+def decode_player(data):
+    return PLAYER.unpack(data)
+
+
+def encode_rng(state):
+    # numpy's PCG64 state: two 128-bit integers and a cached half word
+    writer = Writer()
+    inner = state['state']
+    writer.pack('<16s16sBI', inner['state'].to_bytes(16, 'little'), inner['inc'].to_bytes(16, 'little'),
+                state['has_uint32'], state['uinteger'])
+    return writer.getvalue()
+
+
+def decode_rng(data):
+    reader = Reader(data)
+    value, inc, has_uint32, uinteger = reader.unpack('<16s16sBI')
+    return {'bit_generator': 'PCG64', 'state': {'state': int.from_bytes(value, 'little'), 'inc': int.from_bytes(inc, 'little')},
+            'has_uint32': has_uint32, 'uinteger': uinteger}
+
+
+def encode_color(writer, color):
+    # 0: layout default, 1: theme name, 3 or 4: channels
+    if color is None:
+        writer.pack('<B', 0)
+    elif isinstance(color, str):
+        writer.pack('<BH', 1, writer.string(color))
+    else:
+        writer.pack(f'<B{len(color)}f', len(color), *color)
+
+
+def decode_color(reader):
+    kind, = reader.unpack('<B')
+    if kind == 0:
+        return None
+    if kind == 1:
+        return reader.string(reader.unpack('<H')[0])
+    return tuple(round(v, 3) for v in reader.unpack(f'<{kind}f'))
+
+
+def encode_segment(state):
+    doors, lights, tables, paintings, room = state
+    writer = Writer()
+    writer.pack('<H', len(doors))
+    writer.pack(f'<{len(doors)}B', *(is_open | locked << 1 for is_open, locked in doors))
+    writer.pack('<H', len(lights))
+    for color, on in lights:
+        encode_color(writer, color)
+        writer.pack('<B', 2 if on is None else int(on))
+    writer.pack('<H', len(tables))
+    for position, rotation, crept, texture in tables:
+        writer.pack(TABLE.format, *position, *rotation, crept, writer.string(texture))
+    writer.pack('<H', len(paintings))
+    writer.pack(f'<{len(paintings)}H', *(writer.string(texture) for texture in paintings))
+    if room is None:
+        writer.pack('<B', 0)
+    else:
+        locked, decorators = room
+        writer.pack('<BBB', 1, locked, len(decorators))
+        writer.pack(f'<{len(decorators)}H', *(writer.string(name) for name in decorators))
+    return writer.getvalue()
+
+
+def decode_segment(data):
+    reader = Reader(data)
+    count, = reader.unpack('<H')
+    doors = tuple((bool(flags & 1), bool(flags & 2)) for flags in reader.unpack(f'<{count}B'))
+    count, = reader.unpack('<H')
+    lights = []
+    for _ in range(count):
+        color = decode_color(reader)
+        on, = reader.unpack('<B')
+        lights.append((color, None if on == 2 else bool(on)))
+    count, = reader.unpack('<H')
+    tables = []
+    for _ in range(count):
+        values = reader.unpack(TABLE.format)
+        rounded = [round(v, 4) for v in values[:7]]
+        tables.append((tuple(rounded[:3]), tuple(rounded[3:6]), rounded[6], reader.string(values[7])))
+    count, = reader.unpack('<H')
+    paintings = tuple(reader.string(index) for index in reader.unpack(f'<{count}H'))
+    room = None
+    if reader.unpack('<B')[0]:
+        locked, count = reader.unpack('<BB')
+        room = (bool(locked), tuple(reader.string(index) for index in reader.unpack(f'<{count}H')))
+    return tuple(doors), tuple(lights), tuple(tables), paintings, room
+
+
+# Section name prefix -> (encode, decode)
+CODECS = {
+    'meta': (encode_meta, decode_meta),
+    'player': (encode_player, decode_player),
+    'rng': (encode_rng, decode_rng),
+    'segment': (encode_segment, decode_segment),
+}
+
+
+def encode_section(name, value, compress=True):
+    encode = CODECS[name.split('/')[0]][0]
+    raw = encode(value)
+    flags = 0
+    stored = raw
+    if compress and len(raw) >= COMPRESS_MIN:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            flags, stored = COMPRESSED, packed
+    label = name.encode()
+    return struct.pack('<H', len(label)) + label + SECTION.pack(flags, len(stored), len(raw)) + stored
+
+
+def join_sections(sections):
+    return HEADER.pack(MAGIC, VERSION, len(sections)) + b''.join(sections)
+
+
+def encode(snapshot, compress=True):
+    # snapshot: section name -> value; 'segment/<name>' for each segment
+    return join_sections([encode_section(name, value, compress) for name, value in snapshot.items()])
+
+
+def decode(data):
+    if len(data) < HEADER.size:
+        raise SnapshotError('snapshot is truncated')
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError('not a snapshot')
+    if version > VERSION:
+        raise SnapshotError(f'snapshot version {version} is newer than this game ({VERSION})')
+    if version < VERSION:
+        # Before version 2 the meta had no layout hash, so it can't be matched to a layout
+        raise SnapshotError(f'snapshot version {version} is older than this game ({VERSION})')
+    offset = HEADER.size
+    snapshot = {}
+    try:
+        for _ in range(count):
+            size, = struct.unpack_from('<H', data, offset)
+            name = data[offset + 2:offset + 2 + size].decode()
+            offset += 2 + size
+            flags, stored, raw_size = SECTION.unpack_from(data, offset)
+            offset += SECTION.size
+            raw = data[offset:offset + stored]
+            offset += stored
+            if flags & COMPRESSED:
+                raw = zlib.decompress(raw)
+            if len(raw) != raw_size:
+                raise SnapshotError(f'section {name} is damaged')
+            codec = CODECS.get(name.split('/')[0])
+            if codec:  # sections a later version added are skipped
+                snapshot[name] = codec[1](raw)
+    except (struct.error, zlib.error, UnicodeDecodeError, IndexError) as e:
+        raise SnapshotError(f'snapshot is damaged: {e}') from e
+    return snapshot
+
+
+def read_snapshot(path=SAVE_PATH):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def write_file(path, data):
+    # Written beside the old file and swapped in, so a crash mid-write keeps the last save
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + '.tmp')
+    with open(temp, 'wb') as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+# -------------------------------
+# BACKGROUND WRITER
+# -------------------------------
+class SnapshotWriter:
+    # Saves on a worker thread. save() only hands over the captured values; the thread
+    # encodes and compresses the sections whose value changed since the last write, reuses
+    # the bytes of the rest and replaces the file. If saves come faster than the disk, the
+    # thread skips to the newest one.
+    def __init__(self, path=SAVE_PATH, compress=True):
+        self.path = Path(path)
+        self.compress = compress
+        self.values = {}              # section name -> value last encoded
+        self.encoded = {}             # section name -> its bytes
+        self.pending = None
+        self.busy = False
+        self.condition = threading.Condition()
+        self.thread = None
+        self.saves = 0
+        self.writes = 0
+        self.encoded_sections = 0
+        self.reused_sections = 0
+        self.last_write_ms = 0.0
+        self.size = 0
+        self.error = None
+
+    def save(self, snapshot):
+        with self.condition:
+            self.pending = snapshot
+            self.saves += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='snapshot-writer', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                snapshot, self.pending = self.pending, None
+                self.busy = True
+            try:
+                self.write(snapshot)
+            except Exception as e:
+                # Kept for stats; the thread carries on with the next save
+                self.error = e
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def write(self, snapshot):
+        start = time.perf_counter()
+        sections = []
+        for name, value in snapshot.items():
+            if name not in self.encoded or self.values.get(name) != value:
+                self.encoded[name] = encode_section(name, value, self.compress)
+                self.values[name] = value
+                self.encoded_sections += 1
+            else:
+                self.reused_sections += 1
+            sections.append(self.encoded[name])
+        for name in [name for name in self.encoded if name not in snapshot]:
+            del self.encoded[name], self.values[name]
+        data = join_sections(sections)
+        write_file(self.path, data)
+        self.size = len(data)
+        self.writes += 1
+        self.last_write_ms = (time.perf_counter() - start) * 1000
+
+    def flush(self, timeout=None):
+        # Waits for the save in hand to reach the disk; True if it did
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending is None and not self.busy, timeout)
+
+    @property
+    def stats(self):
+        return {
+            'saves': self.saves,
+            'writes': self.writes,
+            'encoded_sections': self.encoded_sections,
+            'reused_sections': self.reused_sections,
+            'last_write_ms': round(self.last_write_ms, 3),
+            'bytes': self.size,
+            'error': str(self.error) if self.error else None,
+        }
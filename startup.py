@@ -0,0 +1,92 @@
+import time
+
+from profiler import NULL_SCOPE
+
+
+# Everything is timed from here; main.py imports this module before ursina
+LAUNCH_TIME = time.perf_counter()
+
+
+def since_launch():
+    return (time.perf_counter() - LAUNCH_TIME) * 1000
+
+
+class Wait(float):
+    # Yielded by a stage that is waiting on another thread: its progress, and nothing more to do this frame
+    pass
+
+
+class StagedLoader:
+    # Runs the startup stages a few milliseconds per frame so the loading screen keeps drawing.
+    # Each stage is (name, weight, function); the function returns a generator that does a
+    # slice of work per step and yields how far through the stage it is (0 to 1). Weights
+    # only shape the progress bar. With a profiler, each slice is a scope named after its stage.
+    def __init__(self, stages, frame_budget=12, profiler=None):
+        self.stages = stages
+        self.frame_budget = frame_budget
+        self.profiler = profiler
+        self.total_weight = sum(weight for _, weight, _ in stages) or 1
+        self.index = 0
+        self.current = None
+        self.stage_progress = 0.0
+        self.done = False
+        self.frames = 0
+        self.timings = {}             # stage name -> [ms, frames]
+
+    @property
+    def stage(self):
+        return self.stages[self.index][0] if self.index < len(self.stages) else None
+
+    @property
+    def progress(self):
+        if self.done:
+            return 1.0
+        finished = sum(weight for _, weight, _ in self.stages[:self.index])
+        return (finished + self.stages[self.index][1] * self.stage_progress) / self.total_weight
+
+    def step(self, block=False):
+        # Returns True once every stage has finished
+        if self.done:
+            return True
+        self.frames += 1
+        start = time.perf_counter()
+        counted = set()
+        while self.index < len(self.stages):
+            name, _, function = self.stages[self.index]
+            if self.current is None:
+                self.current = function()
+                self.stage_progress = 0.0
+            timing = self.timings.setdefault(name, [0.0, 0])
+            if name not in counted:
+                counted.add(name)
+                timing[1] += 1
+
+            slice_start = time.perf_counter()
+            with self.profiler.scope(name) if self.profiler else NULL_SCOPE:
+                try:
+                    value = next(self.current)
+                    finished = False
+                except StopIteration:
+                    value = 1.0
+                    finished = True
+            timing[0] += (time.perf_counter() - slice_start) * 1000
+            self.stage_progress = min(1.0, max(0.0, value or 0.0))
+
+            if finished:
+                self.current = None
+                self.index += 1
+            if isinstance(value, Wait) and not block:
+                break
+            if not block and (time.perf_counter() - start) * 1000 >= self.frame_budget:
+                break
+
+        self.done = self.index >= len(self.stages)
+        return self.done
+
+    def run(self):
+        while not self.step(block=True):
+            pass
+
+    @property
+    def stats(self):
+        return {name: {'ms': round(ms, 1), 'frames': frames} for name, (ms, frames) in self.timings.items()}
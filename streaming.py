@@ -0,0 +1,224 @@
+import math
+import time
+from collections import deque
+
+from layout import expand_items
+
+
+MB = 1024 * 1024
+
+# Rough per-entity cost on top of its geometry (node, transform, python object)
+ENTITY_BYTES = 4096
+COLLISION_SOLID_BYTES = 256
+
+
+class Segment:
+    def __init__(self, name, kind, items, floor=None):
+        self.name = name
+        self.kind = kind
+        self.floor = floor
+        self.items = items            # primitive items, already expanded
+        self.lo, self.hi = item_bounds(items)
+        self.state = 'unloaded'       # 'unloaded', 'loading' or 'loaded'
+        self.root = None
+        self.size = 0                 # estimated bytes while loaded
+        self.expected_size = len(items) * ENTITY_BYTES
+        self.load_ms = 0.0
+        self.load_frames = 0
+        self.build_frame = None
+        self.last_seen = 0
+        self.data = {}                # whatever the loader wants back at unload time
+
+    def distance(self, position, vertical_weight=1):
+        # Distance from a point to the segment's box; floors count more than open floor space
+        d = [max(self.lo[i] - position[i], 0, position[i] - self.hi[i]) for i in range(3)]
+        return math.sqrt(d[0] * d[0] + (d[1] * vertical_weight) ** 2 + d[2] * d[2])
+
+    def __repr__(self):
+        return f'<Segment {self.name} {self.state}>'
+
+
+def item_bounds(items):
+    lo = [math.inf] * 3
+    hi = [-math.inf] * 3
+    for item in items:
+        scale = item.get('scale', 1)
+        if isinstance(scale, (int, float)):
+            half = (scale / 2,) * 3
+        elif len(scale) == 2:
+            half = (scale[0] / 2, scale[1] / 2, scale[0] / 2)
+        else:
+            half = tuple(s / 2 for s in scale)
+        for i, p in enumerate(item['position']):
+            lo[i] = min(lo[i], p - half[i])
+            hi[i] = max(hi[i], p + half[i])
+    if lo[0] == math.inf:
+        return (0, 0, 0), (0, 0, 0)
+    return tuple(lo), tuple(hi)
+
+
+def make_segments(layout):
+    return [
+        Segment(segment['name'], segment['kind'], list(expand_items(segment['items'])), segment.get('floor'))
+        for segment in layout['segments']
+    ]
+
+
+def estimate_size(root):
+    # Geometry bytes under a node plus a flat cost per node and collision solid
+    total = 0
+    for node_path in root.findAllMatches('**/+GeomNode;+s'):
+        node = node_path.node()
+        for i in range(node.getNumGeoms()):
+            geom = node.getGeom(i)
+            vertex_data = geom.getVertexData()
+            for a in range(vertex_data.getNumArrays()):
+                total += vertex_data.getArray(a).getDataSizeBytes()
+            for p in range(geom.getNumPrimitives()):
+                primitive = geom.getPrimitive(p)
+                if primitive.getVertices():
+                    total += primitive.getVertices().getDataSizeBytes()
+    for node_path in root.findAllMatches('**/+CollisionNode;+s'):
+        total += node_path.node().getNumSolids() * COLLISION_SOLID_BYTES
+    total += root.findAllMatches('**;+s').getNumPaths() * ENTITY_BYTES
+    return total
+
+
+class StreamingManager:
+    # Loads segments near a point and unloads far ones.
+    # load_segment(segment) is a generator: it builds the segment a little per step and
+    # sets segment.root; the manager spends at most frame_budget ms per frame on it.
+    # unload_segment(segment) frees everything the loader made.
+    def __init__(self, segments, load_segment, unload_segment, load_radius=40, unload_radius=60,
+                 memory_budget=64 * MB, frame_budget=4, vertical_weight=3):
+        self.segments = segments
+        self.load_segment = load_segment
+        self.unload_segment = unload_segment
+        self.load_radius = load_radius
+        self.unload_radius = max(unload_radius, load_radius)
+        self.memory_budget = memory_budget
+        self.frame_budget = frame_budget
+        self.vertical_weight = vertical_weight
+
+        self.frame = 0
+        self.queue = deque()          # segments waiting to load, nearest first
+        self.current = None           # (segment, generator) being built
+        self.events = deque(maxlen=256)  # (frame, name, 'load' | 'unload', ms, frames)
+        self.slowest_frame_ms = 0.0
+        self.last_frame_ms = 0.0
+        self.loads = 0
+        self.unloads = 0
+        self.skipped = 0
+
+    @property
+    def loaded_bytes(self):
+        return sum(segment.size or segment.expected_size for segment in self.segments if segment.state != 'unloaded')
+
+    def update(self, position, block=False):
+        self.frame += 1
+        distances = {segment: segment.distance(position, self.vertical_weight) for segment in self.segments}
+
+        for segment in self.segments:
+            if segment.state == 'loaded' and distances[segment] > self.unload_radius:
+                self.unload(segment)
+
+        wanted = sorted((s for s in self.segments if distances[s] <= self.load_radius), key=distances.get)
+        for segment in wanted:
+            segment.last_seen = self.frame
+        self.queue = deque(s for s in wanted if s.state == 'unloaded')
+
+        start = time.perf_counter()
+        while self.current or self.queue:
+            if self.current is None:
+                segment = self.queue.popleft()
+                if not self.make_room_for(segment, distances):
+                    self.skipped += 1
+                    continue
+                segment.state = 'loading'
+                segment.load_ms = 0.0
+                segment.load_frames = 0
+                segment.build_frame = None
+                self.current = (segment, self.load_segment(segment))
+
+            self.step()
+            if not block and (time.perf_counter() - start) * 1000 >= self.frame_budget:
+                break
+
+        self.last_frame_ms = (time.perf_counter() - start) * 1000
+        self.slowest_frame_ms = max(self.slowest_frame_ms, self.last_frame_ms)
+
+    def step(self):
+        segment, builder = self.current
+        if segment.build_frame != self.frame:
+            segment.build_frame = self.frame
+            segment.load_frames += 1
+        start = time.perf_counter()
+        try:
+            next(builder)
+            done = False
+        except StopIteration:
+            done = True
+        segment.load_ms += (time.perf_counter() - start) * 1000
+        if done:
+            self.current = None
+            segment.state = 'loaded'
+            segment.size = estimate_size(segment.root) if segment.root is not None else segment.expected_size
+            segment.expected_size = segment.size
+            self.loads += 1
+            self.events.append((self.frame, segment.name, 'load', segment.load_ms, segment.load_frames))
+
+    def make_room_for(self, segment, distances):
+        # Evict the farthest, least recently wanted segments until this one fits the budget
+        needed = self.loaded_bytes + segment.expected_size - self.memory_budget
+        if needed <= 0:
+            return True
+        candidates = sorted(
+            (s for s in self.segments if s.state == 'loaded' and distances[s] > distances[segment]),
+            key=lambda s: (s.last_seen, -distances[s])
+        )
+        for candidate in candidates:
+            if needed <= 0:
+                break
+            needed -= candidate.size
+            self.unload(candidate)
+        return needed <= 0
+
+    def unload(self, segment):
+        if segment.state == 'unloaded':
+            return
+        if self.current and self.current[0] is segment:
+            self.current[1].close()
+            self.current = None
+        start = time.perf_counter()
+        self.unload_segment(segment)
+        elapsed = (time.perf_counter() - start) * 1000
+        segment.state = 'unloaded'
+        segment.root = None
+        segment.size = 0
+        segment.data = {}
+        self.unloads += 1
+        self.events.append((self.frame, segment.name, 'unload', elapsed, 1))
+
+    def unload_all(self):
+        for segment in self.segments:
+            self.unload(segment)
+
+    @property
+    def stats(self):
+        loads = [e for e in self.events if e[2] == 'load']
+        unloads = [e for e in self.events if e[2] == 'unload']
+        return {
+            'segments': len(self.segments),
+            'loaded': sum(s.state == 'loaded' for s in self.segments),
+            'loading': self.current[0].name if self.current else None,
+            'queued': len(self.queue),
+            'loaded_mb': self.loaded_bytes / MB,
+            'budget_mb': self.memory_budget / MB,
+            'loads': self.loads,
+            'unloads': self.unloads,
+            'skipped': self.skipped,
+            'last_frame_ms': self.last_frame_ms,
+            'slowest_frame_ms': self.slowest_frame_ms,
+            'max_load_ms': max((e[3] for e in loads), default=0.0),
+            'max_unload_ms': max((e[3] for e in unloads), default=0.0),
+        }
@@ -0,0 +1,198 @@
+import math
+
+import numpy as np
+
+
+# Slower than this (units per second, across the floor) counts as standing still
+STOP_SPEED = 0.5
+# Standing still this long is a hesitation
+HESITATION_TIME = 1.5
+# Feet rest on top of the floor block; allow a little below a room's box
+FLOOR_MARGIN = 0.5
+
+EVENT_KINDS = ('switch', 'door', 'photo', 'miss', 'light_on', 'light_off')
+EVENT_CODES = {kind: code for code, kind in enumerate(EVENT_KINDS)}
+
+
+class Telemetry:
+    # Where the player is, where they look and what they touch, with running totals per room.
+    # Samples and events go into preallocated ring buffers (the latest `capacity` stay
+    # available); the totals are updated one sample at a time, so the cost per frame is the
+    # same after hours of play as after a minute.
+    def __init__(self, rooms, capacity=8192, event_capacity=1024, sample_interval=0.1,
+                 stop_speed=STOP_SPEED, hesitation_time=HESITATION_TIME):
+        # rooms: (name, lo, hi) boxes; anywhere outside them is 'outside'
+        self.names = [name for name, _, _ in rooms] + ['outside']
+        self.boxes = [(tuple(lo), tuple(hi)) for _, lo, hi in rooms]
+        self.outside = len(self.boxes)
+        self.sample_interval = sample_interval
+        self.stop_speed = stop_speed
+        self.hesitation_time = hesitation_time
+
+        self.times = np.zeros(capacity)
+        self.positions = np.zeros((capacity, 3), dtype=np.float32)
+        self.angles = np.zeros((capacity, 2), dtype=np.float32)     # yaw, pitch in degrees
+        self.sample_rooms = np.zeros(capacity, dtype=np.int32)
+        self.head = 0                 # next slot to write
+        self.count = 0                # samples taken, including overwritten ones
+
+        self.event_times = np.zeros(event_capacity)
+        self.event_data = np.zeros((event_capacity, 5), dtype=np.float32)  # kind, room, x, y, z
+        self.event_head = 0
+        self.event_count = 0
+        self.event_counts = dict.fromkeys(EVENT_KINDS, 0)
+
+        count = len(self.names)
+        self.dwell = [0.0] * count
+        self.visits = [0] * count
+        self.stops = [0] * count
+        self.hesitations = [0] * count
+        self.lit_time = [0.0] * count
+        self.dark_time = [0.0] * count
+        self.switches_off = [0] * count
+        self.off_switches = {}        # rounded switch position -> room
+
+        self.clock = 0.0
+        self.since_sample = 0.0
+        self.room = None
+        self.last_x = self.last_z = None
+        self.moving = True
+        self.still_time = 0.0
+        self.hesitating = False
+
+    def inside(self, room, x, y, z):
+        lo, hi = self.boxes[room]
+        return lo[0] <= x <= hi[0] and lo[1] - FLOOR_MARGIN <= y <= hi[1] and lo[2] <= z <= hi[2]
+
+    def room_at(self, position):
+        x, y, z = position[0], position[1], position[2]
+        # The player is usually still in the room they were in; rooms share walls, so this also keeps them there on a doorstep
+        if self.room is not None and self.room != self.outside and self.inside(self.room, x, y, z):
+            return self.room
+        for room in range(len(self.boxes)):
+            if self.inside(room, x, y, z):
+                return room
+        return self.outside
+
+    def update(self, dt, position, yaw=0, pitch=0):
+        # Call every frame; samples are taken every sample_interval seconds. Returns True when one was.
+        self.clock += dt
+        self.since_sample += dt
+        if self.since_sample < self.sample_interval - 1e-9:  # six 1/60 s frames add up to a hair under 0.1
+            return False
+        self.sample(self.since_sample, position, yaw, pitch)
+        self.since_sample = 0.0
+        return True
+
+    def sample(self, dt, position, yaw=0, pitch=0):
+        x, y, z = position[0], position[1], position[2]
+        room = self.room_at(position)
+        if room != self.room:
+            self.visits[room] += 1
+            self.room = room
+        self.dwell[room] += dt
+        if self.switches_off[room]:
+            self.dark_time[room] += dt
+        else:
+            self.lit_time[room] += dt
+
+        if self.last_x is not None and dt > 0:
+            # Falling or jumping in place isn't moving on
+            speed = math.hypot(x - self.last_x, z - self.last_z) / dt
+            if speed < self.stop_speed:
+                if self.moving:
+                    self.moving = False
+                    self.still_time = 0.0
+                    self.stops[room] += 1
+                self.still_time += dt
+                if not self.hesitating and self.still_time >= self.hesitation_time:
+                    self.hesitating = True
+                    self.hesitations[room] += 1
+            else:
+                self.moving = True
+                self.hesitating = False
+        self.last_x, self.last_z = x, z
+
+        i = self.head
+        self.times[i] = self.clock
+        self.positions[i] = x, y, z
+        self.angles[i] = yaw, pitch
+        self.sample_rooms[i] = room
+        self.head = (i + 1) % len(self.times)
+        self.count += 1
+
+    def record(self, kind, position, room=None):
+        # room: the name of the room the event belongs to; by default the one at position
+        room = self.room_at(position) if room is None else self.names.index(room)
+        i = self.event_head
+        self.event_times[i] = self.clock
+        self.event_data[i] = EVENT_CODES[kind], room, position[0], position[1], position[2]
+        self.event_head = (i + 1) % len(self.event_times)
+        self.event_count += 1
+        self.event_counts[kind] += 1
+
+    def light_switched(self, position, on, room=None, record=True):
+        # A room is dark while any switch in it is off; record=False for a switch restored from a save.
+        # room: the name of the room whose light it is. A room's switch is mounted on the corridor
+        # side of its wall, so where the switch is says nothing about whose light it works.
+        key = tuple(round(v, 2) for v in position)
+        if on and key in self.off_switches:
+            self.switches_off[self.off_switches.pop(key)] -= 1
+        elif not on and key not in self.off_switches:
+            index = self.room_at(position) if room is None else self.names.index(room)
+            self.off_switches[key] = index
+            self.switches_off[index] += 1
+        if record:
+            self.record('light_on' if on else 'light_off', position, room)
+
+    def recent(self, count=None):
+        # The latest samples, oldest first: times, positions, (yaw, pitch) and rooms
+        size = min(self.count, len(self.times))
+        count = size if count is None else min(count, size)
+        order = np.arange(self.head - count, self.head) % len(self.times)
+        return self.times[order], self.positions[order], self.angles[order], self.sample_rooms[order]
+
+    def recent_events(self, count=None):
+        # The latest events, oldest first, as (time, kind, room name, position)
+        size = min(self.event_count, len(self.event_times))
+        count = size if count is None else min(count, size)
+        events = []
+        for i in range(self.event_head - count, self.event_head):
+            i %= len(self.event_times)
+            kind, room, x, y, z = self.event_data[i]
+            events.append((float(self.event_times[i]), EVENT_KINDS[int(kind)], self.names[int(room)], (float(x), float(y), float(z))))
+        return events
+
+    def room_stats(self, name=None):
+        # Totals for every room visited, or for one room
+        if name is not None:
+            return self.room_totals(self.names.index(name))
+        return {name: self.room_totals(room) for room, name in enumerate(self.names) if self.visits[room]}
+
+    def room_totals(self, room):
+        return {
+            'dwell': round(self.dwell[room], 2),
+            'visits': self.visits[room],
+            'revisits': max(0, self.visits[room] - 1),
+            'stops': self.stops[room],
+            'hesitations': self.hesitations[room],
+            'lit': round(self.lit_time[room], 2),
+            'dark': round(self.dark_time[room], 2),
+        }
+
+    @property
+    def stats(self):
+        return {
+            'clock': round(self.clock, 2),
+            'room': None if self.room is None else self.names[self.room],
+            'samples': self.count,
+            'events': dict(self.event_counts),
+            'rooms_visited': sum(1 for visits in self.visits if visits),
+            'revisits': sum(max(0, visits - 1) for visits in self.visits),
+            'stops': sum(self.stops),
+            'hesitations': sum(self.hesitations),
+            'lit': round(sum(self.lit_time), 2),
+            'dark': round(sum(self.dark_time), 2),
+            'buffer_kb': round((self.times.nbytes + self.positions.nbytes + self.angles.nbytes + self.sample_rooms.nbytes
+                                + self.event_times.nbytes + self.event_data.nbytes) / 1024, 1),
+        }
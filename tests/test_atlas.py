@@ -0,0 +1,59 @@
+from panda3d.core import Filename, PNMImage
+
+from atlas import TextureAtlas
+
+
+def tile(width, height):
+    return PNMImage(width, height)
+
+
+def test_place_fills_a_shelf_then_opens_the_next():
+    atlas = TextureAtlas(page_size=100)
+    shelves = []
+    assert atlas.place(shelves, tile(40, 30)) == (0, 0)
+    assert atlas.place(shelves, tile(40, 20)) == (40, 0)
+    # Too wide for what is left of the first shelf
+    assert atlas.place(shelves, tile(40, 30)) == (0, 30)
+    # Short enough for the first shelf's last gap
+    assert atlas.place(shelves, tile(20, 10)) == (80, 0)
+    assert shelves == [[0, 30, 100], [30, 30, 40]]
+
+
+def test_place_gives_up_when_the_page_is_full():
+    atlas = TextureAtlas(page_size=100)
+    shelves = []
+    assert atlas.place(shelves, tile(100, 60)) == (0, 0)
+    assert atlas.place(shelves, tile(10, 50)) is None
+    assert atlas.place([], tile(101, 10)) is None
+
+
+def image_file(path, width, height, value):
+    image = PNMImage(width, height, 3)
+    image.fill(value)
+    image.write(Filename.fromOsSpecific(str(path)))
+    return str(path)
+
+
+def test_build_puts_each_image_in_its_own_place(tmp_path):
+    atlas = TextureAtlas(max_size=64, page_size=128, padding=2, cache_dir=tmp_path / 'cache')
+    small = image_file(tmp_path / 'small.png', 16, 16, 0.2)
+    wide = image_file(tmp_path / 'wide.png', 60, 20, 0.8)
+    big = image_file(tmp_path / 'big.png', 100, 10, 0.5)
+    assert atlas.add(small) and atlas.add(wide)
+    assert not atlas.add(big) and atlas.region(big) is None
+    atlas.build()
+    assert atlas.stats['pages'] == 1 and atlas.stats['images'] == 2
+    regions = [atlas.region(small), atlas.region(wide)]
+    rects = [(r.offset[0], r.offset[1], r.offset[0] + r.scale[0], r.offset[1] + r.scale[1]) for r in regions]
+    assert all(0 <= v <= 1 for rect in rects for v in rect)
+    (a, b) = rects
+    assert a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1]
+    assert regions[1].scale == (60 / 128, 20 / 128)
+    # A page built once is read back from the cache
+    assert len(list((tmp_path / 'cache').glob('atlas-*.txo'))) == 1
+    again = TextureAtlas(max_size=64, page_size=128, padding=2, cache_dir=tmp_path / 'cache')
+    again.add(small)
+    again.add(wide)
+    again.build()
+    assert len(list((tmp_path / 'cache').glob('atlas-*.txo'))) == 1
+    assert again.region(wide).offset == atlas.region(wide).offset
@@ -0,0 +1,38 @@
+from batching import Face, box_faces, merge_faces
+
+
+def face(lo, hi, uv, material='wall'):
+    return Face(2, 1, 0.0, lo, hi, uv, material)
+
+
+def test_wall_built_in_pieces_keeps_its_repeats():
+    left = face((0, 0), (2, 3), (0, 2, 0, 3))
+    right = face((2, 0), (3, 3), (0, 1, 0, 3))
+    merged, = merge_faces([right, left])
+    assert (merged.lo, merged.hi, merged.uv) == ((0, 0), (3, 3), (0, 3, 0, 3))
+
+
+def test_faces_of_another_texel_density_are_not_merged():
+    # Same texture span over twice the width: joined, it would stretch across both
+    left = face((0, 0), (1, 3), (0, 1, 0, 3))
+    right = face((1, 0), (3, 3), (0, 1, 0, 3))
+    assert len(merge_faces([left, right])) == 2
+
+
+def test_faces_merge_along_u_then_v():
+    quarters = [face((u, v), (u + 1, v + 1), (0, 1, 0, 1)) for u in (0, 1) for v in (0, 1)]
+    merged, = merge_faces(quarters)
+    assert (merged.lo, merged.hi, merged.uv) == ((0, 0), (2, 2), (0, 2, 0, 2))
+
+
+def test_other_material_and_refused_merges_stay_apart():
+    left = face((0, 0), (1, 1), (0, 1, 0, 1))
+    assert len(merge_faces([left, face((1, 0), (2, 1), (0, 1, 0, 1), 'tile')])) == 2
+    right = face((1, 0), (2, 1), (0, 1, 0, 1))
+    assert len(merge_faces([left, right], can_merge=lambda merged: merged.area() < 2)) == 2
+
+
+def test_stacked_boxes_share_their_side_faces():
+    faces = box_faces((0, 0.5, 0), (1, 1, 1), 'wall') + box_faces((0, 1.5, 0), (1, 1, 1), 'wall')
+    # The faces between them are still there; only the sides run on
+    assert len(merge_faces(faces)) == 8
@@ -0,0 +1,55 @@
+from collision import find_stairs, merge_boxes, simplify
+
+
+def box(lo, hi):
+    return tuple((lo[i] + hi[i]) / 2 for i in range(3)), tuple((hi[i] - lo[i]) / 2 for i in range(3))
+
+
+def test_wall_in_pieces_becomes_one_box():
+    pieces = [box((x, 0, 0), (x + 2, 4, 0.2)) for x in range(0, 10, 2)]
+    assert merge_boxes(pieces) == [box((0, 0, 0), (10, 4, 0.2))]
+
+
+def test_floor_tiles_merge_along_both_axes():
+    tiles = [box((x, -0.5, z), (x + 1, 0, z + 1)) for x in range(3) for z in range(2)]
+    assert merge_boxes(tiles) == [box((0, -0.5, 0), (3, 0, 2))]
+
+
+def test_box_inside_another_goes_and_gaps_stay():
+    inner = box((1, 1, 1), (2, 2, 2))
+    outer = box((0, 0, 0), (4, 4, 4))
+    apart = box((6, 0, 0), (8, 4, 4))
+    assert sorted(merge_boxes([inner, outer, apart])) == sorted([outer, apart])
+
+
+def test_boxes_of_different_heights_stay_apart():
+    boxes = [box((0, 0, 0), (2, 4, 1)), box((2, 0, 0), (4, 3, 1))]
+    assert sorted(merge_boxes(boxes)) == sorted(boxes)
+
+
+def steps(count, axis=2, sign=1, start=0):
+    run = []
+    for n in range(count):
+        lo = [0, n * 0.25, 0]
+        lo[axis] = start + sign * n * 0.5 - (0.5 if sign < 0 else 0)
+        hi = [lo[0] + (0.5 if axis == 0 else 2), lo[1] + 0.25, lo[2] + (0.5 if axis == 2 else 2)]
+        run.append(box(lo, hi))
+    return run
+
+
+def test_stairs_are_found_lowest_step_first():
+    run = steps(6)
+    assert find_stairs(run) == [(list(range(6)), 2, 1)]
+    down_x = steps(4, axis=0, sign=-1)
+    assert find_stairs(down_x) == [([0, 1, 2, 3], 0, -1)]
+
+
+def test_too_few_steps_are_not_stairs():
+    assert find_stairs(steps(2)) == []
+
+
+def test_stairs_become_a_ramp_and_the_rest_merges():
+    wall = [box((x, 0, -1), (x + 2, 4, -0.8)) for x in (0, 2)]
+    boxes, polygons = simplify(steps(5) + wall)
+    assert boxes == [box((0, 0, -1), (4, 4, -0.8))]
+    assert len(polygons) == 6
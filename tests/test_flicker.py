@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from flicker import FlickerEngine
+
+
+class Node:
+    # Stands in for the Panda3D light a flickered color is pushed to
+    def __init__(self):
+        self.colors = []
+
+    def setColor(self, color):
+        self.colors.append(color)
+
+
+def light(r=1.0, g=0.8, b=0.6):
+    return SimpleNamespace(color=SimpleNamespace(r=r, g=g, b=b, a=1.0), _light=Node())
+
+
+def test_only_changed_lights_are_pushed():
+    engine = FlickerEngine(seed=1)
+    steady, flickering = light(), light()
+    engine.add(steady, intensity_range=(1.0, 1.0))
+    engine.add(flickering, intensity_range=(0.2, 0.4))
+    pushed = sum(engine.step(1 / 60) for _ in range(30))
+    assert not steady._light.colors
+    assert len(flickering._light.colors) == pushed > 0
+
+
+def test_pushed_color_scales_the_base_color():
+    engine = FlickerEngine(seed=1)
+    dim = light(1.0, 0.5, 0.0)
+    engine.add(dim, intensity_range=(0.5, 0.5))
+    for _ in range(120):
+        engine.step(1 / 30)
+    r, g, b, a = dim._light.colors[-1]
+    assert abs(r - 0.5) < 0.01 and abs(g - 0.25) < 0.01 and b == 0.0 and a == 1.0
+
+
+def test_removed_lights_are_not_pushed_and_their_slot_is_reused():
+    engine = FlickerEngine(capacity=1, seed=1)
+    gone, kept = light(), light()
+    index = engine.add(gone, intensity_range=(0.2, 0.4))
+    engine.add(kept, intensity_range=(0.2, 0.4))
+    engine.remove(index)
+    engine.step(1 / 60)
+    assert not gone._light.colors and kept._light.colors
+    assert engine.add(light()) == index and len(engine) == 2
@@ -0,0 +1,67 @@
+from panda3d.core import Mat4, NodePath, Vec3
+
+from interactables import TIE_DISTANCE, InteractionGrid
+
+
+EYE = (0.5, 1, 0.5)
+FORWARD = (1, 0, 0)
+
+
+def door(x, z=0.5, size=(0.2, 2, 1)):
+    target = NodePath('door')
+    target.setPos(x, 1, z)
+    return target, size
+
+
+def grid_with(*targets, occluders=()):
+    grid = InteractionGrid(cell_size=4)
+    for target, size in targets:
+        grid.add(target, (0, 0, 0), size)
+    grid.add_occluders('walls', occluders)
+    return grid
+
+
+def test_nearest_interactable_on_the_ray():
+    near, far = door(3), door(6)
+    grid = grid_with(near, far)
+    assert grid.raycast(EYE, FORWARD) is near[0]
+    assert grid.raycast(EYE, (-1, 0, 0)) is None
+    assert grid.raycast(EYE, FORWARD, distance=2) is None
+
+
+def test_occluder_in_front_of_a_door_blocks_it():
+    target = door(5)
+    grid = grid_with(target, occluders=[((3, 1, 0.5), (0.1, 2, 2))])
+    assert grid.raycast(EYE, FORWARD, distance=8) is None
+    grid.remove_occluders('walls')
+    assert grid.raycast(EYE, FORWARD, distance=8) is target[0]
+
+
+def test_flush_door_wins_over_its_wall():
+    target = door(3)
+    wall = [((3, 1, 0.5), (0.1, 2, 2))]
+    assert grid_with(target, occluders=wall).raycast(EYE, FORWARD) is target[0]
+    # Just past the tie distance behind the wall face, the wall is in front
+    behind = door(3 + 2 * TIE_DISTANCE)
+    assert grid_with(behind, occluders=wall).raycast(EYE, FORWARD) is None
+
+
+def test_rotated_box_is_tested_in_its_own_space():
+    # Thin along x and long along z before it is turned an eighth about y
+    target = NodePath('table')
+    target.setMat(Mat4.rotateMat(45, Vec3(0, 1, 0)) * Mat4.translateMat(3, 1, 0.5))
+    grid = grid_with((target, (0.2, 2, 4)))
+    assert grid.raycast(EYE, FORWARD) is target
+    assert grid.raycast((3, 3, 0.5), (0, -1, 0)) is target
+    # Inside its world bounds, but off the turned box
+    assert grid.raycast((4.4, 3, 0.5), (0, -1, 0)) is None
+
+
+def test_moved_and_removed_targets():
+    target = door(3)
+    grid = grid_with(target)
+    target[0].setPos(3, 1, 20)
+    grid.update(target[0])
+    assert grid.raycast(EYE, FORWARD) is None
+    grid.remove(target[0])
+    assert grid.stats['interactables'] == 0 and grid.stats['cells'] == 0
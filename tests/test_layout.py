@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from generator import generate_hotel
+from layout import LayoutError, load_layout, point_light, save_layout, validate_layout
+
+
+@pytest.fixture
+def layout():
+    layout = generate_hotel(3, 1)
+    layout['segments'][0]['items'].append(point_light((1, 3, 1), switch={'position': (0, 1.5, 1), 'rotation': (0, 90, 0)}))
+    return validate_layout(layout)
+
+
+def items(layout, kind):
+    return [item for segment in layout['segments'] for item in segment['items'] if item['type'] == kind]
+
+
+def test_shipped_layout_is_valid():
+    assert load_layout('layouts/hotel.json')['segments']
+
+
+def test_fields_set_while_playing_validate_and_save(layout, tmp_path):
+    for door in items(layout, 'door'):
+        door['open'] = True
+        door['locked'] = True
+    for light in items(layout, 'point_light'):
+        if light.get('switch'):
+            light['switch'] = dict(light['switch'], on=False)
+    for room in items(layout, 'room'):
+        room['locked'] = True
+    layout['segments'][0]['items'].append({'type': 'photo_table', 'position': (1, 0, 1), 'crept': 1.5})
+    path = tmp_path / 'played.json'
+    save_layout(layout, path)
+    assert load_layout(path) == json.loads(json.dumps(layout))
+
+
+@pytest.mark.parametrize('kind, field, value', [
+    ('door', 'open', 'yes'),
+    ('door', 'lockd', True),
+    ('room', 'locked', 1),
+])
+def test_bad_and_unknown_fields_are_rejected(layout, kind, field, value):
+    items(layout, kind)[0][field] = value
+    with pytest.raises(LayoutError):
+        validate_layout(layout)
+
+
+def test_bad_switch_state_is_rejected(layout):
+    light = next(light for light in items(layout, 'point_light') if light.get('switch'))
+    light['switch'] = dict(light['switch'], on='off')
+    with pytest.raises(LayoutError):
+        validate_layout(layout)
+
+
+def test_door_to_unknown_room_is_rejected(layout):
+    items(layout, 'door')[0]['room'] = 'nowhere'
+    with pytest.raises(LayoutError, match='unknown room'):
+        validate_layout(layout)
+
+
+def test_generator_is_deterministic():
+    assert generate_hotel(11, 3) == generate_hotel(11, 3)
+    assert generate_hotel(11, 3) != generate_hotel(12, 3)
+    # A floor looks the same however many are generated above it
+    assert generate_hotel(11, 2)['segments'][0] == generate_hotel(11, 3)['segments'][0]
@@ -0,0 +1,64 @@
+from panda3d.core import NodePath, PointLight
+
+from light_budget import LightBudget
+
+
+class Light(NodePath):
+    # An ursina light as far as the budget looks at one: a node holding a Panda3D light
+    def __init__(self, render, position, switch=None):
+        NodePath.__init__(self, 'light')
+        self.attachNewNode(PointLight('point'))
+        self.reparentTo(render)
+        self.world_position = position
+        self.enabled = True
+        self.switch = switch
+
+
+def budget(positions, **kwargs):
+    render = NodePath('render')
+    lights = LightBudget(render, **kwargs)
+    for position in positions:
+        lights.add(Light(render, position))
+    return render, lights
+
+
+def lit(render, lights):
+    return [render.hasLight(managed.node) for managed in lights.lights]
+
+
+def test_nearest_lights_win_the_slots():
+    render, lights = budget([(30, 0, 0), (2, 0, 0), (10, 0, 0)], max_lights=2)
+    assert lights.update((0, 0, 0))['active'] == 2
+    assert lit(render, lights) == [False, True, True]
+
+
+def test_light_on_the_boundary_keeps_its_slot():
+    render, lights = budget([(10, 0, 0), (-11, 0, 0)], max_lights=1, hysteresis=0.8)
+    lights.update((0, 0, 0))
+    assert lit(render, lights) == [True, False]
+    # The other light is now a little nearer, but not by more than the head start
+    lights.update((-1, 0, 0))
+    assert lit(render, lights) == [True, False]
+    assert lights.stats['changes'] == 0
+    lights.update((-4, 0, 0))
+    assert lit(render, lights) == [False, True]
+
+
+def test_switched_off_and_sealed_lights_are_cleared():
+    render, lights = budget([(1, 0, 0), (2, 0, 0), (3, 0, 0)], max_lights=8)
+    lights.lights[0].light.switch = type('Switch', (), {'is_on': False})()
+    lights.lights[1].cell = 'room_2'
+    stats = lights.update((0, 0, 0), sealed={'room_2'})
+    assert (stats['switched_off'], stats['sealed'], stats['active']) == (1, 1, 1)
+    assert lit(render, lights) == [False, False, True]
+
+
+def test_shadows_go_to_the_nearest_lights_that_want_them():
+    render = NodePath('render')
+    lights = LightBudget(render, max_lights=3, max_shadows=1)
+    far = lights.add(Light(render, (9, 0, 0)), shadows=True)
+    near = lights.add(Light(render, (5, 0, 0)), shadows=True)
+    nearest = lights.add(Light(render, (1, 0, 0)))
+    lights.update((0, 0, 0))
+    assert (near.shadowed, far.shadowed, nearest.shadowed) == (True, False, False)
+    assert near.node.node().isShadowCaster()
@@ -0,0 +1,44 @@
+from generator import generate_hotel
+from layout import validate_layout
+from lightbake import Lightmap, bake_segment
+from streaming import make_segments
+
+
+def baked(segment, segments):
+    _, parts, rows, _ = bake_segment(segment, segments)
+    faces = [(axis, sign, plane, (lo_u, lo_v), (hi_u, hi_v), tuple(rect)) for axis, sign, plane, lo_u, lo_v, hi_u, hi_v, *rect in rows]
+    return Lightmap(None, faces, {}, [((u, v), (width, height), count) for u, v, width, height, count in parts])
+
+
+def test_rooms_alike_share_their_lightmap_layout():
+    # In seed 7, floor 2's rooms 1 and 2 are the same size with their doors the same way;
+    # floor 1's rooms 2 and 3 are too, with different decorators
+    layout = validate_layout(generate_hotel(7, 3))
+    segments = make_segments(layout)
+    by_name = {segment.name: segment for segment in segments}
+    origins = {}
+    for segment in layout['segments']:
+        room = next((item for item in segment['items'] if item['type'] == 'room'), None)
+        if room:
+            origins[segment['name']] = (room['center'][0], room.get('elevation', 0), room['center'][1])
+
+    def layout_of(name, index):
+        return baked(by_name[name], segments).part(index, origins[name]).layout
+
+    assert layout_of('floor_2_room_1', 0) == layout_of('floor_2_room_2', 0)
+    assert layout_of('floor_1_room_2', 0) == layout_of('floor_1_room_3', 0)
+    assert layout_of('floor_2_room_1', 0) != layout_of('floor_1_room_2', 0)
+
+
+def test_part_uvs_map_back_onto_the_atlas():
+    layout = validate_layout(generate_hotel(7, 1))
+    segments = make_segments(layout)
+    segment = next(segment for segment in segments if segment.kind == 'room')
+    lightmap = baked(segment, segments)
+    start = 0
+    for index, ((u, v), (width, height), count) in enumerate(lightmap.parts):
+        part = lightmap.part(index, (0, 0, 0))
+        for (*_, rect), (*_, local) in zip(lightmap.faces[start:start + count], part.faces):
+            assert abs(u + local[0] * width - rect[0]) < 1e-6 and abs(v + local[3] * height - rect[3]) < 1e-6
+        start += count
+    assert lightmap.part(len(lightmap.parts), (0, 0, 0)) is None
@@ -0,0 +1,61 @@
+from mutation import MutationScheduler, pick_kind
+
+
+ROOMS = {'room_1': ((0, 0, 0), (8, 4, 8))}
+FAR = (100, 1, 100)
+INSIDE = (4, 1, 4)
+
+
+def stats(dark=0.0, lit=0.0, hesitations=0):
+    return {'dark': dark, 'lit': lit, 'hesitations': hesitations, 'visits': 2}
+
+
+def never(kinds):
+    raise AssertionError('picked at random')
+
+
+def test_dark_room_is_retinted():
+    assert pick_kind(stats(dark=9.0, lit=1.0), ['swap_decorator', 'move_table'], pick=never) == 'retint'
+
+
+def test_hesitation_locks_the_door_first():
+    assert pick_kind(stats(dark=9.0, lit=1.0, hesitations=2), ['retint'], lockable=True) == 'lock_door'
+    assert pick_kind(stats(dark=9.0, lit=1.0, hesitations=2), ['retint'], lockable=False, pick=never) == 'retint'
+
+
+def test_lit_room_picks_at_random():
+    assert pick_kind(stats(dark=1.0, lit=9.0), ['move_table'], pick=lambda kinds: kinds[-1]) == 'move_table'
+
+
+def test_mutation_waits_until_hidden():
+    done = []
+    scheduler = MutationScheduler(ROOMS)
+    scheduler.queue('room_1', 'retint', lambda: done.append(1))
+    scheduler.update(INSIDE)
+    assert not done and scheduler.stats['waiting'] == 1
+    scheduler.update(FAR)
+    assert done and scheduler.applied == 1
+
+
+def test_mutation_seen_part_way_is_rolled_back():
+    state = {'steps': 0}
+
+    def apply():
+        try:
+            for _ in range(3):
+                state['steps'] += 1
+                yield
+        except GeneratorExit:
+            state['steps'] = 0
+            raise
+
+    scheduler = MutationScheduler(ROOMS, frame_budget=0)
+    scheduler.queue('room_1', 'swap_decorator', apply)
+    scheduler.update(FAR)
+    assert state['steps'] == 1
+    scheduler.update(INSIDE)
+    assert state['steps'] == 0 and scheduler.cancelled == 1
+    assert scheduler.queued('room_1') and scheduler.applied == 0
+    for _ in range(5):
+        scheduler.update(FAR)
+    assert state['steps'] == 3 and scheduler.applied == 1
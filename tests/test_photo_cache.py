@@ -0,0 +1,78 @@
+import time
+
+import pytest
+from panda3d.core import Texture
+
+from photo_cache import PhotoCache, load_full
+from streaming import MB
+
+
+def fake_texture(size):
+    # An uncompressed RGBA image of size bytes, near enough
+    texture = Texture()
+    side = int((size / 4) ** 0.5)
+    texture.setup2dTexture(side, side, Texture.T_unsigned_byte, Texture.F_rgba8)
+    return texture
+
+
+def fake_load(path):
+    if path == 'broken.png':
+        raise ValueError('unreadable')
+    return fake_texture(MB)
+
+
+def settle(cache):
+    arrived = []
+    for _ in range(200):
+        arrived += cache.poll()
+        if not cache.pending:
+            return arrived
+        time.sleep(0.005)
+    raise AssertionError('loads never finished')
+
+
+@pytest.fixture
+def cache():
+    cache = PhotoCache(memory_budget=2.5 * MB, load=fake_load)
+    yield cache
+    cache.executor.shutdown()
+
+
+def test_miss_then_hit(cache):
+    assert cache.get('a.png') is None
+    assert [path for path, _ in settle(cache)] == ['a.png']
+    assert cache.get('a.png') is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache.wait_ms) == 1
+
+
+def test_least_recently_used_is_evicted_first(cache):
+    cache.prefetch(['a.png', 'b.png'])
+    settle(cache)
+    cache.get('a.png')
+    cache.release()
+    cache.prefetch(['c.png'])
+    settle(cache)
+    assert list(cache.textures) == ['a.png', 'c.png']
+    assert cache.evictions == 1 and cache.bytes <= cache.memory_budget
+
+
+def test_photo_on_screen_is_never_evicted(cache):
+    cache.get('a.png')
+    settle(cache)
+    cache.prefetch(['b.png', 'c.png', 'd.png'])
+    settle(cache)
+    assert 'a.png' in cache.textures
+    assert cache.stats['photos'] == 2
+
+
+def test_unreadable_photo_is_not_retried(cache):
+    assert cache.get('broken.png') is None
+    settle(cache)
+    assert cache.get('broken.png') is None
+    assert not cache.pending and cache.stats['failed'] == 1
+
+
+def test_full_photo_is_only_read_from_the_cache():
+    with pytest.raises(ValueError):
+        load_full('assets/no_such_photo.png')
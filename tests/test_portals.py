@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from portals import PortalGraph
+
+
+def segment(name, kind, lo, hi):
+    return SimpleNamespace(name=name, kind=kind, lo=lo, hi=hi)
+
+
+# A corridor running north, an archway into the next one, a room off it behind a door,
+# and a stairwell up to a corridor on the floor above
+SEGMENTS = [
+    segment('corridor', 'corridor', (0, -0.5, 0), (4, 6, 20)),
+    segment('next', 'corridor', (0, -0.5, 20), (4, 6, 40)),
+    segment('room', 'room', (4, -0.5, 0), (12, 6, 10)),
+    segment('stairwell', 'stairwell', (0, -0.5, 40), (4, 12, 50)),
+    segment('upstairs', 'corridor', (0, 5.5, 50), (4, 12, 70)),
+]
+DOOR = ('corridor', {'type': 'door', 'position': (4, 1.75, 5), 'room': 'room'})
+EYE = (2, 2, 10)
+
+
+def graph(open_door):
+    return PortalGraph(SEGMENTS, [DOOR], lambda room, position: open_door)
+
+
+def test_closed_door_and_other_floor_are_sealed():
+    portals = graph(open_door=False)
+    portals.update(EYE)
+    assert portals.sealed == {'room', 'upstairs'}
+
+
+def test_open_door_lets_the_room_in():
+    portals = graph(open_door=True)
+    portals.update(EYE)
+    assert portals.sealed == {'upstairs'}
+
+
+def test_culled_archway_is_not_sealed():
+    # Nothing beyond the camera's cell is in view, but the corridor behind the archway is still open to it
+    portals = graph(open_door=False)
+    nothing = SimpleNamespace(contains=lambda bounds: False)
+    visible = portals.update(EYE, nothing)
+    assert 'next' not in visible
+    assert 'next' not in portals.sealed and 'stairwell' not in portals.sealed
+
+
+def test_outside_every_cell_seals_nothing():
+    portals = graph(open_door=False)
+    portals.update((100, 2, 100))
+    assert portals.sealed == set()
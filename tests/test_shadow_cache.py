@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from shadow_cache import ShadowCache
+
+
+class Buffer:
+    # Stands in for the GraphicsOutput Panda3D draws a light's shadow map into
+    def __init__(self):
+        self.active = True
+        self.draws = 0
+
+    def setActive(self, active):
+        self.active = active
+
+    def isActive(self):
+        return self.active
+
+
+def light(position, buffer=None):
+    # A light budget ManagedLight as far as the cache looks at one
+    managed = SimpleNamespace(position=position, buffer=buffer)
+    handle = SimpleNamespace(getShadowBuffer=lambda gsg: managed.buffer)
+    managed.node = SimpleNamespace(node=lambda: handle)
+    return managed
+
+
+def frame(cache, lights, dt=0.25):
+    stats = cache.update(lights, gsg=object(), dt=dt)
+    for managed in lights:
+        if managed.buffer is not None and managed.buffer.isActive():
+            managed.buffer.draws += 1
+    return stats
+
+
+def test_still_scene_draws_each_map_once():
+    cache = ShadowCache(light_range=15)
+    lights = [light((0, 3, 0), Buffer()), light((100, 3, 0), Buffer())]
+    for _ in range(20):
+        frame(cache, lights)
+    assert [managed.buffer.draws for managed in lights] == [1, 1]
+    assert cache.stats['total_renders'] == 2
+    assert cache.stats['cached'] == 2
+
+
+def test_door_swing_redraws_only_nearby_lights_while_it_moves():
+    cache = ShadowCache(light_range=15)
+    near, far = light((0, 3, 0), Buffer()), light((100, 3, 0), Buffer())
+    for _ in range(5):
+        frame(cache, [near, far])
+    cache.invalidate((2, 1.5, 0), radius=1, seconds=0.5)
+    for _ in range(20):
+        frame(cache, [near, far])
+    # The swing's three frames (0.5s at 0.25s a frame) and the one after it
+    assert near.buffer.draws == 1 + 4
+    assert far.buffer.draws == 1
+    assert cache.stats['movers'] == 0
+
+
+def test_instant_move_redraws_the_frame_after_too():
+    cache = ShadowCache(light_range=15)
+    managed = light((0, 3, 0), Buffer())
+    for _ in range(3):
+        frame(cache, [managed])
+    cache.invalidate((1, 1, 1))
+    for _ in range(10):
+        frame(cache, [managed])
+    assert managed.buffer.draws == 1 + 2
+
+
+def test_remade_buffer_starts_dirty():
+    cache = ShadowCache()
+    managed = light((0, 3, 0), Buffer())
+    for _ in range(3):
+        frame(cache, [managed])
+    managed.buffer = Buffer()
+    frame(cache, [managed])
+    assert managed.buffer.draws == 1
+
+
+def test_lights_without_a_buffer_are_left_alone():
+    cache = ShadowCache()
+    assert frame(cache, [light((0, 3, 0))])['unbuffered'] == 1
@@ -0,0 +1,105 @@
+import copy
+import struct
+
+import pytest
+
+from generator import generate_hotel
+from layout import validate_layout
+from snapshot import (SnapshotError, SnapshotWriter, decode, encode, layout_hash, read_snapshot,
+                      restore_segment, segment_state)
+from streaming import make_segments
+
+
+@pytest.fixture
+def layout():
+    return validate_layout(generate_hotel(3, 1))
+
+
+def rooms_of(layout):
+    return {segment['name']: next((item for item in segment['items'] if item['type'] == 'room'), None)
+            for segment in layout['segments'] if segment['kind'] == 'room'}
+
+
+def play(segments):
+    # What playing does to the items: a door opened, a light switched off and retinted, a table moved
+    for segment in segments:
+        for item in segment.items:
+            if item['type'] == 'door':
+                item['open'] = True
+            elif item['type'] == 'point_light' and item.get('switch'):
+                item['switch']['on'] = False
+                item['color'] = (90, 5, 20)
+            elif item['type'] == 'photo_table':
+                item['position'] = (item['position'][0] + 0.5, item['position'][1], item['position'][2])
+                item['crept'] = 0.5
+
+
+def test_round_trip(layout):
+    segments = make_segments(layout)
+    rooms = rooms_of(layout)
+    play(segments)
+    saved = {'meta': {'layout': None, 'seed': 3, 'floors': 1, 'saved': 12.5, 'hash': layout_hash(layout)},
+             'player': (1.0, 2.0, 3.0, 90.0, -10.0)}
+    for segment in segments:
+        saved[f'segment/{segment.name}'] = segment_state(segment, rooms.get(segment.name))
+    loaded = decode(encode(saved))
+    assert loaded['meta'] == saved['meta']
+    assert loaded['player'] == saved['player']
+
+    fresh = validate_layout(generate_hotel(3, 1))
+    fresh_rooms = rooms_of(fresh)
+    for segment in make_segments(fresh):
+        restore_segment(segment, loaded[f'segment/{segment.name}'], fresh_rooms.get(segment.name))
+        assert segment_state(segment, fresh_rooms.get(segment.name)) == saved[f'segment/{segment.name}']
+
+
+def test_layout_hash_tells_layouts_apart(layout):
+    assert layout_hash(layout) == layout_hash(validate_layout(generate_hotel(3, 1)))
+    assert layout_hash(layout) != layout_hash(validate_layout(generate_hotel(4, 1)))
+    edited = copy.deepcopy(layout)
+    edited['segments'][0]['items'].pop()
+    assert layout_hash(layout) != layout_hash(edited)
+
+
+@pytest.mark.parametrize('seed, floors', [(2 ** 31, 3), (-7, 1), (2 ** 70, 300), (None, 0)])
+def test_any_seed_and_floor_count_round_trip(seed, floors):
+    meta = {'layout': None, 'seed': seed, 'floors': floors, 'saved': 1.0, 'hash': 'abc'}
+    assert decode(encode({'meta': meta}))['meta'] == meta
+
+
+def test_older_version_is_refused():
+    data = bytearray(encode({'player': (0.0, 0.0, 0.0, 0.0, 0.0)}))
+    struct.pack_into('<H', data, 4, 1)
+    with pytest.raises(SnapshotError, match='older'):
+        decode(bytes(data))
+
+
+def test_damaged_file_is_refused():
+    data = encode({'player': (0.0, 0.0, 0.0, 0.0, 0.0)})
+    with pytest.raises(SnapshotError):
+        decode(data[:-3])
+    with pytest.raises(SnapshotError):
+        decode(b'NOPE' + data[4:])
+
+
+def test_writer_survives_a_save_it_cannot_encode(tmp_path):
+    path = tmp_path / 'save.occ'
+    writer = SnapshotWriter(path)
+    writer.save({'player': ('not', 'a', 'pose', 0.0, 0.0)})
+    assert writer.flush(timeout=5)
+    assert writer.stats['error'] and not path.exists()
+    writer.save({'player': (1.0, 2.0, 3.0, 0.0, 0.0), 'meta': {'layout': None, 'seed': 2 ** 40, 'floors': 400, 'saved': 0.0, 'hash': 'abc'}})
+    assert writer.flush(timeout=5)
+    assert read_snapshot(path)['meta']['floors'] == 400
+
+
+def test_writer_reuses_unchanged_sections(tmp_path):
+    path = tmp_path / 'save.occ'
+    writer = SnapshotWriter(path)
+    snapshot = {'player': (0.0, 1.0, 2.0, 0.0, 0.0), 'meta': {'layout': 'a.json', 'seed': None, 'floors': 1, 'saved': 0.0, 'hash': 'abc'}}
+    writer.save(snapshot)
+    assert writer.flush(timeout=5)
+    writer.save(dict(snapshot, player=(5.0, 1.0, 2.0, 0.0, 0.0)))
+    assert writer.flush(timeout=5)
+    assert writer.encoded_sections == 3 and writer.reused_sections == 1
+    assert read_snapshot(path)['player'] == struct.unpack('<5f', struct.pack('<5f', 5.0, 1.0, 2.0, 0.0, 0.0))
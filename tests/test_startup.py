@@ -0,0 +1,58 @@
+import time
+
+from startup import StagedLoader, Wait
+
+
+def stage(log, name, slices, ms=0.0):
+    def run():
+        for i in range(slices):
+            time.sleep(ms / 1000)
+            log.append(name)
+            yield (i + 1) / slices
+    return run
+
+
+def test_block_runs_every_stage_in_one_step():
+    log = []
+    loader = StagedLoader([('a', 1, stage(log, 'a', 3)), ('b', 1, stage(log, 'b', 2))])
+    assert loader.step(block=True)
+    assert log == ['a', 'a', 'a', 'b', 'b']
+    assert loader.progress == 1.0 and loader.stats['a']['frames'] == 1
+
+
+def test_frame_budget_slices_the_work():
+    log = []
+    loader = StagedLoader([('slow', 1, stage(log, 'slow', 6, ms=4))], frame_budget=10)
+    frames, progress = 0, 0.0
+    while not loader.step():
+        frames += 1
+        assert loader.progress > progress
+        progress = loader.progress
+    # Every slice takes at least 4ms, so a 10ms frame fits three of them at most
+    assert len(log) == 6 and frames >= 2
+    assert loader.stats['slow']['frames'] == frames + 1
+
+
+def test_wait_ends_the_frame():
+    log = []
+
+    def waiting():
+        for progress in (0.25, 0.5):
+            log.append('waited')
+            yield Wait(progress)
+
+    loader = StagedLoader([('thread', 1, waiting), ('after', 1, stage(log, 'after', 1))], frame_budget=1000)
+    assert not loader.step() and log == ['waited']
+    assert loader.progress == 0.125
+    assert not loader.step() and log == ['waited', 'waited']
+    assert loader.step() and log[-1] == 'after'
+
+
+def test_progress_follows_the_weights():
+    def heavy():
+        yield Wait(0.5)
+
+    loader = StagedLoader([('light', 1, stage([], 'light', 1)), ('heavy', 3, heavy)])
+    loader.step()
+    assert loader.stage == 'heavy'
+    assert loader.progress == (1 + 3 * 0.5) / 4
@@ -0,0 +1,61 @@
+from streaming import ENTITY_BYTES, Segment, StreamingManager
+
+
+def segment(name, x):
+    return Segment(name, 'room', [{'position': (x, 0, 0), 'scale': 1}])
+
+
+def streaming(segments, fit, **kwargs):
+    # Every segment is one item, so a budget of `fit` segments holds exactly that many
+    def load(segment):
+        yield
+        segment.root = None
+
+    return StreamingManager(segments, load, lambda segment: None, memory_budget=fit * ENTITY_BYTES,
+                            **kwargs)
+
+
+def loaded(manager):
+    return [s.name for s in manager.segments if s.state == 'loaded']
+
+
+def unloaded(manager):
+    return [event[1] for event in manager.events if event[2] == 'unload']
+
+
+def test_nearby_segments_load_and_far_ones_unload():
+    segments = [segment('a', 0), segment('b', 20), segment('c', 80)]
+    manager = streaming(segments, fit=8, load_radius=25, unload_radius=40)
+    manager.update((0, 0, 0), block=True)
+    assert loaded(manager) == ['a', 'b']
+    manager.update((80, 0, 0), block=True)
+    assert loaded(manager) == ['c'] and unloaded(manager) == ['a', 'b']
+
+
+def test_least_recently_wanted_segment_is_evicted_first():
+    segments = [segment('a', 0), segment('b', 20), segment('c', 40), segment('d', 60)]
+    manager = streaming(segments, fit=2, load_radius=25, unload_radius=1000)
+    manager.update((0, 0, 0), block=True)
+    assert loaded(manager) == ['a', 'b']
+    # b is still wanted from here, a is not
+    manager.update((40, 0, 0), block=True)
+    assert unloaded(manager) == ['a']
+    assert loaded(manager) == ['b', 'c']
+
+
+def test_farthest_segment_is_evicted_first_among_equally_stale():
+    segments = [segment('a', 0), segment('b', 20), segment('c', 40), segment('d', 80)]
+    manager = streaming(segments, fit=3, load_radius=45, unload_radius=1000)
+    manager.update((0, 0, 0), block=True)
+    assert loaded(manager) == ['a', 'b', 'c']
+    manager.update((120, 0, 0), block=True)
+    assert unloaded(manager) == ['a']
+    assert loaded(manager) == ['b', 'c', 'd']
+
+
+def test_segment_that_only_fits_by_evicting_nearer_ones_is_skipped():
+    segments = [segment('a', 0), segment('b', 20), segment('c', 40)]
+    manager = streaming(segments, fit=2, load_radius=45, unload_radius=1000)
+    manager.update((0, 0, 0), block=True)
+    assert loaded(manager) == ['a', 'b']
+    assert manager.skipped == 1 and not unloaded(manager)
@@ -0,0 +1,37 @@
+from telemetry import Telemetry
+
+
+ROOMS = [('segment_a', (0, 0, 0), (20, 4, 4)), ('room_1', (0, 0, 4), (8, 4, 12))]
+# room_1's switch is on the corridor side of its wall
+SWITCH = (4, 1.5, 3.9)
+
+
+def walk(telemetry, position, seconds):
+    for _ in range(round(seconds / telemetry.sample_interval)):
+        telemetry.update(telemetry.sample_interval, position)
+
+
+def test_switch_counts_for_its_own_room():
+    telemetry = Telemetry(ROOMS)
+    telemetry.light_switched(SWITCH, False, room='room_1')
+    walk(telemetry, (4, 0, 8), 3)
+    telemetry.light_switched(SWITCH, True, room='room_1')
+    walk(telemetry, (4, 0, 8), 1)
+    stats = telemetry.room_stats('room_1')
+    assert stats['dark'] > stats['lit'] > 0
+    assert telemetry.room_stats('segment_a')['dark'] == 0
+    assert telemetry.recent_events()[0][1:3] == ('light_off', 'room_1')
+
+
+def test_switch_without_room_falls_back_to_its_position():
+    telemetry = Telemetry(ROOMS)
+    telemetry.light_switched(SWITCH, False)
+    assert telemetry.switches_off[telemetry.names.index('segment_a')] == 1
+
+
+def test_restored_switch_records_no_event():
+    telemetry = Telemetry(ROOMS)
+    telemetry.light_switched(SWITCH, False, room='room_1', record=False)
+    telemetry.light_switched(SWITCH, False, room='room_1', record=False)
+    assert telemetry.switches_off[telemetry.names.index('room_1')] == 1
+    assert telemetry.event_count == 0
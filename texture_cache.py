@@ -0,0 +1,174 @@
+import hashlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from panda3d.core import Filename, PNMImage, SamplerState, Texture as PandaTexture
+from ursina import Texture
+
+
+ROOT = Path(__file__).parent
+CACHE_DIR = ROOT / '.cache' / 'textures'
+
+# Bump when the conversion changes; old cache files then stop matching
+CACHE_VERSION = 1
+
+# Largest side in pixels (None keeps the source size) and whether to store DXT-compressed
+# images. Every tier is stored pre-decoded with its full mipmap chain.
+QUALITY_TIERS = {
+    'high': {'max_size': None, 'compress': False},
+    'medium': {'max_size': 1024, 'compress': True},
+    'low': {'max_size': 512, 'compress': True},
+}
+SOURCE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+
+loaded_textures = {}  # (path, tier) -> Texture, shared by every entity using it
+
+
+# -------------------------------
+# CACHE FILES
+# -------------------------------
+def source_hash(path, tier):
+    path = Path(path)
+    digest = hashlib.sha1(f'{CACHE_VERSION}:{tier}:{sorted(QUALITY_TIERS[tier].items())}'.encode())
+    digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def cache_path(path, tier, cache_dir=None):
+    path = Path(path)
+    return Path(cache_dir or CACHE_DIR) / f'{path.name}@{tier}-{source_hash(path, tier)}.txo'
+
+
+def resolve(path):
+    path = Path(path)
+    return path if path.is_absolute() else ROOT / path
+
+
+def downscale(image, max_size):
+    width, height = image.getXSize(), image.getYSize()
+    if not max_size or max(width, height) <= max_size:
+        return image
+    ratio = max_size / max(width, height)
+    small = PNMImage(max(1, round(width * ratio)), max(1, round(height * ratio)), image.getNumChannels(), image.getMaxval())
+    small.gaussianFilterFrom(1.0, image)
+    return small
+
+
+def convert(path, tier):
+    settings = QUALITY_TIERS[tier]
+    image = PNMImage()
+    if not image.read(Filename.fromOsSpecific(str(path))):
+        raise ValueError(f'Could not read texture {path}')
+    image = downscale(image, settings['max_size'])
+
+    texture = PandaTexture(path.stem)
+    texture.load(image)
+    # Trilinear when minified; up close keeps ursina's default nearest filtering
+    texture.setMinfilter(SamplerState.FT_linear_mipmap_linear)
+    texture.setMagfilter(SamplerState.FT_nearest)
+    texture.generateRamMipmapImages()
+    if settings['compress']:
+        mode = PandaTexture.CM_dxt5 if image.hasAlpha() else PandaTexture.CM_dxt1
+        texture.compressRamImage(mode, PandaTexture.QL_default, None)
+    return texture
+
+
+def compile_texture(path, tier='medium', cache_dir=None, force=False):
+    # Returns the .txo cache file for a texture at a quality tier, converting it first if the source changed
+    path = resolve(path)
+    out = cache_path(path, tier, cache_dir)
+    if out.exists() and not force:
+        return out
+
+    texture = convert(path, tier)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix('.tmp.txo')
+    if not texture.write(Filename.fromOsSpecific(str(tmp))):
+        raise ValueError(f'Could not write {tmp}')
+    tmp.replace(out)
+
+    # Drop stale builds of the same source and tier
+    for old in out.parent.glob(f'{path.name}@{tier}-*.txo'):
+        if old != out:
+            old.unlink()
+    return out
+
+
+def compile_in_background(paths, tier='medium', workers=2):
+    # Builds missing cache files on worker threads. Panda3D releases the GIL while it decodes,
+    # filters and compresses, so the main thread keeps drawing frames. Returns a future per image not yet cached.
+    sources = sorted({resolve(path) for path in paths if isinstance(path, str)})
+    missing = [source for source in sources if source.suffix.lower() in SOURCE_SUFFIXES and source.exists()
+               and not cache_path(source, tier).exists()]
+    if not missing:
+        return []
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(missing)), thread_name_prefix='texture_cache')
+    futures = [executor.submit(compile_texture, source, tier) for source in missing]
+    executor.shutdown(wait=False)
+    return futures
+
+
+def read_texture(path):
+    texture = PandaTexture()
+    if not texture.read(Filename.fromOsSpecific(str(path))):
+        raise ValueError(f'{path} is not a readable texture cache file')
+    return texture
+
+
+def cached_texture(path, quality='medium'):
+    # Texture for an image asset at a quality tier, from the cache. Anything that isn't a
+    # readable image file (ursina's built-in textures, missing or broken files), or quality None,
+    # is returned unchanged for ursina to load as before.
+    if quality is None or not isinstance(path, str):
+        return path
+    key = (path, quality)
+    if key not in loaded_textures:
+        source = resolve(path)
+        if source.suffix.lower() not in SOURCE_SUFFIXES or not source.exists():
+            return path
+        try:
+            texture = Texture(read_texture(compile_texture(source, quality)), filtering='mipmap')
+        except ValueError:
+            loaded_textures[key] = path
+            return path
+        texture.path = source
+        loaded_textures[key] = texture
+    return loaded_textures[key]
+
+
+def texture_memory(texture, gsg=None):
+    # GPU bytes for a Panda3D texture: what the driver was given if it has been uploaded to gsg,
+    # otherwise an estimate from the RAM image. Panda3D's own estimate assumes uncompressed
+    # texels, so compressed images are counted as they are.
+    if gsg is not None and texture.isPrepared(gsg.getPreparedObjects()):
+        return texture.prepareNow(0, gsg.getPreparedObjects(), gsg).getDataSizeBytes()
+    if texture.getRamImageCompression() == PandaTexture.CM_off:
+        return texture.estimateTextureMemory()
+    return sum(texture.getRamMipmapImageSize(level) for level in range(texture.getNumRamMipmapImages()))
+
+
+if __name__ == '__main__':
+    # python texture_cache.py [--tier high|medium|low] [--force] [assets/*.png ...]
+    args = sys.argv[1:]
+    tiers = list(QUALITY_TIERS)
+    force = '--force' in args
+    if '--tier' in args:
+        tiers = [args[args.index('--tier') + 1]]
+        del args[args.index('--tier'):args.index('--tier') + 2]
+    paths = [arg for arg in args if not arg.startswith('--')] or sorted(
+        str(p.relative_to(ROOT)) for p in (ROOT / 'assets').iterdir() if p.suffix.lower() in SOURCE_SUFFIXES)
+    for path in paths:
+        for tier in tiers:
+            start = time.perf_counter()
+            try:
+                out = compile_texture(path, tier, force=force)
+            except ValueError as e:
+                print(f'{path} [{tier}]: skipped, {e}')
+                continue
+            elapsed = (time.perf_counter() - start) * 1000
+            texture = read_texture(out)
+            print(f'{path} [{tier}]: {texture.getXSize()}x{texture.getYSize()}, {texture.getNumRamMipmapImages()} mipmaps, '
+                  f'{resolve(path).stat().st_size / 1024:.0f} KB -> {out.stat().st_size / 1024:.0f} KB, '
+                  f'{texture_memory(texture) / 1024:.0f} KB on the GPU, {elapsed:.0f} ms ({out.name})')